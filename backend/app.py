@@ -1,13 +1,24 @@
+import hmac
 import os
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
-from database.db import init_database
+from database.db import DB_PATH, init_database, init_app, get_pool
+from database.query_stats import init_query_stats, query_stats
 from routes.auth import auth_bp
 from routes.lawyers import lawyers_bp
 from routes.shortlist import shortlist_bp
 from routes.comparison import comparison_bp
 from routes.history import history_bp
+from routes.admin import admin_bp
+from services.history_buffer import history_buffer_stats
+from services.metrics import registry, stats_collector
+from services.serializers import fragment_cache
+from middleware.auth import configure_token_cache, token_cache, authenticate_token, require_admin
+from services.password_hasher import configure_password_hasher, password_hasher
+from middleware.rate_limit import configure_rate_limiter, rate_limiter, DEFAULT_LIMITS
+from middleware.compression import init_compression, send_static
+from middleware.instrumentation import init_instrumentation
 
 load_dotenv()
 
@@ -23,7 +34,66 @@ CORS(app, resources={r"/api/*": {"origins": "*"}})
 
 # Configuration
 app.config['JWT_SECRET'] = os.getenv('JWT_SECRET', 'your-super-secret-jwt-key-change-this-in-production')
+app.config['JWT_EXPIRES_IN'] = int(os.getenv('JWT_EXPIRES_IN', 86400))
+app.config['TOKEN_CACHE_SIZE'] = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+app.config['TOKEN_CACHE_TTL'] = int(os.getenv('TOKEN_CACHE_TTL', 300))
+app.config['BCRYPT_ROUNDS'] = int(os.getenv('BCRYPT_ROUNDS', 12))
+app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.getenv('PASSWORD_HASH_QUEUE', 32))
 app.config['PORT'] = int(os.getenv('PORT', 3000))
+app.config['DATABASE_PATH'] = os.getenv('DATABASE_PATH', str(DB_PATH))
+app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 8))
+app.config['DB_BUSY_TIMEOUT_MS'] = int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000))
+app.config['DB_CACHE_SIZE_KB'] = int(os.getenv('DB_CACHE_SIZE_KB', 20000))
+app.config['DB_MMAP_SIZE'] = int(os.getenv('DB_MMAP_SIZE', 256 * 1024 * 1024))
+app.config['LAWYER_CATALOG'] = os.getenv('LAWYER_CATALOG', 'true').lower() == 'true'
+app.config['SIMILAR_NEIGHBORS'] = int(os.getenv('SIMILAR_NEIGHBORS', 10))
+app.config['HISTORY_WRITE_BEHIND'] = os.getenv('HISTORY_WRITE_BEHIND', 'true').lower() == 'true'
+app.config['HISTORY_BUFFER_SIZE'] = int(os.getenv('HISTORY_BUFFER_SIZE', 10000))
+app.config['HISTORY_BATCH_SIZE'] = int(os.getenv('HISTORY_BATCH_SIZE', 500))
+app.config['HISTORY_FLUSH_INTERVAL'] = float(os.getenv('HISTORY_FLUSH_INTERVAL', 1.0))
+app.config['RATE_LIMIT_ENABLED'] = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+app.config['RATE_LIMIT_BACKEND'] = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+app.config['RATE_LIMIT_DATABASE'] = os.getenv(
+    'RATE_LIMIT_DATABASE', os.path.join(os.path.dirname(app.config['DATABASE_PATH']), 'ratelimit.db')
+)
+for name, default in DEFAULT_LIMITS.items():
+    app.config[name] = os.getenv(name, default)
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+app.config['COMPRESS_GZIP_LEVEL'] = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+app.config['COMPRESS_BROTLI_QUALITY'] = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+app.config['PROFILE_SAMPLE_RATE'] = int(os.getenv('PROFILE_SAMPLE_RATE', 0))
+app.config['PROFILE_HEADER_ENABLED'] = os.getenv('PROFILE_HEADER_ENABLED', 'false').lower() == 'true'
+app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(__file__), 'profiles'))
+app.config['QUERY_STATS_ENABLED'] = os.getenv('QUERY_STATS_ENABLED', 'true').lower() == 'true'
+app.config['QUERY_STATS_MAX'] = int(os.getenv('QUERY_STATS_MAX', 1000))
+app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', 100))
+
+# Per-endpoint latency, SQLite/serialization/auth split and opt-in cProfile
+if app.config['METRICS_ENABLED']:
+    init_instrumentation(app)
+
+# Pooled SQLite connections, released at the end of each request
+init_app(app)
+
+# Per-statement SQL statistics and slow-query log (top-N at /api/admin/queries)
+if app.config['QUERY_STATS_ENABLED']:
+    init_query_stats(app)
+
+# Verified-token cache used by authenticate_token
+configure_token_cache(app.config['TOKEN_CACHE_SIZE'], app.config['TOKEN_CACHE_TTL'])
+
+# Bounded bcrypt pool used by register and login
+configure_password_hasher(app.config['PASSWORD_HASH_WORKERS'], app.config['PASSWORD_HASH_QUEUE'],
+                          app.config['BCRYPT_ROUNDS'])
+
+# Login/register rate limiting ('memory' per process, 'sqlite' shared by workers)
+configure_rate_limiter(app.config['RATE_LIMIT_BACKEND'], app.config['RATE_LIMIT_DATABASE'])
+
+# gzip/brotli for JSON responses above COMPRESS_MIN_SIZE
+init_compression(app)
 
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -31,16 +101,73 @@ app.register_blueprint(lawyers_bp, url_prefix='/api/lawyers')
 app.register_blueprint(shortlist_bp, url_prefix='/api/shortlist')
 app.register_blueprint(comparison_bp, url_prefix='/api/comparison')
 app.register_blueprint(history_bp, url_prefix='/api/history')
+app.register_blueprint(admin_bp, url_prefix='/api/admin')
 
 # Health check endpoint
 @app.route('/api/health')
 def health_check():
     return jsonify({'status': 'ok', 'message': 'LegalConnect API is running'})
 
+# Connection pool statistics
+@app.route('/api/health/db')
+def database_health():
+    # Public endpoint: leave out the database file path
+    pool = {key: value for key, value in get_pool().stats().items() if key != 'path'}
+    return jsonify({'status': 'ok', 'pool': pool})
+
+# Search history write-behind buffer statistics
+@app.route('/api/health/history')
+def history_health():
+    return jsonify({'status': 'ok', 'buffer': history_buffer_stats()})
+
+# Verified-token cache statistics
+@app.route('/api/health/auth')
+def auth_health():
+    return jsonify({'status': 'ok', 'tokenCache': token_cache.stats(),
+                    'passwordHasher': password_hasher.stats(),
+                    'rateLimit': rate_limiter.stats()})
+
+# Prometheus metrics: request instrumentation plus the component stats above
+registry.add_collector(stats_collector('legalconnect_db_pool', lambda: get_pool().stats(),
+                                      'SQLite connection pool'))
+registry.add_collector(stats_collector('legalconnect_history_buffer', lambda: history_buffer_stats() or {},
+                                      'Search history write-behind buffer'))
+registry.add_collector(stats_collector('legalconnect_token_cache', token_cache.stats, 'Verified-token cache'))
+registry.add_collector(stats_collector('legalconnect_password_hasher', password_hasher.stats,
+                                      'bcrypt worker pool'))
+registry.add_collector(stats_collector('legalconnect_rate_limit', rate_limiter.stats, 'Login/register rate limiting'))
+registry.add_collector(stats_collector('legalconnect_query_stats', query_stats.stats, 'SQL statement statistics'))
+registry.add_collector(stats_collector('legalconnect_fragment_cache', fragment_cache.stats,
+                                      'Serialized lawyer fragment cache'))
+
+def render_metrics():
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@authenticate_token
+@require_admin
+def admin_metrics():
+    return render_metrics()
+
+# Scrapers send METRICS_TOKEN as a bearer token; without one, an admin login is required
+@app.route('/api/metrics')
+def metrics():
+    if not app.config['METRICS_ENABLED']:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    token = app.config['METRICS_TOKEN']
+    if token and hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'),
+                                     f'Bearer {token}'.encode('utf-8')):
+        return render_metrics()
+    return admin_metrics()
+
+# Fingerprinted build assets never change under the same name
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
 # Serve static assets
 @app.route('/assets/<path:filename>')
 def serve_assets(filename):
-    return send_from_directory(os.path.join(app.static_folder, 'assets'), filename)
+    response = send_static(os.path.join(app.static_folder, 'assets'), filename, max_age=ASSET_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
 
 # Serve frontend for all other routes (SPA routing)
 @app.route('/', defaults={'path': ''})
@@ -48,13 +175,11 @@ def serve_assets(filename):
 def serve_frontend(path):
     # Try to serve static file first
     if path and os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
+        return send_static(app.static_folder, path)
     # Otherwise serve index.html for SPA routing
-    response = send_from_directory(app.static_folder, 'index.html')
-    # Disable caching for HTML files to ensure updates are visible
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
+    response = send_static(app.static_folder, 'index.html')
+    # Always revalidate HTML (via its ETag) so new builds are picked up
+    response.cache_control.no_cache = True
     return response
 
 if __name__ == '__main__':
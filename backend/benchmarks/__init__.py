@@ -0,0 +1,7 @@
+"""Synthetic-scale benchmarks for the LegalConnect API.
+
+Usage (from the backend directory):
+    python -m benchmarks.datagen benchmarks/data/bench-100k.db --lawyers 100000 --users 100000
+    python -m benchmarks.run --lawyers 100000 --users 100000
+    python -m benchmarks.compare benchmarks/results/<before>.json benchmarks/results/<after>.json
+"""
@@ -0,0 +1,51 @@
+"""Compare two benchmark result files scenario by scenario.
+
+Usage (from the backend directory):
+    python -m benchmarks.compare benchmarks/results/before.json benchmarks/results/after.json
+"""
+import argparse
+import json
+import sys
+
+METRICS = ('p50', 'p95', 'p99', 'throughput')
+
+def _change(before, after):
+    if before in (None, 0) or after is None:
+        return ''
+    return f'{(after - before) / before * 100:+.1f}%'
+
+def compare_phase(name, before, after):
+    rows = []
+    for scenario in sorted(set(before) & set(after)):
+        for metric in METRICS:
+            old, new = before[scenario].get(metric), after[scenario].get(metric)
+            rows.append((f'{name} {scenario}', metric, old, new, _change(old, new)))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args(argv)
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"before: {before['meta'].get('revision')} {before['meta']['timestamp']}")
+    print(f"after:  {after['meta'].get('revision')} {after['meta']['timestamp']}")
+    rows = compare_phase('testClient', before.get('testClient', {}), after.get('testClient', {}))
+    if 'http' in before and 'http' in after:
+        rows += compare_phase('http', before['http']['scenarios'], after['http']['scenarios'])
+        rows += compare_phase('http', {'overall': before['http']['overall']},
+                              {'overall': after['http']['overall']})
+    for label, metric, old, new, change in rows:
+        print(f'{label:<36} {metric:<10} {str(old):>10} -> {str(new):>10} {change:>8}')
+    for phase in sorted(set(before.get('peakRssMb', {})) & set(after.get('peakRssMb', {}))):
+        old, new = before['peakRssMb'][phase], after['peakRssMb'][phase]
+        print(f"{'peak RSS MB ' + phase:<36} {'':<10} {old:>10} -> {new:>10} {_change(old, new):>8}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""Generate synthetic legalconnect databases for benchmarking.
+
+Lawyers are spread over the states roughly by population, with coordinates
+jittered around each state's main cities. Every user shares one low-cost
+bcrypt hash of BENCHMARK_PASSWORD so that generating 100k users is quick.
+Shortlist, comparison and search-history volumes follow a skewed (Pareto)
+distribution around the requested per-user averages: most users have a few
+rows and a small number have a lot. Similar-lawyer lists are precomputed as
+``python -m services.similarity`` would (skip with --similar-neighbors 0 for
+very large directories, where the rebuild is the slowest step).
+
+Usage (from the backend directory):
+    python -m benchmarks.datagen benchmarks/data/bench-1k.db --lawyers 1000 --users 100000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+import bcrypt
+
+from database.db import create_schema
+from database.bulk_import import deferred_indexes
+from middleware.etags import bump_version
+from services.similarity import DEFAULT_NEIGHBORS, rebuild_similar
+
+BENCHMARK_PASSWORD = 'benchmark'
+ADMIN_EMAIL = 'admin@bench.test'
+BATCH_SIZE = 50000
+
+PRACTICE_AREAS = {
+    'family': ['Divorce', 'Child Custody', 'Property Settlement', 'Mediation'],
+    'conveyancing': ['Residential', 'Commercial', 'Off-the-Plan', 'Strata'],
+    'immigration': ['Partner Visas', 'Skilled Migration', 'Citizenship', 'Appeals'],
+    'criminal': ['Traffic', 'Drug Offences', 'Assault', 'Fraud'],
+    'employment': ['Unfair Dismissal', 'Workplace Bullying', 'Contracts'],
+    'wills': ['Wills', 'Probate', 'Estate Disputes', 'Powers of Attorney'],
+    'commercial': ['Contracts', 'Disputes', 'Mergers', 'Franchising'],
+    'personal_injury': ['Motor Vehicle', 'Workers Compensation', 'Public Liability'],
+}
+
+# state -> (weight, [(city, lat, lng), ...])
+STATES = {
+    'NSW': (32, [('Sydney', -33.8688, 151.2093), ('Newcastle', -32.9283, 151.7817),
+                 ('Wollongong', -34.4278, 150.8931)]),
+    'VIC': (26, [('Melbourne', -37.8136, 144.9631), ('Geelong', -38.1499, 144.3617)]),
+    'QLD': (20, [('Brisbane', -27.4698, 153.0251), ('Gold Coast', -28.0167, 153.4000),
+                 ('Cairns', -16.9186, 145.7781)]),
+    'WA': (10, [('Perth', -31.9505, 115.8605)]),
+    'SA': (7, [('Adelaide', -34.9285, 138.6007)]),
+    'TAS': (2, [('Hobart', -42.8821, 147.3272)]),
+    'ACT': (2, [('Canberra', -35.2809, 149.1300)]),
+    'NT': (1, [('Darwin', -12.4634, 130.8456)]),
+}
+
+FIRST_NAMES = ['Sarah', 'James', 'Priya', 'Michael', 'Emma', 'David', 'Olivia', 'Daniel',
+               'Chloe', 'Wei', 'Aisha', 'Liam', 'Sofia', 'Noah', 'Hannah', 'Lucas']
+LAST_NAMES = ['Mitchell', 'Wilson', 'Sharma', 'Chen', 'Nguyen', 'Smith', 'Brown', 'Taylor',
+              'Kelly', 'Patel', 'Murphy', 'Singh', 'Walker', 'Harris', 'Martin', 'Lee']
+FIRM_WORDS = ['Partners', 'Legal', 'Lawyers', 'Associates', 'Chambers', 'Solicitors']
+COLORS = ['#8B5CF6', '#10B981', '#F59E0B', '#3B82F6', '#EF4444', '#EC4899']
+
+LAWYER_COLUMNS = ('name', 'firm', 'tier', 'practice_area', 'specialties', 'experience_years',
+                  'case_count', 'success_rate', 'hourly_rate_min', 'hourly_rate_max',
+                  'location_city', 'location_state', 'verified', 'mediation_certified',
+                  'response_guarantee', 'mara_number', 'bio', 'avatar_color', 'lat', 'lng',
+                  'external_id')
+
+def _skewed_count(rng, mean, cap):
+    """Pareto-distributed count with roughly the given mean"""
+    if mean <= 0:
+        return 0
+    return min(cap, int(rng.paretovariate(2.0) * mean / 2))
+
+def _lawyer(rng, index, states, weights):
+    state = rng.choices(states, weights)[0]
+    city, lat, lng = rng.choice(STATES[state][1])
+    area = rng.choice(list(PRACTICE_AREAS))
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    experience = rng.randint(1, 40)
+    rate_min = rng.randrange(150, 700, 10)
+    tier = 'top' if experience > 20 and rng.random() < 0.6 else rng.choice(['mid', 'mid', 'emerging'])
+    return (
+        f'{first} {last}',
+        f'{last} {rng.choice(FIRM_WORDS)}',
+        tier,
+        area,
+        json.dumps(rng.sample(PRACTICE_AREAS[area], 2)),
+        experience,
+        rng.randint(10, 60) * experience,
+        rng.randint(60, 99),
+        rate_min,
+        rate_min + rng.randrange(100, 500, 10),
+        city,
+        state,
+        int(rng.random() < 0.7),
+        int(rng.random() < 0.3),
+        int(rng.random() < 0.4),
+        f'MARA{rng.randint(1000000, 9999999)}' if area == 'immigration' else None,
+        f'{area.replace("_", " ").title()} lawyer in {city} with {experience} years of experience.',
+        rng.choice(COLORS),
+        round(lat + rng.gauss(0, 0.15), 5),
+        round(lng + rng.gauss(0, 0.15), 5),
+        f'bench-{index}'
+    )
+
+def _batched(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def generate_database(path, lawyers=1000, users=100000, shortlists_per_user=5,
+                      comparisons_per_user=1.5, history_per_user=20, seed=42, progress=None,
+                      similar_neighbors=DEFAULT_NEIGHBORS):
+    """Create a fresh database at path filled with synthetic data; returns row counts"""
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    rng = random.Random(seed)
+    report = progress or (lambda message: None)
+    started = time.perf_counter()
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=OFF')
+    create_schema(conn.cursor())
+    conn.commit()
+    counts = {}
+
+    states = list(STATES)
+    weights = [STATES[state][0] for state in states]
+    with deferred_indexes(conn):
+        for batch in _batched(_lawyer(rng, index, states, weights) for index in range(lawyers)):
+            conn.executemany(f'''
+                INSERT INTO lawyers ({', '.join(LAWYER_COLUMNS)})
+                VALUES ({', '.join('?' for _ in LAWYER_COLUMNS)})
+            ''', batch)
+            conn.commit()
+        counts['lawyers'] = lawyers
+        report(f'{lawyers} lawyers')
+
+    if similar_neighbors:
+        counts['lawyer_similar'] = rebuild_similar(conn, similar_neighbors)['rows']
+        report(f"{counts['lawyer_similar']} lawyer_similar")
+
+    password = bcrypt.hashpw(BENCHMARK_PASSWORD.encode('utf-8'), bcrypt.gensalt(4)).decode('utf-8')
+    conn.execute('INSERT INTO users (name, email, password, role) VALUES (?, ?, ?, ?)',
+                 ('Benchmark Admin', ADMIN_EMAIL, password, 'admin'))
+    for batch in _batched((f'User {i}', f'user{i}@bench.test', password) for i in range(1, users + 1)):
+        conn.executemany('INSERT INTO users (name, email, password) VALUES (?, ?, ?)', batch)
+        conn.commit()
+    counts['users'] = users + 1
+    report(f'{users} users')
+
+    def user_rows(mean, cap, make):
+        for user_id in range(2, users + 2):
+            count = min(_skewed_count(rng, mean, cap), lawyers)
+            yield from make(user_id, count)
+
+    def list_rows(user_id, count):
+        for lawyer_id in rng.sample(range(1, lawyers + 1), count):
+            yield (user_id, lawyer_id)
+
+    for table, mean, cap in (('shortlists', shortlists_per_user, 200),
+                             ('comparisons', comparisons_per_user, 3)):
+        total = 0
+        for batch in _batched(user_rows(mean, cap, list_rows)):
+            conn.executemany(f'INSERT INTO {table} (user_id, lawyer_id) VALUES (?, ?)', batch)
+            conn.commit()
+            total += len(batch)
+        counts[table] = total
+        report(f'{total} {table}')
+
+    now = time.time()
+    areas = list(PRACTICE_AREAS)
+
+    def history_rows(user_id, count):
+        for _ in range(count):
+            created = time.gmtime(now - rng.random() * 90 * 86400)
+            yield (user_id, rng.choice(areas + [None]), rng.choices(states + [None], weights + [20])[0],
+                   rng.choice([None, None, 5, 10, 20]), rng.choice([None, 300.0, 500.0, 800.0]),
+                   int(rng.random() < 0.2), rng.choice([0, 0, 3, 12, 40, 150]),
+                   time.strftime('%Y-%m-%d %H:%M:%S', created))
+
+    total = 0
+    for batch in _batched(user_rows(history_per_user, 1000, history_rows)):
+        conn.executemany('''
+            INSERT INTO search_history
+            (user_id, practice_area, state, min_experience, max_rate, response_guarantee, result_count, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', batch)
+        conn.commit()
+        total += len(batch)
+    counts['search_history'] = total
+    report(f'{total} search_history')
+
+    bump_version(conn, 'lawyers')
+    bump_version(conn, 'similar')
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    counts['seconds'] = round(time.perf_counter() - started, 1)
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic benchmark database')
+    parser.add_argument('path', help='database file to create')
+    parser.add_argument('--lawyers', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--shortlists-per-user', type=float, default=5)
+    parser.add_argument('--comparisons-per-user', type=float, default=1.5)
+    parser.add_argument('--history-per-user', type=float, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--similar-neighbors', type=int, default=DEFAULT_NEIGHBORS,
+                        help='similar lawyers precomputed per lawyer (0 to skip)')
+    args = parser.parse_args(argv)
+
+    counts = generate_database(
+        args.path, args.lawyers, args.users, args.shortlists_per_user,
+        args.comparisons_per_user, args.history_per_user, args.seed,
+        progress=lambda message: print(message, file=sys.stderr),
+        similar_neighbors=args.similar_neighbors
+    )
+    print(json.dumps(counts))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
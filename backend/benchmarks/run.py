@@ -0,0 +1,260 @@
+"""Run the API benchmark against a synthetic database and save the results.
+
+Two phases:
+
+* ``testClient``: each scenario runs sequentially through Flask's test client,
+  measuring the application without any network or server overhead.
+* ``http``: the app is served by a threaded local HTTP server and a pool of
+  client threads with keep-alive connections replays a weighted mix of all
+  scenarios for a fixed duration.
+
+Results (p50/p95/p99 latency, throughput, status counts, peak RSS) are
+printed and written as JSON under benchmarks/results/ so runs from different
+commits can be compared with ``python -m benchmarks.compare``.
+
+Usage (from the backend directory):
+    python -m benchmarks.run --lawyers 100000 --users 100000
+    python -m benchmarks.run --database benchmarks/data/bench-1m.db --duration 30 --threads 16
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from benchmarks.datagen import generate_database
+from benchmarks.scenarios import SCENARIOS
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+TOKEN_USERS = 1000
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize(latencies, statuses, elapsed):
+    """Latency percentiles in milliseconds, throughput and status counts"""
+    values = sorted(latencies)
+    ms = lambda value: None if value is None else round(value * 1000, 3)
+    return {
+        'requests': len(values),
+        'throughput': round(len(values) / elapsed, 1) if elapsed else None,
+        'p50': ms(percentile(values, 0.50)),
+        'p95': ms(percentile(values, 0.95)),
+        'p99': ms(percentile(values, 0.99)),
+        'max': ms(values[-1] if values else None),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def database_counts(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in ('lawyers', 'users', 'shortlists', 'comparisons', 'search_history')}
+    finally:
+        conn.close()
+
+def load_app(database):
+    """Import the Flask app configured for the benchmark database"""
+    os.environ['DATABASE_PATH'] = os.path.abspath(database)
+    # Every request comes from one IP and a small set of accounts
+    os.environ['RATE_LIMIT_ENABLED'] = 'false'
+    from app import app
+    return app
+
+def build_context(app, lawyers, users, rng):
+    from middleware.auth import generate_token
+    user_ids = rng.sample(range(2, users + 2), min(TOKEN_USERS, users))
+    with app.app_context():
+        tokens = [(user_id, generate_token({'id': user_id, 'email': f'user{user_id - 1}@bench.test',
+                                            'role': 'user'}))
+                  for user_id in user_ids]
+    return {'lawyers': lawyers, 'users': users, 'tokens': tokens}
+
+def run_test_client(app, context, iterations, warmup, rng, selected):
+    """Sequential per-scenario timings through the Flask test client"""
+    client = app.test_client()
+    results = {}
+    for name, blueprint, _, build in SCENARIOS:
+        if name not in selected:
+            continue
+        for _ in range(warmup):
+            request = build(context, rng)
+            client.open(request.path, method=request.method, headers=request.headers, data=request.body)
+        latencies = []
+        statuses = Counter()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            request = build(context, rng)
+            begin = time.perf_counter()
+            response = client.open(request.path, method=request.method, headers=request.headers,
+                                   data=request.body)
+            response.get_data()
+            latencies.append(time.perf_counter() - begin)
+            statuses[response.status_code] += 1
+        results[name] = {'blueprint': blueprint,
+                         **summarize(latencies, statuses, time.perf_counter() - started)}
+        print(f"  {name:<20} p50 {results[name]['p50']:>8} ms  p99 {results[name]['p99']:>8} ms",
+              file=sys.stderr)
+    return results
+
+def start_server(app):
+    """Serve app on a threaded local HTTP/1.1 server; returns (server, port)"""
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, server.server_port
+
+def run_http(app, context, threads, duration, seed, selected):
+    """Mixed load from client threads against a local HTTP server"""
+    server, port = start_server(app)
+    scenarios = [scenario for scenario in SCENARIOS if scenario[0] in selected]
+    weights = [scenario[2] for scenario in scenarios]
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local_latencies = defaultdict(list)
+        local_statuses = defaultdict(Counter)
+        while time.perf_counter() < deadline:
+            name, _, _, build = rng.choices(scenarios, weights)[0]
+            request = build(context, rng)
+            begin = time.perf_counter()
+            try:
+                conn.request(request.method, request.path, body=request.body, headers=request.headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                status = 'error'
+            local_latencies[name].append(time.perf_counter() - begin)
+            local_statuses[name][status] += 1
+        conn.close()
+        with lock:
+            for name, values in local_latencies.items():
+                latencies[name].extend(values)
+                statuses[name].update(local_statuses[name])
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    results = {'threads': threads, 'duration': round(elapsed, 2), 'scenarios': {}}
+    all_latencies = []
+    all_statuses = Counter()
+    for name, blueprint, _, _ in scenarios:
+        results['scenarios'][name] = {'blueprint': blueprint,
+                                      **summarize(latencies[name], statuses[name], elapsed)}
+        all_latencies.extend(latencies[name])
+        all_statuses.update(statuses[name])
+    results['overall'] = summarize(all_latencies, all_statuses, elapsed)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the API against a synthetic database')
+    parser.add_argument('--database', help='existing benchmark database (default: generate one)')
+    parser.add_argument('--lawyers', type=int, default=1000, help='lawyers when generating')
+    parser.add_argument('--users', type=int, default=100000, help='users when generating')
+    parser.add_argument('--iterations', type=int, default=200, help='test-client requests per scenario')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=8, help='HTTP client threads')
+    parser.add_argument('--duration', type=float, default=10, help='HTTP phase length in seconds')
+    parser.add_argument('--scenarios', help='comma-separated scenario names (default: all)')
+    parser.add_argument('--skip-http', action='store_true')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<time>-<rev>.json)')
+    args = parser.parse_args(argv)
+
+    database = args.database
+    if database is None:
+        database = os.path.join(BENCHMARK_DIR, 'data', f'bench-{args.lawyers}-{args.users}.db')
+        if not os.path.exists(database):
+            print(f'Generating {database}', file=sys.stderr)
+            generate_database(database, args.lawyers, args.users,
+                              progress=lambda message: print(f'  {message}', file=sys.stderr))
+    counts = database_counts(database)
+    selected = set(args.scenarios.split(',')) if args.scenarios else {name for name, *_ in SCENARIOS}
+
+    app = load_app(database)
+    rng = random.Random(args.seed)
+    context = build_context(app, counts['lawyers'], counts['users'] - 1, rng)
+    revision = git_revision()
+    results = {
+        'meta': {
+            'revision': revision,
+            'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args),
+        },
+        'database': {'path': database, **counts},
+    }
+
+    print('Test client phase', file=sys.stderr)
+    results['testClient'] = run_test_client(app, context, args.iterations, args.warmup, rng, selected)
+    results['peakRssMb'] = {'testClient': peak_rss_mb()}
+    if not args.skip_http:
+        print(f'HTTP phase ({args.threads} threads, {args.duration}s)', file=sys.stderr)
+        results['http'] = run_http(app, context, args.threads, args.duration, args.seed, selected)
+        results['peakRssMb']['http'] = peak_rss_mb()
+        overall = results['http']['overall']
+        print(f"  {overall['throughput']} req/s  p50 {overall['p50']} ms  p95 {overall['p95']} ms  "
+              f"p99 {overall['p99']} ms", file=sys.stderr)
+
+    output = args.output or os.path.join(
+        BENCHMARK_DIR, 'results',
+        f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{revision or 'unknown'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {output}', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
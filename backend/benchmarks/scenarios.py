@@ -0,0 +1,109 @@
+"""Request scenarios covering every API blueprint.
+
+Each scenario builds one request from a shared context (lawyer/user counts
+and pre-issued tokens) and a random generator, so the same scenario list
+drives both the Flask test client and the HTTP load generator.
+"""
+import json
+
+from benchmarks.datagen import PRACTICE_AREAS, STATES, BENCHMARK_PASSWORD
+
+SEARCH_TERMS = ['family', 'divorce', 'sydney', 'visa', 'property', 'mitchell', 'estate', 'contracts']
+
+class Request:
+    __slots__ = ('method', 'path', 'headers', 'body')
+
+    def __init__(self, method, path, headers=None, body=None):
+        self.method = method
+        self.path = path
+        self.headers = headers or {}
+        self.body = body
+
+def _auth(context, rng):
+    user_id, token = rng.choice(context['tokens'])
+    return user_id, {'Authorization': f'Bearer {token}'}
+
+def _json(headers):
+    return {**headers, 'Content-Type': 'application/json'}
+
+def login(context, rng):
+    user_id, _ = rng.choice(context['tokens'])
+    body = {'email': f'user{user_id - 1}@bench.test', 'password': BENCHMARK_PASSWORD}
+    return Request('POST', '/api/auth/login', _json({}), json.dumps(body))
+
+def me(context, rng):
+    return Request('GET', '/api/auth/me', _auth(context, rng)[1])
+
+def lawyers_list(context, rng):
+    return Request('GET', '/api/lawyers/?limit=50')
+
+def lawyers_filtered(context, rng):
+    area = rng.choice(list(PRACTICE_AREAS))
+    state = rng.choice(list(STATES))
+    sort = rng.choice(['experience_years', 'hourly_rate_min', 'success_rate'])
+    return Request('GET', f'/api/lawyers/?practiceArea={area}&state={state}&sortBy={sort}&limit=50')
+
+def lawyers_search(context, rng):
+    return Request('GET', f'/api/lawyers/search?q={rng.choice(SEARCH_TERMS)}')
+
+def lawyers_facets(context, rng):
+    return Request('GET', f'/api/lawyers/facets?state={rng.choice(list(STATES))}')
+
+def lawyers_best_match(context, rng):
+    _, lat, lng = rng.choice(STATES[rng.choice(list(STATES))][1])
+    return Request('GET', f'/api/lawyers/best-match?budget={rng.randrange(200, 600, 50)}&lat={lat}&lng={lng}')
+
+def lawyers_detail(context, rng):
+    return Request('GET', f'/api/lawyers/{rng.randint(1, context["lawyers"])}')
+
+def lawyers_similar(context, rng):
+    return Request('GET', f'/api/lawyers/{rng.randint(1, context["lawyers"])}/similar')
+
+def lawyers_batch(context, rng):
+    ids = ','.join(str(rng.randint(1, context['lawyers'])) for _ in range(20))
+    return Request('GET', f'/api/lawyers/batch?ids={ids}')
+
+def lawyers_nearby(context, rng):
+    _, lat, lng = rng.choice(STATES[rng.choice(list(STATES))][1])
+    return Request('GET', f'/api/lawyers/nearby?lat={lat}&lng={lng}&radiusKm=25&limit=20')
+
+def shortlist_get(context, rng):
+    return Request('GET', '/api/shortlist/', _auth(context, rng)[1])
+
+def shortlist_put(context, rng):
+    _, headers = _auth(context, rng)
+    ids = rng.sample(range(1, context['lawyers'] + 1), 4)
+    body = {'add': ids[:3], 'remove': ids[3:]}
+    return Request('PUT', '/api/shortlist/', _json(headers), json.dumps(body))
+
+def comparison_get(context, rng):
+    return Request('GET', '/api/comparison/', _auth(context, rng)[1])
+
+def history_get(context, rng):
+    return Request('GET', '/api/history/', _auth(context, rng)[1])
+
+def history_post(context, rng):
+    _, headers = _auth(context, rng)
+    body = {'practiceArea': rng.choice(list(PRACTICE_AREAS)), 'state': rng.choice(list(STATES)),
+            'resultCount': rng.randint(0, 200)}
+    return Request('POST', '/api/history/', _json(headers), json.dumps(body))
+
+# (name, blueprint, weight in the mixed HTTP load, builder)
+SCENARIOS = [
+    ('auth.login', 'auth', 1, login),
+    ('auth.me', 'auth', 2, me),
+    ('lawyers.list', 'lawyers', 5, lawyers_list),
+    ('lawyers.filtered', 'lawyers', 5, lawyers_filtered),
+    ('lawyers.search', 'lawyers', 3, lawyers_search),
+    ('lawyers.facets', 'lawyers', 2, lawyers_facets),
+    ('lawyers.best_match', 'lawyers', 2, lawyers_best_match),
+    ('lawyers.detail', 'lawyers', 4, lawyers_detail),
+    ('lawyers.similar', 'lawyers', 2, lawyers_similar),
+    ('lawyers.batch', 'lawyers', 2, lawyers_batch),
+    ('lawyers.nearby', 'lawyers', 2, lawyers_nearby),
+    ('shortlist.get', 'shortlist', 3, shortlist_get),
+    ('shortlist.put', 'shortlist', 2, shortlist_put),
+    ('comparison.get', 'comparison', 2, comparison_get),
+    ('history.get', 'history', 2, history_get),
+    ('history.post', 'history', 3, history_post),
+]
@@ -0,0 +1,396 @@
+"""Streaming bulk import of lawyers from JSON, NDJSON or CSV.
+
+Records are parsed incrementally (a JSON array is decoded one element at a
+time), validated and normalized, then upserted in large executemany batches,
+one transaction per batch. The natural key is ``external_id``: a record's
+``externalId`` if it has one, otherwise its lowercased name|firm|state.
+
+Both the API schema (practiceArea, hourlyRateMin, locationCity, ...) and the
+frontend's ``lawyers.json`` schema (location, state, hourlyRate, lat/lng,
+"Family Law", ...) are accepted.
+
+Usage (from the backend directory):
+    python -m database.bulk_import ../frontend/src/data/lawyers.json
+    python -m database.bulk_import lawyers.csv --batch-size 10000
+
+The CLI rebuilds indexes after loading (see deferred_indexes); pass
+--keep-indexes when importing a small file into a live database. The
+similar-lawyer lists of every practice area the import touched are rebuilt
+at the end (skip with --similar-neighbors 0 and run
+``python -m services.similarity`` later).
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from database.db import INDEXES, connection, create_schema
+from middleware.etags import bump_version
+from services.similarity import DEFAULT_NEIGHBORS, MAX_NEIGHBORS, rebuild_similar
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 20
+READ_CHUNK_SIZE = 64 * 1024
+
+# Largest single JSON record; a value still undecodable past this is malformed
+MAX_RECORD_SIZE = 1024 * 1024
+
+# A \uXXXX escape cut by a chunk boundary fails up to this far from the end
+_TRUNCATION_SLACK = 6
+
+IMPORT_COLUMNS = (
+    'external_id', 'name', 'firm', 'tier', 'practice_area', 'specialties', 'experience_years',
+    'case_count', 'success_rate', 'hourly_rate_min', 'hourly_rate_max', 'location_city',
+    'location_state', 'verified', 'mediation_certified', 'response_guarantee', 'mara_number',
+    'bio', 'avatar_color', 'lat', 'lng'
+)
+
+UPSERT_SQL = '''
+    INSERT INTO lawyers ({columns}) VALUES ({placeholders})
+    ON CONFLICT(external_id) DO UPDATE SET {updates}, version = lawyers.version + 1
+'''.format(
+    columns=', '.join(IMPORT_COLUMNS),
+    placeholders=', '.join('?' for _ in IMPORT_COLUMNS),
+    updates=', '.join(f'{column} = excluded.{column}' for column in IMPORT_COLUMNS[1:])
+)
+
+FORMATS = ('json', 'ndjson', 'csv')
+
+# Maintained per row by triggers; rebuilt in one pass after a deferred load
+SYNC_TRIGGERS = ('lawyers_fts_insert', 'lawyers_fts_update', 'lawyers_fts_delete',
+                 'lawyers_geo_insert', 'lawyers_geo_update', 'lawyers_geo_delete')
+
+# --- parsing -----------------------------------------------------------------
+
+def iter_json(stream):
+    """Yield records from a JSON array (or NDJSON) text stream without loading it whole"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    in_array = None
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    while True:
+        # Skip whitespace and array punctuation between values
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            fill()
+        if position >= len(buffer):
+            return
+        if in_array is None:
+            in_array = buffer[position] == '['
+            if in_array:
+                position += 1
+                continue
+        if in_array and buffer[position] == ']':
+            return
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            # A record cut off by the chunk boundary fails at the end of the
+            # buffer (an unterminated string where it starts); any other error
+            # is malformed input that more data will not fix
+            truncated = (e.pos >= len(buffer) - _TRUNCATION_SLACK
+                         or e.msg.startswith('Unterminated string'))
+            if eof or not truncated or len(buffer) - position > MAX_RECORD_SIZE:
+                raise
+            fill()
+            continue
+        if end == len(buffer) and not eof:
+            # A number at the end of the buffer may continue in the next chunk
+            fill()
+            continue
+        position = end
+        yield record
+
+def iter_csv(stream):
+    """Yield records from a CSV text stream with a header row"""
+    for row in csv.DictReader(stream):
+        yield {key: value for key, value in row.items() if value not in (None, '')}
+
+def iter_records(stream, fmt):
+    """Yield raw records from a text stream in the given format"""
+    if fmt == 'csv':
+        return iter_csv(stream)
+    return iter_json(stream)
+
+def detect_format(path=None, content_type=None):
+    """Guess the import format from a file name or content type"""
+    hint = (path or content_type or '').lower()
+    if hint.endswith('.csv') or 'csv' in hint:
+        return 'csv'
+    if hint.endswith('.ndjson') or hint.endswith('.jsonl') or 'ndjson' in hint:
+        return 'ndjson'
+    return 'json'
+
+# --- validation --------------------------------------------------------------
+
+def _first(record, *keys):
+    for key in keys:
+        value = record.get(key)
+        if value not in (None, ''):
+            return value
+    return None
+
+def parse_number(value, name, cast=float):
+    """Finite number (None stays None) cast to int or float, or raise ValueError"""
+    try:
+        if value is None:
+            return None
+        if isinstance(value, bool) or not math.isfinite(float(value)):
+            raise ValueError
+        return int(float(value)) if cast is int else cast(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f'{name} must be a number')
+
+def parse_text(value, name):
+    """String value (None stays None), or raise ValueError for lists, objects and booleans"""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError(f'{name} must be text')
+    return str(value)
+
+def _flag(value):
+    if isinstance(value, str):
+        return 1 if value.strip().lower() in ('1', 'true', 'yes', 'y') else 0
+    return 1 if value else 0
+
+def normalize_practice_area(value):
+    """'Family Law' -> 'family', matching the practice_area values the API uses"""
+    area = str(value).strip().lower()
+    if area.endswith(' law'):
+        area = area[:-4]
+    return area.replace(' ', '-')
+
+def natural_key(record, name, firm, state):
+    explicit = _first(record, 'externalId', 'external_id')
+    if explicit is not None:
+        return parse_text(explicit, 'externalId')
+    return '|'.join(part.strip().lower() for part in (name, firm, state))
+
+def normalize_record(record):
+    """Map an API- or lawyers.json-shaped record to an IMPORT_COLUMNS tuple, or raise ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError('record must be an object')
+
+    name = parse_text(_first(record, 'name'), 'name')
+    firm = parse_text(_first(record, 'firm'), 'firm')
+    practice_area = parse_text(_first(record, 'practiceArea', 'practice_area'), 'practiceArea')
+    city = parse_text(_first(record, 'locationCity', 'location_city', 'location'), 'locationCity')
+    state = parse_text(_first(record, 'locationState', 'location_state', 'state'), 'locationState')
+    experience = parse_number(_first(record, 'experienceYears', 'experience_years'), 'experienceYears', int)
+    rate_min = parse_number(_first(record, 'hourlyRateMin', 'hourly_rate_min', 'hourlyRate'), 'hourlyRateMin')
+    rate_max = parse_number(_first(record, 'hourlyRateMax', 'hourly_rate_max', 'hourlyRate'), 'hourlyRateMax')
+
+    missing = [label for label, value in (
+        ('name', name), ('firm', firm), ('practiceArea', practice_area), ('locationCity', city),
+        ('locationState', state), ('experienceYears', experience), ('hourlyRateMin', rate_min)
+    ) if value is None]
+    if missing:
+        raise ValueError('missing ' + ', '.join(missing))
+    if rate_max is None:
+        rate_max = rate_min
+    if rate_min < 0 or rate_max < rate_min:
+        raise ValueError('hourly rates must satisfy 0 <= hourlyRateMin <= hourlyRateMax')
+
+    specialties = _first(record, 'specialties') or []
+    if isinstance(specialties, str):
+        try:
+            specialties = json.loads(specialties)
+        except ValueError:
+            specialties = [item.strip() for item in specialties.split(';') if item.strip()]
+    if not isinstance(specialties, list):
+        raise ValueError('specialties must be a list')
+
+    lat = parse_number(_first(record, 'lat', 'latitude'), 'lat')
+    lng = parse_number(_first(record, 'lng', 'longitude'), 'lng')
+    if (lat is None) != (lng is None):
+        raise ValueError('lat and lng must be given together')
+    if lat is not None and not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError('lat/lng out of range')
+
+    success_rate = parse_number(_first(record, 'successRate', 'success_rate'), 'successRate', int)
+    return (
+        natural_key(record, name, firm, state),
+        name.strip(),
+        firm.strip(),
+        parse_text(_first(record, 'tier'), 'tier') or 'mid',
+        normalize_practice_area(practice_area),
+        json.dumps(specialties),
+        experience,
+        parse_number(_first(record, 'caseCount', 'case_count'), 'caseCount', int) or 0,
+        75 if success_rate is None else success_rate,
+        rate_min,
+        rate_max,
+        city.strip(),
+        state.strip().upper(),
+        _flag(_first(record, 'verified')),
+        _flag(_first(record, 'mediationCertified', 'mediation_certified')),
+        _flag(_first(record, 'responseGuarantee', 'response_guarantee')),
+        parse_text(_first(record, 'maraNumber', 'mara_number'), 'maraNumber'),
+        parse_text(_first(record, 'bio'), 'bio'),
+        parse_text(_first(record, 'avatarColor', 'avatar_color'), 'avatarColor') or '#000000',
+        lat,
+        lng,
+    )
+
+# --- loading -----------------------------------------------------------------
+
+def _write_batch(conn, batch):
+    """Upsert a batch; returns (rows that existed, practice areas before and after)"""
+    keys = json.dumps([row[0] for row in batch])
+    previous = conn.execute(
+        'SELECT practice_area FROM lawyers WHERE external_id IN (SELECT value FROM json_each(?))',
+        (keys,)
+    ).fetchall()
+    conn.executemany(UPSERT_SQL, batch)
+    bump_version(conn, 'lawyers')
+    conn.commit()
+    return len(previous), {row[0] for row in previous} | {row[4] for row in batch}
+
+@contextmanager
+def deferred_indexes(conn):
+    """Drop the listing indexes and FTS/R*Tree triggers for a large load, then rebuild.
+
+    Maintaining ~15 secondary indexes, the FTS index and the R*Tree row by
+    row costs several times more than the inserts themselves; building them
+    once afterwards is much cheaper. Searches and filtered listings run
+    slowly (and the search index is stale) until the load finishes, so this
+    is meant for offline or off-peak loads.
+    """
+    for name in INDEXES:
+        if name.startswith('idx_lawyers_'):
+            conn.execute(f'DROP INDEX IF EXISTS {name}')
+    for name in SYNC_TRIGGERS:
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+    conn.commit()
+    try:
+        yield
+    finally:
+        create_schema(conn.cursor())
+        conn.execute("INSERT INTO lawyers_fts (lawyers_fts) VALUES ('rebuild')")
+        conn.execute('DELETE FROM lawyers_geo')
+        conn.execute('''
+            INSERT INTO lawyers_geo
+            SELECT id, lat, lat, lng, lng FROM lawyers WHERE lat IS NOT NULL AND lng IS NOT NULL
+        ''')
+        conn.commit()
+
+def import_lawyers(conn, records, batch_size=DEFAULT_BATCH_SIZE, progress=None,
+                   similar_neighbors=DEFAULT_NEIGHBORS):
+    """Validate and upsert records in batches; returns a summary dict.
+
+    progress, if given, is called with the running summary after each batch.
+    Afterwards the similar-lawyer lists of the practice areas written to are
+    rebuilt with similar_neighbors per list (0 skips the rebuild).
+    """
+    summary = {'processed': 0, 'inserted': 0, 'updated': 0, 'rejected': 0,
+               'batches': 0, 'errors': [], 'similarRows': 0, 'seconds': 0.0}
+    started = time.perf_counter()
+    batch = {}
+    areas = set()
+
+    def flush():
+        rows = list(batch.values())
+        batch.clear()
+        existing, written = _write_batch(conn, rows)
+        areas.update(written)
+        summary['updated'] += existing
+        summary['inserted'] += len(rows) - existing
+        summary['batches'] += 1
+        summary['seconds'] = round(time.perf_counter() - started, 3)
+        if progress:
+            progress(summary)
+
+    try:
+        for index, record in enumerate(records, start=1):
+            summary['processed'] += 1
+            try:
+                row = normalize_record(record)
+            except ValueError as e:
+                summary['rejected'] += 1
+                if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                    summary['errors'].append({'record': index, 'error': str(e)})
+                continue
+            # Later duplicates of a key within one batch win, as they would across batches
+            batch[row[0]] = row
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if areas and similar_neighbors:
+        summary['similarRows'] = rebuild_similar(conn, similar_neighbors, areas=sorted(areas, key=str))['rows']
+        bump_version(conn, 'similar')
+        conn.commit()
+
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+def import_stream(conn, binary_stream, fmt, batch_size=DEFAULT_BATCH_SIZE, progress=None,
+                  defer_indexes=False, similar_neighbors=DEFAULT_NEIGHBORS):
+    """Import from a binary stream (file or request body)"""
+    if not isinstance(binary_stream, io.BufferedIOBase):
+        binary_stream = io.BufferedReader(binary_stream)
+    text = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+    if not defer_indexes:
+        return import_lawyers(conn, iter_records(text, fmt), batch_size, progress, similar_neighbors)
+    with deferred_indexes(conn):
+        return import_lawyers(conn, iter_records(text, fmt), batch_size, progress, similar_neighbors)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk import lawyers from JSON, NDJSON or CSV')
+    parser.add_argument('path', help='file to import')
+    parser.add_argument('--format', choices=FORMATS, help='input format (default: from extension)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--keep-indexes', action='store_true',
+                        help='maintain indexes row by row instead of rebuilding them afterwards')
+    parser.add_argument('--similar-neighbors', type=int,
+                        default=int(os.getenv('SIMILAR_NEIGHBORS', DEFAULT_NEIGHBORS)),
+                        help='rebuild similar-lawyer lists of the imported areas with this many per lawyer (0 to skip)')
+    args = parser.parse_args(argv)
+    if not 0 <= args.similar_neighbors <= MAX_NEIGHBORS:
+        parser.error(f'--similar-neighbors must be between 0 and {MAX_NEIGHBORS}')
+
+    fmt = args.format or detect_format(path=args.path)
+
+    def report(summary):
+        print(f"\r{summary['processed']} processed, {summary['inserted']} inserted, "
+              f"{summary['updated']} updated, {summary['rejected']} rejected "
+              f"({summary['seconds']}s)", end='', file=sys.stderr, flush=True)
+
+    with connection() as conn:
+        create_schema(conn.cursor())
+        conn.commit()
+        with open(args.path, 'rb') as f:
+            summary = import_stream(conn, f, fmt, args.batch_size, report,
+                                    defer_indexes=not args.keep_indexes,
+                                    similar_neighbors=args.similar_neighbors)
+    print(file=sys.stderr)
+    for error in summary['errors']:
+        print(f"record {error['record']}: {error['error']}", file=sys.stderr)
+    print(json.dumps({key: value for key, value in summary.items() if key != 'errors'}))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
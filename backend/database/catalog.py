@@ -0,0 +1,452 @@
+"""In-process columnar catalog of the lawyers table.
+
+The directory is read far more often than it is written, so the whole
+``lawyers`` table is loaded once into per-column lists. Every row occupies a
+slot; a set of rows is a Python int used as a bitset (bit ``slot`` set), which
+makes filter intersection a handful of C-level ``&`` operations.
+
+* Categorical and numeric filter columns keep one bitset per distinct value.
+  Equality filters pick a bitset; range filters OR the bitsets of the values
+  in range (found by bisecting the sorted distinct values) and are memoized
+  until the next write.
+* Each sortable column keeps a sorted index of ``(value, id)`` keys, so a
+  keyset page is either a walk down that index from the cursor, or (when
+  the walk would visit more rows than match) a heap selection of the top
+  rows among the matches.
+
+Admin writes call ``refresh_lawyer`` / ``remove`` after committing so the
+catalog is updated incrementally instead of reloaded. The slots each write
+touched are kept in a short change log, so derived per-slot data (the
+ranking columns) can be patched rather than rebuilt.
+"""
+import heapq
+import re
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+# Columns that get per-value bitsets
+CATEGORICAL_FIELDS = ('practice_area', 'location_state', 'tier', 'verified',
+                      'mediation_certified', 'response_guarantee')
+NUMERIC_FIELDS = ('experience_years', 'hourly_rate_min', 'hourly_rate_max', 'success_rate')
+
+# Columns read as numbers. SQLite is dynamically typed, so anything else stored
+# in them is treated as NULL: one bad row must not break sorting or ranking.
+NUMBER_COLUMNS = NUMERIC_FIELDS + ('case_count', 'lat', 'lng')
+
+# Columns with a sorted (value, id) index, matching the listing sortBy options
+SORTED_FIELDS = ('id', 'experience_years', 'hourly_rate_min', 'success_rate')
+
+# 0/1 columns counted as a single "true" total in facets
+FLAG_FIELDS = ('verified', 'mediation_certified', 'response_guarantee')
+
+# Facet column -> the match() filter it is excluded from when counting
+FACET_FILTERS = {'practice_area': 'practice_area', 'location_state': 'state',
+                 'experience_years': 'min_experience', 'hourly_rate_min': 'max_rate',
+                 'response_guarantee': 'response_guarantee'}
+
+# Bit positions set in each byte value, for expanding a bitset into slots
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+_NONZERO_BYTE = re.compile(b'[^\x00]')
+
+_LOWEST = float('-inf')  # sort key for NULLs, which sort last in DESC order
+
+# Sort column -> the match() filter that caps it from above
+UPPER_BOUND_FILTERS = {'hourly_rate_min': 'max_rate'}
+
+# How far past its estimated length an index walk may run before query()
+# falls back to selecting from the matches
+WALK_SLACK = 4
+
+# Incremental writes remembered for snapshot() deltas; older readers get full copies
+MAX_CHANGE_LOG = 1024
+
+if hasattr(int, 'bit_count'):
+    def popcount(bits):
+        return bits.bit_count()
+else:  # Python < 3.10
+    def popcount(bits):
+        return bin(bits).count('1')
+
+def bits_from_slots(slots, size):
+    """Build a bitset with the given slots set"""
+    buf = bytearray((size + 7) // 8)
+    for slot in slots:
+        buf[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(buf, 'little')
+
+def iter_slots(bits):
+    """Yield the set slots of a bitset in ascending order"""
+    if not bits:
+        return
+    raw = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    for match in _NONZERO_BYTE.finditer(raw):
+        base = match.start() << 3
+        for bit in _BYTE_BITS[raw[match.start()]]:
+            yield base + bit
+
+_NUMBER_TYPES = {int, float, type(None)}
+
+def number_or_none(value):
+    """value if it is an int or float, otherwise None"""
+    return value if type(value) in _NUMBER_TYPES else None
+
+def _sort_key(value):
+    return _LOWEST if value is None else value
+
+class LawyerCatalog:
+    """Columnar, bitset-indexed copy of the lawyers table"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.version = 0
+        self.source_version = None  # 'lawyers' change counter the contents reflect
+        self.column_names = []
+        self.columns = {}
+        self.slots = {}          # lawyer id -> slot
+        self.free_slots = []
+        self.alive = 0
+        self.bitsets = {}        # field -> {value: bitset}
+        self.values = {}         # numeric field -> sorted distinct non-null values
+        self.sorted_keys = {}    # sort field -> sorted [(value, id)]
+        self._range_cache = {}
+        self._change_log = []    # (version, slot) of each write since the last load
+
+    def __len__(self):
+        return len(self.slots)
+
+    def load(self, conn, source_version=None, batch_size=5000):
+        """Replace the catalog contents with the current lawyers table"""
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM lawyers')
+        names = [col[0] for col in cursor.description]
+        columns = {name: [] for name in names}
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                for name, value in zip(names, row):
+                    columns[name].append(value)
+        for name in NUMBER_COLUMNS:
+            if not set(map(type, columns[name])) <= _NUMBER_TYPES:
+                columns[name] = [number_or_none(value) for value in columns[name]]
+
+        size = len(columns['id'])
+        slot_lists = {}
+        for field in CATEGORICAL_FIELDS + NUMERIC_FIELDS:
+            per_value = slot_lists[field] = {}
+            for slot, value in enumerate(columns[field]):
+                per_value.setdefault(value, []).append(slot)
+
+        with self._lock:
+            self.column_names = names
+            self.columns = columns
+            self.slots = {lawyer_id: slot for slot, lawyer_id in enumerate(columns['id'])}
+            self.free_slots = []
+            self.alive = (1 << size) - 1
+            self.bitsets = {
+                field: {value: bits_from_slots(slots, size) for value, slots in per_value.items()}
+                for field, per_value in slot_lists.items()
+            }
+            self.values = {
+                field: sorted(value for value in slot_lists[field] if value is not None)
+                for field in NUMERIC_FIELDS
+            }
+            self.sorted_keys = {
+                field: sorted(zip(map(_sort_key, columns[field]), columns['id']))
+                for field in SORTED_FIELDS
+            }
+            self._range_cache = {}
+            self._change_log = []
+            self.version += 1
+            self.source_version = source_version
+        return self
+
+    def _row(self, slot):
+        return {name: self.columns[name][slot] for name in self.column_names}
+
+    def get(self, lawyer_id):
+        """Return one lawyer row as a dict, or None"""
+        with self._lock:
+            slot = self.slots.get(lawyer_id)
+            return None if slot is None else self._row(slot)
+
+    def _range_bits(self, field, low=None, high=None):
+        """Bitset of rows with low <= field <= high (memoized until the next write)"""
+        key = (field, low, high)
+        bits = self._range_cache.get(key)
+        if bits is None:
+            values = self.values[field]
+            start = 0 if low is None else bisect_left(values, low)
+            stop = len(values) if high is None else bisect_right(values, high)
+            per_value = self.bitsets[field]
+            bits = 0
+            for value in values[start:stop]:
+                bits |= per_value[value]
+            self._range_cache[key] = bits
+        return bits
+
+    def match(self, practice_area=None, state=None, min_experience=None, max_rate=None,
+              response_guarantee=False):
+        """Bitset of rows matching the listing filters"""
+        mask = self.alive
+        if practice_area:
+            mask &= self.bitsets['practice_area'].get(practice_area, 0)
+        if state:
+            mask &= self.bitsets['location_state'].get(state, 0)
+        if min_experience:
+            mask &= self._range_bits('experience_years', low=min_experience)
+        if max_rate:
+            mask &= self._range_bits('hourly_rate_min', high=max_rate)
+        if response_guarantee:
+            mask &= self.bitsets['response_guarantee'].get(1, 0)
+        return mask
+
+    def snapshot(self, filters, names, have_version=None):
+        """(version, match bitset, columns, changed) taken atomically.
+
+        Columns are indexed by slot. When have_version is still current the
+        caller's earlier copies are valid and columns is None. When the change
+        log reaches back to have_version, changed is the set of slots written
+        since and columns holds only those ({name: {slot: value}}); otherwise
+        changed is None and columns are full copies ({name: list}).
+        """
+        with self._lock:
+            mask = self.match(**filters)
+            if have_version == self.version:
+                return self.version, mask, None, None
+            changed = self._changed_since(have_version)
+            if changed is None:
+                return self.version, mask, {name: list(self.columns[name]) for name in names}, None
+            columns = {name: {slot: self.columns[name][slot] for slot in changed} for name in names}
+            return self.version, mask, columns, changed
+
+    def _changed_since(self, version):
+        """Slots written after version, or None if the log does not reach back that far"""
+        log = self._change_log
+        if version is None or not log or log[0][0] > version + 1:
+            return None
+        return {slot for logged, slot in log[bisect_right(log, (version, float('inf'))):]}
+
+    def _log_change(self, slot):
+        self.version += 1
+        self._change_log.append((self.version, slot))
+        if len(self._change_log) > MAX_CHANGE_LOG:
+            del self._change_log[:MAX_CHANGE_LOG // 2]
+
+    def _bucket_bits(self, field, bounds):
+        """Bitsets for (low, high) buckets, high exclusive (memoized until the next write)"""
+        key = ('buckets', field, bounds)
+        bits = self._range_cache.get(key)
+        if bits is None:
+            values = self.values[field]
+            per_value = self.bitsets[field]
+            bits = []
+            for low, high in bounds:
+                start = 0 if low is None else bisect_left(values, low)
+                stop = len(values) if high is None else bisect_left(values, high)
+                bucket = 0
+                for value in values[start:stop]:
+                    bucket |= per_value[value]
+                bits.append(bucket)
+            self._range_cache[key] = bits
+        return bits
+
+    def facets(self, filters, buckets):
+        """Facet counts with every filter applied except the facet's own.
+
+        filters is the keyword set accepted by match(); buckets maps numeric
+        fields to a tuple of (low, high) bounds. Returns {'total': n, field:
+        {value: count} for categorical fields, field: count for flags, and
+        field: [count per bucket] for bucketed fields}.
+        """
+        with self._lock:
+            masks = {key: self.match(**{key: value}) for key, value in filters.items() if value}
+
+            def base(excluded=None):
+                mask = self.alive
+                for key, bits in masks.items():
+                    if key != excluded:
+                        mask &= bits
+                return mask
+
+            result = {'total': popcount(base())}
+            for field in CATEGORICAL_FIELDS:
+                mask = base(FACET_FILTERS.get(field))
+                per_value = self.bitsets[field]
+                if field in FLAG_FIELDS:
+                    result[field] = popcount(mask & per_value.get(1, 0))
+                else:
+                    result[field] = {value: popcount(mask & bits)
+                                     for value, bits in per_value.items() if value is not None}
+            for field, bounds in buckets.items():
+                mask = base(FACET_FILTERS.get(field))
+                result[field] = [popcount(mask & bits) for bits in self._bucket_bits(field, bounds)]
+            return result
+
+    def query(self, filters, sort_field='id', position=None, limit=50):
+        """Return up to limit matching rows in DESC keyset order after position.
+
+        filters is the keyword set accepted by match(); position is the
+        (value, id) of the last row on the previous page, where a None value
+        (NULL) sorts after every other value.
+        """
+        with self._lock:
+            mask = self.match(**filters)
+            matched = popcount(mask)
+            if not matched:
+                return []
+
+            keys = self.sorted_keys[sort_field]
+            if position is None:
+                after = None
+                end = len(keys)
+            else:
+                after = (position[1] if sort_field == 'id' else _sort_key(position[0]), position[1])
+                end = bisect_left(keys, after)
+            bound = filters.get(UPPER_BOUND_FILTERS.get(sort_field))
+            if bound:
+                # Nothing above the filter's bound on the sort column can match
+                end = min(end, bisect_right(keys, (bound, float('inf'))))
+
+            # Walking the index visits about len / matched rows per hit, while
+            # selecting visits each match once
+            estimate = end * limit // matched
+            if estimate >= matched:
+                return self._select(mask, sort_field, after, limit)
+
+            # Walk the sort index downwards and test membership. A filter
+            # correlated with the sort order (maxRate when sorting by rate)
+            # finds nothing for a long stretch, so give up and select then.
+            raw = mask.to_bytes((len(self.columns['id']) + 7) // 8, 'little')
+            slots = self.slots
+            rows = []
+            stop = max(end - WALK_SLACK * estimate, 0)
+            for index in range(end - 1, stop - 1, -1):
+                slot = slots[keys[index][1]]
+                if raw[slot >> 3] >> (slot & 7) & 1:
+                    rows.append(self._row(slot))
+                    if len(rows) == limit:
+                        return rows
+            if stop == 0:
+                return rows
+            return self._select(mask, sort_field, after, limit)
+
+    def _select(self, mask, sort_field, after, limit):
+        """Top limit matching rows before after, by a partial selection over the matches"""
+        column = self.columns[sort_field]
+        ids = self.columns['id']
+        candidates = ((_sort_key(column[slot]), ids[slot], slot) for slot in iter_slots(mask))
+        if after is not None:
+            candidates = (candidate for candidate in candidates if candidate[:2] < after)
+        return [self._row(slot) for _, _, slot in heapq.nlargest(limit, candidates)]
+
+    def _unindex(self, slot):
+        clear = ~(1 << slot)
+        lawyer_id = self.columns['id'][slot]
+        self.alive &= clear
+        for field in CATEGORICAL_FIELDS + NUMERIC_FIELDS:
+            value = self.columns[field][slot]
+            per_value = self.bitsets[field]
+            remaining = per_value[value] & clear
+            if remaining:
+                per_value[value] = remaining
+            else:
+                del per_value[value]
+                if field in self.values and value is not None:
+                    values = self.values[field]
+                    del values[bisect_left(values, value)]
+        for field in SORTED_FIELDS:
+            keys = self.sorted_keys[field]
+            del keys[bisect_left(keys, (_sort_key(self.columns[field][slot]), lawyer_id))]
+
+    def _index(self, slot):
+        bit = 1 << slot
+        lawyer_id = self.columns['id'][slot]
+        self.alive |= bit
+        for field in CATEGORICAL_FIELDS + NUMERIC_FIELDS:
+            value = self.columns[field][slot]
+            per_value = self.bitsets[field]
+            if value not in per_value:
+                per_value[value] = 0
+                if field in self.values and value is not None:
+                    insort(self.values[field], value)
+            per_value[value] |= bit
+        for field in SORTED_FIELDS:
+            insort(self.sorted_keys[field], (_sort_key(self.columns[field][slot]), lawyer_id))
+
+    def upsert(self, row):
+        """Insert or replace one lawyer row"""
+        row = dict(row)
+        for name in NUMBER_COLUMNS:
+            if name in row:
+                row[name] = number_or_none(row[name])
+        with self._lock:
+            slot = self.slots.get(row['id'])
+            if slot is not None:
+                self._unindex(slot)
+            elif self.free_slots:
+                slot = self.free_slots.pop()
+            else:
+                slot = len(self.columns['id'])
+                for column in self.columns.values():
+                    column.append(None)
+            for name in self.column_names:
+                self.columns[name][slot] = row.get(name)
+            self.slots[row['id']] = slot
+            self._index(slot)
+            self._range_cache = {}
+            self._log_change(slot)
+
+    def remove(self, lawyer_id):
+        """Drop one lawyer row; returns False if it was not present"""
+        with self._lock:
+            slot = self.slots.pop(lawyer_id, None)
+            if slot is None:
+                return False
+            self._unindex(slot)
+            for name in self.column_names:
+                self.columns[name][slot] = None
+            self.free_slots.append(slot)
+            self._range_cache = {}
+            self._log_change(slot)
+            return True
+
+    def refresh_lawyer(self, conn, lawyer_id):
+        """Re-read one lawyer after a committed write and apply it"""
+        row = conn.execute('SELECT * FROM lawyers WHERE id = ?', (lawyer_id,)).fetchone()
+        if row is None:
+            self.remove(lawyer_id)
+        else:
+            self.upsert(row)
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog(conn, source_version=None):
+    """Get the process-wide catalog, loading it from conn on first use.
+
+    When source_version (the current 'lawyers' change counter) differs from the
+    one the catalog was built from, another process has written lawyers since,
+    so the catalog is reloaded.
+    """
+    global _catalog
+    catalog = _catalog
+    if catalog is None or catalog.source_version != source_version:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = LawyerCatalog().load(conn, source_version)
+            elif _catalog.source_version != source_version:
+                _catalog.load(conn, source_version)
+            catalog = _catalog
+    return catalog
+
+def loaded_catalog():
+    """Get the catalog if it has been loaded, without loading it"""
+    return _catalog
+
+def reset_catalog():
+    """Discard the catalog so the next get_catalog() reloads it"""
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
@@ -1,104 +1,425 @@
 import sqlite3
 import os
+import threading
 import bcrypt
+from contextlib import contextmanager
 from pathlib import Path
+from flask import g, has_app_context
+from database.instrumented import TimedConnection
 
 # Database path
 DB_DIR = Path(__file__).parent
 DB_PATH = DB_DIR / 'legalconnect.db'
 
+class ConnectionPool:
+    """Pool of reusable SQLite connections.
+
+    A request thread acquires one connection on first use and releases it at
+    app-context teardown, so each worker thread holds exactly one connection
+    while it runs and connections are reused across requests instead of being
+    reopened. Every connection is opened in WAL mode with the tuned pragmas
+    below and with foreign key enforcement on. ``factory`` is the
+    sqlite3.Connection class to open (TimedConnection when instrumented).
+    """
+
+    def __init__(self, path=DB_PATH, max_idle=8, busy_timeout_ms=5000,
+                 cache_size_kb=20000, mmap_size=256 * 1024 * 1024, factory=sqlite3.Connection):
+        self.path = str(path)
+        self.factory = factory
+        self.max_idle = max_idle
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self._idle = []
+        self._lock = threading.Lock()
+        self._created = 0
+        self._reused = 0
+        self._released = 0
+        self._discarded = 0
+        self._in_use = 0
+
+    def _connect(self):
+        """Open and configure a new connection"""
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,  # handed between threads, never shared
+            factory=self.factory
+        )
+        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        conn.execute(f'PRAGMA cache_size = {-int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        conn.execute('PRAGMA foreign_keys = ON')
+        return conn
+
+    def acquire(self):
+        """Take an idle connection, or open a new one"""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            if conn is not None:
+                self._reused += 1
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._in_use -= 1
+                raise
+            with self._lock:
+                self._created += 1
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            conn = None
+        with self._lock:
+            self._in_use -= 1
+            self._released += 1
+            if conn is not None and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+            self._discarded += 1
+        if conn is not None:
+            conn.close()
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        """Snapshot of pool counters"""
+        with self._lock:
+            return {
+                'path': self.path,
+                'idle': len(self._idle),
+                'inUse': self._in_use,
+                'maxIdle': self.max_idle,
+                'created': self._created,
+                'reused': self._reused,
+                'released': self._released,
+                'discarded': self._discarded,
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def configure_pool(**settings):
+    """Replace the process-wide pool with one built from settings"""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, ConnectionPool(**settings)
+    if old is not None:
+        old.close_all()
+    return _pool
+
+def get_pool():
+    """Get the process-wide pool, creating a default one on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(path=os.getenv('DATABASE_PATH', DB_PATH))
+    return _pool
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection outside of a request"""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
 def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-    return conn
+    """Get the database connection for the current request"""
+    if not has_app_context():
+        raise RuntimeError('get_db() needs an app context; use connection() instead')
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+def close_db(exception=None):
+    """Release the request's connection back to the pool"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(conn)
+
+def init_app(app):
+    """Configure the pool from app config and release connections on teardown"""
+    configure_pool(
+        path=app.config['DATABASE_PATH'],
+        max_idle=app.config['DB_POOL_SIZE'],
+        busy_timeout_ms=app.config['DB_BUSY_TIMEOUT_MS'],
+        cache_size_kb=app.config['DB_CACHE_SIZE_KB'],
+        mmap_size=app.config['DB_MMAP_SIZE'],
+        factory=(TimedConnection if app.config.get('METRICS_ENABLED') or app.config.get('QUERY_STATS_ENABLED')
+                 else sqlite3.Connection)
+    )
+    app.teardown_appcontext(close_db)
+
+# Indexes follow the real access paths. Directory listings filter by equality
+# on practice_area and/or location_state and walk one sort column in order
+# (id is the rowid, so equality-only indexes already end in it); per-user
+# tables are always read by user_id, newest first.
+INDEXES = {
+    'idx_lawyers_experience': 'lawyers (experience_years, id)',
+    'idx_lawyers_rate': 'lawyers (hourly_rate_min, id)',
+    'idx_lawyers_success': 'lawyers (success_rate, id)',
+    'idx_lawyers_area': 'lawyers (practice_area)',
+    'idx_lawyers_area_experience': 'lawyers (practice_area, experience_years, id)',
+    'idx_lawyers_area_rate': 'lawyers (practice_area, hourly_rate_min, id)',
+    'idx_lawyers_area_success': 'lawyers (practice_area, success_rate, id)',
+    'idx_lawyers_state': 'lawyers (location_state)',
+    'idx_lawyers_state_experience': 'lawyers (location_state, experience_years, id)',
+    'idx_lawyers_state_rate': 'lawyers (location_state, hourly_rate_min, id)',
+    'idx_lawyers_state_success': 'lawyers (location_state, success_rate, id)',
+    'idx_lawyers_area_state': 'lawyers (practice_area, location_state)',
+    'idx_lawyers_area_state_experience': 'lawyers (practice_area, location_state, experience_years, id)',
+    'idx_lawyers_area_state_rate': 'lawyers (practice_area, location_state, hourly_rate_min, id)',
+    'idx_lawyers_area_state_success': 'lawyers (practice_area, location_state, success_rate, id)',
+    'idx_shortlists_user_created': 'shortlists (user_id, created_at)',
+    'idx_comparisons_user_created': 'comparisons (user_id, created_at)',
+    'idx_search_history_user_created': 'search_history (user_id, created_at)',
+    'idx_lawyer_similar_similar': 'lawyer_similar (similar_id)',
+}
+
+def ensure_column(cursor, table, column, definition):
+    """Add a column to a table created before the column was introduced"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+def create_schema(cursor):
+    """Create tables and indexes if they do not exist"""
+    # Users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT DEFAULT 'user',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Lawyers table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lawyers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            firm TEXT NOT NULL,
+            tier TEXT DEFAULT 'mid',
+            practice_area TEXT NOT NULL,
+            specialties TEXT,
+            experience_years INTEGER NOT NULL,
+            case_count INTEGER DEFAULT 0,
+            success_rate INTEGER DEFAULT 0,
+            hourly_rate_min REAL NOT NULL,
+            hourly_rate_max REAL NOT NULL,
+            location_city TEXT NOT NULL,
+            location_state TEXT NOT NULL,
+            verified INTEGER DEFAULT 0,
+            mediation_certified INTEGER DEFAULT 0,
+            response_guarantee INTEGER DEFAULT 0,
+            mara_number TEXT,
+            bio TEXT,
+            avatar_color TEXT,
+            lat REAL,
+            lng REAL,
+            external_id TEXT,
+            version INTEGER NOT NULL DEFAULT 1,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    ensure_column(cursor, 'lawyers', 'version', 'INTEGER NOT NULL DEFAULT 1')
+    ensure_column(cursor, 'lawyers', 'lat', 'REAL')
+    ensure_column(cursor, 'lawyers', 'lng', 'REAL')
+    ensure_column(cursor, 'lawyers', 'external_id', 'TEXT')
+    
+    # Natural key for bulk import upserts (NULL for lawyers created one by one)
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_lawyers_external_id ON lawyers (external_id)')
+    
+    # Shortlists table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS shortlists (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            lawyer_id INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            FOREIGN KEY (lawyer_id) REFERENCES lawyers(id) ON DELETE CASCADE,
+            UNIQUE(user_id, lawyer_id)
+        )
+    ''')
+    
+    # Comparisons table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS comparisons (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            lawyer_id INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            FOREIGN KEY (lawyer_id) REFERENCES lawyers(id) ON DELETE CASCADE,
+            UNIQUE(user_id, lawyer_id)
+        )
+    ''')
+    
+    # Search history table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS search_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            practice_area TEXT,
+            state TEXT,
+            min_experience INTEGER,
+            max_rate REAL,
+            response_guarantee INTEGER DEFAULT 0,
+            result_count INTEGER DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+    
+    # Full-text index over lawyers, kept in sync by triggers
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'lawyers_fts'")
+    fts_exists = cursor.fetchone() is not None
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS lawyers_fts USING fts5(
+            name, firm, bio, specialties, location_city,
+            content='lawyers', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS lawyers_fts_insert AFTER INSERT ON lawyers BEGIN
+            INSERT INTO lawyers_fts (rowid, name, firm, bio, specialties, location_city)
+            VALUES (new.id, new.name, new.firm, new.bio, new.specialties, new.location_city);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS lawyers_fts_delete AFTER DELETE ON lawyers BEGIN
+            INSERT INTO lawyers_fts (lawyers_fts, rowid, name, firm, bio, specialties, location_city)
+            VALUES ('delete', old.id, old.name, old.firm, old.bio, old.specialties, old.location_city);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS lawyers_fts_update
+        AFTER UPDATE OF name, firm, bio, specialties, location_city ON lawyers BEGIN
+            INSERT INTO lawyers_fts (lawyers_fts, rowid, name, firm, bio, specialties, location_city)
+            VALUES ('delete', old.id, old.name, old.firm, old.bio, old.specialties, old.location_city);
+            INSERT INTO lawyers_fts (rowid, name, firm, bio, specialties, location_city)
+            VALUES (new.id, new.name, new.firm, new.bio, new.specialties, new.location_city);
+        END
+    ''')
+    if not fts_exists:
+        # Index lawyers that were added before the FTS table existed
+        cursor.execute("INSERT INTO lawyers_fts (lawyers_fts) VALUES ('rebuild')")
+    
+    # R*Tree spatial index over lawyer coordinates, kept in sync by triggers
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'lawyers_geo'")
+    geo_exists = cursor.fetchone() is not None
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS lawyers_geo USING rtree(
+            id, min_lat, max_lat, min_lng, max_lng
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS lawyers_geo_insert AFTER INSERT ON lawyers
+        WHEN new.lat IS NOT NULL AND new.lng IS NOT NULL BEGIN
+            INSERT INTO lawyers_geo VALUES (new.id, new.lat, new.lat, new.lng, new.lng);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS lawyers_geo_update AFTER UPDATE OF lat, lng ON lawyers BEGIN
+            DELETE FROM lawyers_geo WHERE id = old.id;
+            INSERT INTO lawyers_geo
+            SELECT new.id, new.lat, new.lat, new.lng, new.lng
+            WHERE new.lat IS NOT NULL AND new.lng IS NOT NULL;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS lawyers_geo_delete AFTER DELETE ON lawyers BEGIN
+            DELETE FROM lawyers_geo WHERE id = old.id;
+        END
+    ''')
+    if not geo_exists:
+        cursor.execute('''
+            INSERT INTO lawyers_geo
+            SELECT id, lat, lat, lng, lng FROM lawyers WHERE lat IS NOT NULL AND lng IS NOT NULL
+        ''')
+    
+    # Change counters backing ETags (see middleware/etags.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_counters (
+            scope TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL
+        )
+    ''')
+    
+    # Per-user, per-day search counts for history rolled up by database/retention.py
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS search_history_daily (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            searches INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day, dimension, value),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    
+    # Hourly search demand counters maintained by services/analytics.py
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS demand_counters (
+            kind TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            searches INTEGER NOT NULL DEFAULT 0,
+            zero_results INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (kind, bucket, key)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Precomputed "similar lawyers" lists (services/similarity.py), best first
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lawyer_similar (
+            lawyer_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            similar_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (lawyer_id, rank)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Indexes
+    for name, definition in INDEXES.items():
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
 
 def init_database():
     """Initialize database tables"""
-    conn = get_db()
+    pool = get_pool()
+    conn = pool.acquire()
     cursor = conn.cursor()
     
     try:
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT DEFAULT 'user',
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Lawyers table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS lawyers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                firm TEXT NOT NULL,
-                tier TEXT DEFAULT 'mid',
-                practice_area TEXT NOT NULL,
-                specialties TEXT,
-                experience_years INTEGER NOT NULL,
-                case_count INTEGER DEFAULT 0,
-                success_rate INTEGER DEFAULT 0,
-                hourly_rate_min REAL NOT NULL,
-                hourly_rate_max REAL NOT NULL,
-                location_city TEXT NOT NULL,
-                location_state TEXT NOT NULL,
-                verified INTEGER DEFAULT 0,
-                mediation_certified INTEGER DEFAULT 0,
-                response_guarantee INTEGER DEFAULT 0,
-                mara_number TEXT,
-                bio TEXT,
-                avatar_color TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Shortlists table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS shortlists (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                lawyer_id INTEGER NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                FOREIGN KEY (lawyer_id) REFERENCES lawyers(id) ON DELETE CASCADE,
-                UNIQUE(user_id, lawyer_id)
-            )
-        ''')
-        
-        # Comparisons table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS comparisons (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                lawyer_id INTEGER NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                FOREIGN KEY (lawyer_id) REFERENCES lawyers(id) ON DELETE CASCADE,
-                UNIQUE(user_id, lawyer_id)
-            )
-        ''')
-        
-        # Search history table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS search_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                practice_area TEXT,
-                state TEXT,
-                min_experience INTEGER,
-                max_rate REAL,
-                response_guarantee INTEGER DEFAULT 0,
-                result_count INTEGER DEFAULT 0,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        ''')
-        
+        create_schema(cursor)
         conn.commit()
         
         # Create default admin user if it doesn't exist
@@ -115,7 +436,15 @@ def init_database():
         cursor.execute('SELECT COUNT(*) as count FROM lawyers')
         if cursor.fetchone()['count'] == 0:
             seed_lawyers(cursor)
+            conn.commit()
+            # Imported here because services.similarity builds on this module
+            from services.similarity import rebuild_similar
+            rebuild_similar(conn)
             print('Seeded sample lawyer data')
+        else:
+            cursor.execute('SELECT EXISTS (SELECT 1 FROM lawyer_similar) AS built')
+            if not cursor.fetchone()['built']:
+                print('Similar-lawyer lists are empty; build them with: python -m services.similarity')
         
         conn.commit()
         
@@ -123,7 +452,7 @@ def init_database():
         print(f'Error initializing database: {e}')
         conn.rollback()
     finally:
-        conn.close()
+        pool.release(conn)
 
 def seed_lawyers(cursor):
     """Seed sample lawyer data"""
@@ -148,7 +477,9 @@ def seed_lawyers(cursor):
             'response_guarantee': 1,
             'mara_number': None,
             'bio': 'Family law specialist with extensive experience in complex divorce and custody cases.',
-            'avatar_color': '#8B5CF6'
+            'avatar_color': '#8B5CF6',
+            'lat': -33.8688,
+            'lng': 151.2093
         },
         {
             'name': 'James Wilson',
@@ -168,7 +499,9 @@ def seed_lawyers(cursor):
             'response_guarantee': 1,
             'mara_number': None,
             'bio': 'Experienced conveyancer specializing in residential and commercial property transactions.',
-            'avatar_color': '#10B981'
+            'avatar_color': '#10B981',
+            'lat': -37.8136,
+            'lng': 144.9631
         },
         {
             'name': 'Emma Thompson',
@@ -188,7 +521,9 @@ def seed_lawyers(cursor):
             'response_guarantee': 1,
             'mara_number': 'MARN1000001',
             'bio': 'Registered migration agent with proven track record in visa applications.',
-            'avatar_color': '#3B82F6'
+            'avatar_color': '#3B82F6',
+            'lat': -27.4698,
+            'lng': 153.0251
         }
     ]
     
@@ -198,14 +533,15 @@ def seed_lawyers(cursor):
                 name, firm, tier, practice_area, specialties, experience_years,
                 case_count, success_rate, hourly_rate_min, hourly_rate_max,
                 location_city, location_state, verified, mediation_certified,
-                response_guarantee, mara_number, bio, avatar_color
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                response_guarantee, mara_number, bio, avatar_color, lat, lng
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             lawyer['name'], lawyer['firm'], lawyer['tier'], lawyer['practice_area'],
             lawyer['specialties'], lawyer['experience_years'], lawyer['case_count'],
             lawyer['success_rate'], lawyer['hourly_rate_min'], lawyer['hourly_rate_max'],
             lawyer['location_city'], lawyer['location_state'], lawyer['verified'],
             lawyer['mediation_certified'], lawyer['response_guarantee'],
-            lawyer['mara_number'], lawyer['bio'], lawyer['avatar_color']
+            lawyer['mara_number'], lawyer['bio'], lawyer['avatar_color'],
+            lawyer['lat'], lawyer['lng']
         ))
 
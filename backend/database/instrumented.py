@@ -0,0 +1,126 @@
+"""SQLite connection and cursor classes that time every statement.
+
+The pool opens its connections with ``TimedConnection`` as the factory (when
+instrumentation is enabled). Each statement is timed from ``execute`` through
+its last fetch, and its row count is tracked. The statement is reported once
+to every registered observer as ``observer(sql, parameters, seconds, rows)``
+when it finishes: on exhaustion, close, re-execute, or when the cursor is
+garbage collected after a partial read such as ``fetchone()``. For writes,
+rows is the number of rows changed. For ``executemany`` parameters is only
+the first row (None for an iterator), so whole batches are not kept alive.
+
+Observers run on the request thread, so they must be cheap and must not
+raise.
+"""
+import sqlite3
+from time import perf_counter
+
+_observers = []
+
+def add_observer(observer):
+    if observer not in _observers:
+        _observers.append(observer)
+
+def remove_observer(observer):
+    if observer in _observers:
+        _observers.remove(observer)
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor accumulating time and rows for its current statement"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sql = None
+        self._parameters = None
+        self._seconds = 0.0
+        self._rows = 0
+
+    def _finish(self):
+        sql = self._sql
+        if sql is None:
+            return
+        self._sql = None
+        for observer in _observers:
+            observer(sql, self._parameters, self._seconds, self._rows)
+
+    def _run(self, method, sql, parameters, sample):
+        self._finish()
+        started = perf_counter()
+        try:
+            method(sql, parameters)
+        finally:
+            self._sql, self._parameters = sql, sample
+            self._seconds = perf_counter() - started
+            self._rows = 0
+        if self.description is None:
+            # No result set: a write (or PRAGMA/DDL) that is already complete
+            self._rows = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        sample = seq_of_parameters[0] if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters else None
+        return self._run(super().executemany, sql, seq_of_parameters, sample)
+
+    def __next__(self):
+        started = perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._seconds += perf_counter() - started
+            self._finish()
+            raise
+        self._seconds += perf_counter() - started
+        self._rows += 1
+        return row
+
+    def fetchone(self):
+        started = perf_counter()
+        row = super().fetchone()
+        self._seconds += perf_counter() - started
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = perf_counter()
+        rows = super().fetchmany(size)
+        self._seconds += perf_counter() - started
+        self._rows += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        started = perf_counter()
+        rows = super().fetchall()
+        self._seconds += perf_counter() - started
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        if getattr(self, '_sql', None) is not None:
+            self._finish()
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose shortcut methods go through TimedCursor"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,153 @@
+"""Query-plan regression checks for the indexed access paths.
+
+Runs EXPLAIN QUERY PLAN for every filter/sort combination GET /api/lawyers can
+produce, plus the shortlist, comparison, history, retention and similarity
+statements (imported from the modules that run them, so they cannot drift), and
+reports any statement that falls back to a full table scan or sorts its
+results in a temp B-tree.
+
+Usage (from the backend directory):
+    python -m database.query_plans              # fresh in-memory schema
+    python -m database.query_plans --database database/legalconnect.db
+
+Exits with status 1 if any plan regresses.
+"""
+import argparse
+import itertools
+import sqlite3
+import sys
+
+from database.db import create_schema
+from database.retention import USERS_OVER_LIMIT_SQL, CUTOFF_SQL, BATCH_SQL
+from routes.comparison import (COMPARISON_SQL, COMPARISON_COUNT_SQL, COMPARISON_MEMBER_SQL,
+                               MAX_COMPARISON_SIZE)
+from routes.history import HISTORY_SQL, HISTORY_PAGE_SIZE
+from routes.lawyers import (build_lawyers_query, SORT_FIELDS, NULLABLE_SORT_FIELDS, DEFAULT_PAGE_SIZE,
+                            SIMILAR_LAWYERS_SQL)
+from routes.shortlist import SHORTLIST_SQL, SHORTLIST_MEMBER_SQL
+from services.similarity import BLOCK_SQL, STORED_SQL, CLEAR_AREA_SQL, REFERRERS_SQL, KTH_ENTRIES_SQL
+from services.user_lists import (LIST_TABLES, MEMBERS_SQL, EXISTING_LAWYERS_SQL, REMOVE_SQL,
+                                 LIST_SIZE_SQL)
+
+# Representative values; the planner only cares which predicates are present
+FILTER_VALUES = {
+    'practice_area': 'family',
+    'state': 'NSW',
+    'min_experience': 5,
+    'max_rate': 400.0,
+    'response_guarantee': True,
+}
+
+CURSOR_POSITIONS = {
+    'id': (None, 1000),
+    'experience_years': (10, 1000),
+    'hourly_rate_min': (350.0, 1000),
+    'success_rate': (90, 1000),
+}
+
+# (label, sql, params) for the per-user and similarity lookups, built from the
+# statements the route and service modules execute
+USER_QUERIES = [
+    ('shortlist list', SHORTLIST_SQL, (1,)),
+    ('shortlist membership', SHORTLIST_MEMBER_SQL, (1, 1)),
+    ('comparison list', COMPARISON_SQL, (1, MAX_COMPARISON_SIZE)),
+    ('comparison count', COMPARISON_COUNT_SQL, (1,)),
+    ('comparison membership', COMPARISON_MEMBER_SQL, (1, 1)),
+    ('batch lawyers exist', EXISTING_LAWYERS_SQL, ('[1,2,3]',)),
+] + [
+    (f'{table} batch {label}', sql.format(table=table), params)
+    for table in LIST_TABLES
+    for label, sql, params in [('members', MEMBERS_SQL, (1, '[1,2,3]')),
+                               ('remove', REMOVE_SQL, (1, '[1,2,3]')),
+                               ('size', LIST_SIZE_SQL, (1,))]
+] + [
+    ('history list', HISTORY_SQL, (1, HISTORY_PAGE_SIZE)),
+    ('history retention users', USERS_OVER_LIMIT_SQL, (0, 100, 100)),
+    ('history retention cutoff', CUTOFF_SQL, (1, 99)),
+    ('history retention batch', BATCH_SQL, (1, '2024-01-01 00:00:00', 1, 1000)),
+    ('similar lawyers', SIMILAR_LAWYERS_SQL, (1, 10)),
+    ('similar stored lists', STORED_SQL, ('[1,2,3]',)),
+    ('similar referrers', REFERRERS_SQL, (1,)),
+    ('similar k-th entries', KTH_ENTRIES_SQL, ('[1,2,3]', 10, 11)),
+    ('similar feature block', BLOCK_SQL, ('family',)),
+    ('similar clear area', CLEAR_AREA_SQL, ('family',)),
+]
+
+def iter_lawyer_queries():
+    """Yield (label, sql, params, sort_field) for every listing combination"""
+    names = list(FILTER_VALUES)
+    for mask in itertools.product([False, True], repeat=len(names)):
+        filters = {name: FILTER_VALUES[name] if enabled else None
+                   for name, enabled in zip(names, mask)}
+        filters['response_guarantee'] = bool(filters['response_guarantee'])
+        for sort_field in SORT_FIELDS.values():
+            positions = [None, CURSOR_POSITIONS[sort_field]]
+            if sort_field in NULLABLE_SORT_FIELDS:
+                positions += [(None, None), (None, 1000)]  # into and within the NULL rows
+            for position in positions:
+                sql, params = build_lawyers_query(
+                    sort_field=sort_field, position=position,
+                    limit=DEFAULT_PAGE_SIZE + 1, **filters
+                )
+                active = [name for name, enabled in zip(names, mask) if enabled]
+                label = 'lawyers filters=[{}] sort={}{}{}'.format(
+                    ','.join(active), sort_field, ' +cursor' if position else '',
+                    ' (NULL)' if position and position[0] is None and sort_field != 'id' else ''
+                )
+                yield label, sql, params, sort_field
+
+def explain(conn, sql, params):
+    """Return the detail column of EXPLAIN QUERY PLAN as a list of strings"""
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+def plan_problems(plan, allow_rowid_scan=False):
+    """List the plan steps that indicate a full scan or a sort"""
+    problems = []
+    for step in plan:
+        if 'TEMP B-TREE' in step:
+            problems.append(step)
+        elif step.startswith('SCAN json_each'):
+            continue  # iterating a bound JSON id list, not a table
+        elif step.startswith('SCAN') and 'USING' not in step:
+            # Walking the table in rowid order is the primary-key index; it is
+            # only acceptable when that is exactly the requested ORDER BY
+            if not allow_rowid_scan:
+                problems.append(step)
+    return problems
+
+def find_plan_regressions(conn):
+    """Return (label, sql, plan, problems) for every regressed statement"""
+    regressions = []
+    for label, sql, params, sort_field in iter_lawyer_queries():
+        plan = explain(conn, sql, params)
+        problems = plan_problems(plan, allow_rowid_scan=(sort_field == 'id'))
+        if problems:
+            regressions.append((label, sql, plan, problems))
+    for label, sql, params in USER_QUERIES:
+        plan = explain(conn, sql, params)
+        problems = plan_problems(plan)
+        if problems:
+            regressions.append((label, sql, plan, problems))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check query plans for scans and temp B-tree sorts')
+    parser.add_argument('--database', help='SQLite file to check (default: fresh in-memory schema)')
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.database or ':memory:')
+    create_schema(conn.cursor())
+
+    regressions = find_plan_regressions(conn)
+    conn.close()
+
+    checked = sum(1 for _ in iter_lawyer_queries()) + len(USER_QUERIES)
+    for label, sql, plan, problems in regressions:
+        print(f'FAIL {label}')
+        for step in plan:
+            print(f'    {step}')
+    print(f'{checked - len(regressions)}/{checked} query plans use an index without sorting')
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
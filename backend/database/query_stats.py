@@ -0,0 +1,175 @@
+"""Per-statement SQL statistics and the slow-query log.
+
+Registered as a database.instrumented observer, so every statement run on a
+pooled connection is recorded under its fingerprint: the SQL with comments
+and whitespace collapsed, string and numeric literals replaced by ``?`` and
+``IN`` lists folded, so the same query with different literals (or a
+different number of IN values) is counted together. For each fingerprint
+we keep the call count, total and max time, rows returned or changed, and
+the latest SQL and parameters as an example for EXPLAIN.
+
+Statements slower than SLOW_QUERY_MS are logged as warnings on the
+``database.query_stats`` logger together with their EXPLAIN QUERY PLAN, run
+on a separate read-only connection.
+"""
+import logging
+import re
+import sqlite3
+import threading
+from flask import has_request_context, request
+from database.instrumented import add_observer
+from database.query_plans import explain, plan_problems
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+MAX_CACHED_FINGERPRINTS = 4096
+
+_COMMENTS = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRINGS = re.compile(r"[xX]?'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b')
+_NAMED = re.compile(r'[:@$][A-Za-z_]\w*|\?\d*')
+_IN_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+_KEYWORD = re.compile(r'\s*(\w+)')
+
+_fingerprints = {}
+
+def _keyword(sql):
+    match = _KEYWORD.match(sql)
+    return match.group(1).upper() if match else ''
+
+def fingerprint(sql):
+    """Normalized form of a statement, with literals and placeholders as ?"""
+    cached = _fingerprints.get(sql)
+    if cached is not None:
+        return cached
+    text = _COMMENTS.sub(' ', sql)
+    text = _STRINGS.sub('?', text)
+    text = _NAMED.sub('?', text)
+    text = _NUMBERS.sub('?', text)
+    text = _IN_LISTS.sub('(?+)', text)
+    text = _WHITESPACE.sub(' ', text).strip().rstrip(';').strip()
+    if len(_fingerprints) >= MAX_CACHED_FINGERPRINTS:
+        _fingerprints.clear()
+    _fingerprints[sql] = text
+    return text
+
+class QueryStats:
+    """Thread-safe statistics per statement fingerprint"""
+
+    def __init__(self, path=None, slow_ms=100, max_statements=1000):
+        self.path = path
+        self.slow_ms = slow_ms
+        self.max_statements = max_statements
+        self._statements = {}
+        self._lock = threading.Lock()
+        self.slow = 0
+        self.dropped = 0
+
+    def record(self, sql, parameters, seconds, rows):
+        """database.instrumented observer"""
+        if _keyword(sql) == 'EXPLAIN':
+            return
+        key = fingerprint(sql)
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is None:
+                if len(self._statements) >= self.max_statements:
+                    self.dropped += 1
+                    return
+                entry = self._statements[key] = [0, 0.0, 0.0, 0, sql, parameters]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[3] += rows
+            entry[4], entry[5] = sql, parameters
+            if seconds > entry[2]:
+                entry[2] = seconds
+            slow = self.slow_ms is not None and seconds * 1000 >= self.slow_ms
+            if slow:
+                self.slow += 1
+        if slow:
+            self.log_slow(key, sql, parameters, seconds, rows)
+
+    def plan(self, sql, parameters, conn=None):
+        """EXPLAIN QUERY PLAN steps for a statement, or None if it cannot be explained"""
+        if _keyword(sql) not in EXPLAINABLE:
+            return None
+        own = conn is None
+        try:
+            if own:
+                conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+            return explain(conn, sql, parameters if parameters is not None else ())
+        except (sqlite3.Error, ValueError, TypeError):
+            return None
+        finally:
+            if own and conn is not None:
+                conn.close()
+
+    def log_slow(self, key, sql, parameters, seconds, rows):
+        plan = self.plan(sql, parameters) if self.path else None
+        where = f' [{request.method} {request.path}]' if has_request_context() else ''
+        logger.warning('Slow query%s: %.1f ms, %d rows: %s\n    plan: %s', where, seconds * 1000, rows, key,
+                       '\n          '.join(plan) if plan else 'unavailable')
+
+    def example(self, key):
+        """(sql, parameters) of the latest call with this fingerprint, or None"""
+        with self._lock:
+            entry = self._statements.get(key)
+            return None if entry is None else (entry[4], entry[5])
+
+    def top(self, limit=20, order='total'):
+        """The heaviest statements by total, max, avg, count or rows (parameters are never exposed)"""
+        with self._lock:
+            entries = [(key, list(entry)) for key, entry in self._statements.items()]
+        rows = []
+        for key, (count, total, maximum, returned, sql, _) in entries:
+            rows.append({
+                'fingerprint': key,
+                'count': count,
+                'totalMs': round(total * 1000, 3),
+                'avgMs': round(total * 1000 / count, 3),
+                'maxMs': round(maximum * 1000, 3),
+                'rows': returned,
+                'avgRows': round(returned / count, 1),
+                'example': sql,
+            })
+        rows.sort(key=lambda row: row[ORDERS[order]], reverse=True)
+        return rows[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self.slow = 0
+            self.dropped = 0
+
+    def stats(self):
+        with self._lock:
+            return {'statements': len(self._statements), 'maxStatements': self.max_statements,
+                    'slow': self.slow, 'dropped': self.dropped, 'slowMs': self.slow_ms}
+
+ORDERS = {'total': 'totalMs', 'max': 'maxMs', 'avg': 'avgMs', 'count': 'count', 'rows': 'rows'}
+
+query_stats = QueryStats()
+
+def configure_query_stats(path=None, slow_ms=None, max_statements=None):
+    """Apply settings to the process-wide statistics (keeping what was recorded)"""
+    if path is not None:
+        query_stats.path = str(path)
+    if slow_ms is not None:
+        query_stats.slow_ms = slow_ms
+    if max_statements is not None:
+        query_stats.max_statements = max_statements
+    return query_stats
+
+def init_query_stats(app):
+    """Record statements on pooled connections using the app's settings"""
+    configure_query_stats(app.config['DATABASE_PATH'], app.config['SLOW_QUERY_MS'],
+                          app.config['QUERY_STATS_MAX'])
+    add_observer(query_stats.record)
+
+def statement_plan(key, conn):
+    """(plan steps, scan/sort problems) for a recorded fingerprint; plan is None if unavailable"""
+    example = query_stats.example(key)
+    plan = query_stats.plan(*example, conn=conn) if example else None
+    return plan, plan_problems(plan) if plan else []
@@ -0,0 +1,161 @@
+"""Search-history retention: keep the newest rows, roll older ones up per day.
+
+GET /api/history only shows a user's latest HISTORY_PAGE_SIZE searches, so
+beyond the newest ``keep`` rows per user (at least that many) the raw rows
+are folded into search_history_daily (searches per user, day and practice
+area / state / rate band) and deleted, bumping the user's history ETag scope.
+Work is done in short transactions of at most ``batch_size`` rows, with an
+optional pause between them, so concurrent requests never wait long for the
+write lock. Running it again only processes rows that have aged out since.
+
+Usage (from the backend directory):
+    python -m database.retention --keep 100 --batch-size 1000
+"""
+import argparse
+import json
+import sys
+import time
+
+from database.db import connection, create_schema
+from middleware.etags import bump_version
+from routes.history import HISTORY_PAGE_SIZE
+from services.facets import RATE_BUCKETS
+
+DEFAULT_KEEP = 100
+DEFAULT_BATCH_SIZE = 1000
+
+USERS_OVER_LIMIT_SQL = '''
+    SELECT user_id FROM search_history
+    WHERE user_id > ?
+    GROUP BY user_id HAVING COUNT(*) > ?
+    ORDER BY user_id LIMIT ?
+'''
+
+CUTOFF_SQL = '''
+    SELECT created_at, id FROM search_history
+    WHERE user_id = ?
+    ORDER BY created_at DESC, id DESC
+    LIMIT 1 OFFSET ?
+'''
+
+BATCH_SQL = '''
+    SELECT id FROM search_history
+    WHERE user_id = ? AND (created_at, id) < (?, ?)
+    ORDER BY created_at, id LIMIT ?
+'''
+
+def _rate_band_expression():
+    clauses = []
+    for label, low, high in RATE_BUCKETS:
+        tests = []
+        if low is not None:
+            tests.append(f'max_rate >= {low}')
+        if high is not None:
+            tests.append(f'max_rate < {high}')
+        clauses.append(f"WHEN {' AND '.join(tests)} THEN '{label}'")
+    return f"CASE {' '.join(clauses)} ELSE '' END"
+
+# Rollup dimension -> value expression; '' means the filter was not set
+DIMENSIONS = {
+    'practice_area': "COALESCE(practice_area, '')",
+    'state': "COALESCE(state, '')",
+    'rate_band': _rate_band_expression(),
+}
+
+def users_over_limit(conn, keep, after_user_id=0, limit=100):
+    """Ids of users with more than keep history rows, in id order after after_user_id"""
+    return [row[0] for row in conn.execute(USERS_OVER_LIMIT_SQL, (after_user_id, keep, limit))]
+
+def retention_cutoff(conn, user_id, keep):
+    """(created_at, id) of the oldest row to keep for a user, or None"""
+    return conn.execute(CUTOFF_SQL, (user_id, keep - 1)).fetchone()
+
+def roll_up_batch(conn, user_id, cutoff, batch_size):
+    """Roll up and delete up to batch_size rows older than cutoff in one transaction"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        ids = [row[0] for row in conn.execute(BATCH_SQL, (user_id, cutoff[0], cutoff[1], batch_size))]
+        if ids:
+            id_list = json.dumps(ids)
+            for dimension, expression in DIMENSIONS.items():
+                conn.execute(f'''
+                    INSERT INTO search_history_daily (user_id, day, dimension, value, searches)
+                    SELECT user_id, date(created_at), ?, {expression}, COUNT(*)
+                    FROM search_history
+                    WHERE id IN (SELECT value FROM json_each(?))
+                    GROUP BY user_id, date(created_at), {expression}
+                    ON CONFLICT (user_id, day, dimension, value)
+                    DO UPDATE SET searches = searches + excluded.searches
+                ''', (dimension, id_list))
+            conn.execute('DELETE FROM search_history WHERE id IN (SELECT value FROM json_each(?))', (id_list,))
+            bump_version(conn, f'history:{user_id}')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(ids)
+
+def run_retention(conn, keep=DEFAULT_KEEP, batch_size=DEFAULT_BATCH_SIZE, pause=0.0,
+                  max_batches=None, progress=None):
+    """Apply retention to every user over the limit; returns a summary dict.
+
+    max_batches bounds the work done in one call so it can run as a periodic
+    job; the next call picks up whatever is left.
+    """
+    if keep < HISTORY_PAGE_SIZE:
+        raise ValueError(f'keep must be at least {HISTORY_PAGE_SIZE}, the rows GET /api/history shows')
+    started = time.perf_counter()
+    summary = {'users': 0, 'rolledUp': 0, 'batches': 0, 'complete': True}
+    after_user_id = 0
+    while True:
+        users = users_over_limit(conn, keep, after_user_id)
+        if not users:
+            break
+        for user_id in users:
+            cutoff = retention_cutoff(conn, user_id, keep)
+            summary['users'] += 1
+            while cutoff is not None:
+                if max_batches is not None and summary['batches'] >= max_batches:
+                    summary['complete'] = False
+                    summary['seconds'] = round(time.perf_counter() - started, 3)
+                    return summary
+                moved = roll_up_batch(conn, user_id, cutoff, batch_size)
+                if not moved:
+                    break
+                summary['rolledUp'] += moved
+                summary['batches'] += 1
+                if progress:
+                    progress(summary)
+                if pause:
+                    time.sleep(pause)
+        after_user_id = users[-1]
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Roll up and prune old search history')
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP,
+                        help=f'raw history rows to keep per user (at least {HISTORY_PAGE_SIZE})')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='rows rolled up per transaction')
+    parser.add_argument('--pause', type=float, default=0.0,
+                        help='seconds to sleep between transactions')
+    parser.add_argument('--max-batches', type=int, help='stop after this many transactions')
+    args = parser.parse_args(argv)
+    if args.keep < HISTORY_PAGE_SIZE:
+        parser.error(f'--keep must be at least {HISTORY_PAGE_SIZE}, the rows GET /api/history shows')
+
+    def report(summary):
+        print(f"\r{summary['users']} users, {summary['rolledUp']} rows rolled up "
+              f"in {summary['batches']} batches", end='', file=sys.stderr, flush=True)
+
+    with connection() as conn:
+        create_schema(conn.cursor())
+        conn.commit()
+        summary = run_retention(conn, args.keep, args.batch_size, args.pause, args.max_batches, report)
+    print(file=sys.stderr)
+    print(json.dumps(summary))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
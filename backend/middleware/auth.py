@@ -1,25 +1,104 @@
+import hashlib
+import threading
+import time
 import jwt
+from collections import OrderedDict
 from functools import wraps
 from flask import request, jsonify, current_app
+from middleware.instrumentation import timed
+
+class TokenCache:
+    """Bounded LRU of verified token payloads keyed by a hash of the token.
+
+    Entries live until the earlier of the token's exp and the cache TTL, so a
+    session's repeat requests skip signature verification and JSON decoding.
+    """
+
+    def __init__(self, max_entries=10000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    @staticmethod
+    def key(secret, token):
+        return hashlib.sha256(f'{secret}\x00{token}'.encode('utf-8')).digest()
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, payload, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'maxEntries': self.max_entries, 'ttl': self.ttl,
+                    'hits': self.hits, 'misses': self.misses, 'expired': self.expired}
+
+token_cache = TokenCache()
+
+def configure_token_cache(max_entries=None, ttl=None):
+    """Resize the verified-token cache (dropping its entries)"""
+    if max_entries is not None:
+        token_cache.max_entries = max_entries
+    if ttl is not None:
+        token_cache.ttl = ttl
+    token_cache.clear()
 
 def generate_token(user):
     """Generate JWT token for user"""
+    now = int(time.time())
     payload = {
         'id': user['id'],
         'email': user['email'],
-        'role': user['role']
+        'role': user['role'],
+        'iat': now,
+        'exp': now + current_app.config.get('JWT_EXPIRES_IN', 86400)
     }
-    return jwt.encode(payload, current_app.config['JWT_SECRET'], algorithm='HS256')
+    with timed('auth'):
+        return jwt.encode(payload, current_app.config['JWT_SECRET'], algorithm='HS256')
 
 def verify_token(token):
-    """Verify JWT token"""
-    try:
-        payload = jwt.decode(token, current_app.config['JWT_SECRET'], algorithms=['HS256'])
+    """Verify JWT token, using the verified-token cache when possible"""
+    with timed('auth'):
+        return _verify_token(token)
+
+def _verify_token(token):
+    secret = current_app.config['JWT_SECRET']
+    now = time.time()
+    key = TokenCache.key(secret, token)
+    payload = token_cache.get(key, now)
+    if payload is not None:
         return payload
+    try:
+        payload = jwt.decode(token, secret, algorithms=['HS256'], options={'require': ['exp']})
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    token_cache.put(key, payload, min(payload['exp'], now + token_cache.ttl))
+    return payload
 
 def authenticate_token(f):
     """Decorator to require authentication"""
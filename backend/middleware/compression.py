@@ -0,0 +1,87 @@
+"""Negotiated response compression and static file delivery.
+
+* JSON API responses at least COMPRESS_MIN_SIZE bytes are compressed with
+  brotli (when the optional ``brotli`` package is installed) or gzip,
+  according to Accept-Encoding. Streamed responses (e.g. exports) are left to
+  the view. Compressing turns a strong ETag weak, since the bytes differ per
+  encoding while the resource version is the same.
+* Static files are served from a pre-built ``.br`` / ``.gz`` sibling when one
+  exists and the client accepts that encoding.
+"""
+import gzip
+import mimetypes
+import os
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json'}
+
+# Encoding -> suffix of the precompressed sibling file, in preference order
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+def supported_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def negotiate_encoding(candidates):
+    """Best encoding from candidates that the client accepts, or None"""
+    accepted = request.accept_encodings
+    best = None
+    for encoding in candidates:
+        quality = accepted[encoding]
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+def _add_vary(response):
+    response.vary.add('Accept-Encoding')
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level.get('br', 5))
+    return gzip.compress(data, compresslevel=level.get('gzip', 6), mtime=0)
+
+def init_compression(app):
+    """Register the after_request hook compressing API JSON responses"""
+
+    @app.after_request
+    def compress_response(response):
+        if (response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers):
+            return response
+        _add_vary(response)
+        if response.content_length is not None and response.content_length < app.config.get('COMPRESS_MIN_SIZE', 1024):
+            return response
+        encoding = negotiate_encoding(supported_encodings())
+        if encoding is None:
+            return response
+
+        level = {'gzip': app.config.get('COMPRESS_GZIP_LEVEL', 6),
+                 'br': app.config.get('COMPRESS_BROTLI_QUALITY', 5)}
+        response.set_data(compress(response.get_data(), encoding, level))
+        response.headers['Content-Encoding'] = encoding
+        etag = response.headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            response.headers['ETag'] = f'W/{etag}'
+        return response
+
+def send_static(directory, filename, **kwargs):
+    """send_from_directory, preferring an accepted precompressed sibling file"""
+    available = [(encoding, suffix) for encoding, suffix in STATIC_ENCODINGS
+                 if os.path.isfile(os.path.join(directory, filename + suffix))]
+    encoding = negotiate_encoding([encoding for encoding, _ in available]) if available else None
+    if encoding is None:
+        response = send_from_directory(directory, filename, **kwargs)
+    else:
+        suffix = dict(available)[encoding]
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(directory, filename + suffix, mimetype=mimetype, **kwargs)
+        response.headers['Content-Encoding'] = encoding
+    if available:
+        _add_vary(response)
+    return response
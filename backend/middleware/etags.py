@@ -0,0 +1,98 @@
+import hashlib
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from functools import wraps
+from flask import request, g, make_response
+from database.db import get_db
+
+# Change counters live in the change_counters table (scope -> version) so every
+# worker process sees the same values. Scopes are 'lawyers' for the directory
+# and '<resource>:<user_id>' for per-user data.
+
+def bump_version(conn, scope):
+    """Advance a change counter; call inside the write's transaction"""
+    conn.execute('''
+        INSERT INTO change_counters (scope, version, updated_at) VALUES (?, 1, ?)
+        ON CONFLICT(scope) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+    ''', (scope, time.time()))
+
+def get_versions(conn, scopes):
+    """Return {scope: (version, updated_at)}; unknown scopes are (0, None)"""
+    placeholders = ', '.join('?' for _ in scopes)
+    rows = conn.execute(
+        f'SELECT scope, version, updated_at FROM change_counters WHERE scope IN ({placeholders})',
+        list(scopes)
+    ).fetchall()
+    versions = {scope: (0, None) for scope in scopes}
+    for row in rows:
+        versions[row['scope']] = (row['version'], row['updated_at'])
+    return versions
+
+def current_version(scope):
+    """Counter value for a scope, reusing the one read for this request's ETag"""
+    versions = g.get('change_versions')
+    if versions is None or scope not in versions:
+        versions = get_versions(get_db(), [scope])
+    return versions[scope][0]
+
+def _opaque_tag(value):
+    value = value.strip()
+    return value[2:] if value.startswith('W/') else value
+
+def _etag_matches(header, etag):
+    # If-None-Match uses weak comparison (RFC 7232)
+    candidates = [_opaque_tag(value) for value in header.split(',')]
+    return '*' in candidates or _opaque_tag(etag) in candidates
+
+def conditional(scopes, private=False):
+    """Decorator adding a weak ETag and Last-Modified derived from change counters.
+
+    scopes is a callable returning the counter scopes the response depends on.
+    A matching If-None-Match (or a fresh If-Modified-Since) returns 304 without
+    calling the view; the ETag is exact, Last-Modified is withheld until the
+    newest change is at least a second old. Place it after authenticate_token for per-user scopes.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            names = scopes()
+            versions = get_versions(get_db(), names)
+            g.change_versions = versions
+
+            state = '|'.join(f'{name}={versions[name][0]}' for name in names)
+            digest = hashlib.sha1(f'{request.full_path}|{state}'.encode('utf-8')).hexdigest()[:32]
+            # Weak: the tag names a resource version, which may be sent gzip/br encoded
+            etag = f'W/"{digest}"'
+            # Last-Modified has one-second resolution, so it is only sent (and
+            # If-Modified-Since only trusted) once the newest change is a full
+            # second old: a later write can then never share its second
+            timestamps = [updated for _, updated in versions.values() if updated]
+            newest = max(timestamps) if timestamps else None
+            last_modified = int(newest) if newest is not None and time.time() - newest >= 1 else None
+
+            not_modified = False
+            if_none_match = request.headers.get('If-None-Match')
+            if if_none_match:
+                not_modified = _etag_matches(if_none_match, etag)
+            elif last_modified is not None and request.headers.get('If-Modified-Since'):
+                try:
+                    since = parsedate_to_datetime(request.headers['If-Modified-Since']).timestamp()
+                    not_modified = last_modified <= since
+                except (TypeError, ValueError):
+                    pass
+
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.headers['ETag'] = etag
+            if last_modified is not None:
+                response.headers['Last-Modified'] = formatdate(last_modified, usegmt=True)
+            response.headers['Cache-Control'] = 'private, no-cache' if private else 'no-cache'
+            return response
+
+        return decorated_function
+    return decorator
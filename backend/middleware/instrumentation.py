@@ -0,0 +1,188 @@
+"""Per-request metrics and an opt-in sampling profiler.
+
+For every request this records:
+
+* latency per endpoint (method + URL rule) and response status counts;
+* where the time went: SQLite (every statement on pooled connections, timed
+  by database.instrumented), serialization (JSON encoding and fragment
+  assembly) and auth (token verification and bcrypt, including its queue
+  wait);
+* the number of SQL statements run and rows they returned or changed.
+
+Code on the request path marks its phase with ``timed('serialization')`` /
+``timed('auth')``; outside a request the timer is a no-op.
+
+When PROFILE_SAMPLE_RATE is N > 0 every Nth request runs under cProfile;
+with PROFILE_HEADER_ENABLED a request sent with ``X-Profile: 1`` is profiled
+too. Profiles are written to PROFILE_DIR as ``.prof`` files (load them with
+``pstats`` or snakeviz) and the file name is returned in ``X-Profile-File``.
+Only one request is profiled at a time; others are skipped, not queued.
+"""
+import cProfile
+import itertools
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from database.instrumented import add_observer
+from services.metrics import registry
+
+PHASES = ('sqlite', 'serialization', 'auth')
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 100000)
+
+request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Time from routing to response, by endpoint', ('method', 'route'))
+requests_total = registry.counter(
+    'http_requests_total', 'Requests by endpoint and status', ('method', 'route', 'status'))
+phase_duration = registry.histogram(
+    'http_request_phase_seconds', 'Time per request spent in sqlite, serialization and auth',
+    ('route', 'phase'))
+request_queries = registry.histogram(
+    'http_request_sql_queries', 'SQL statements run per request', ('route',), QUERY_BUCKETS)
+request_rows = registry.histogram(
+    'http_request_sql_rows', 'Rows returned or changed by SQL per request', ('route',), ROW_BUCKETS)
+profiles_written = registry.counter('profiles_written_total', 'cProfile dumps written', ('trigger',))
+
+class RequestStats:
+    __slots__ = ('started', 'status', 'queries', 'rows', 'sqlite', 'serialization', 'auth', 'profile')
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.status = 500
+        self.queries = 0
+        self.rows = 0
+        self.sqlite = 0.0
+        self.serialization = 0.0
+        self.auth = 0.0
+        self.profile = None
+
+_current = ContextVar('request_stats', default=None)
+
+def record_statement(sql, parameters, seconds, rows):
+    """database.instrumented observer: charge a statement to the current request"""
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.rows += rows
+        stats.sqlite += seconds
+
+@contextmanager
+def timed(phase):
+    """Add the enclosed time to the current request's phase"""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        setattr(stats, phase, getattr(stats, phase) + perf_counter() - started)
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, charging jsonify() encoding to serialization"""
+
+    def dumps(self, obj, **kwargs):
+        with timed('serialization'):
+            return super().dumps(obj, **kwargs)
+
+class Profiler:
+    """Decides which requests to profile and writes their cProfile dumps"""
+
+    def __init__(self, directory, sample_rate=0, header_enabled=False):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.header_enabled = header_enabled
+        self._counter = itertools.count(1)
+        self._active = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or self.header_enabled
+
+    def trigger(self):
+        """'header', 'sample' or None for the current request"""
+        if self.header_enabled and request.headers.get('X-Profile', '').lower() in ('1', 'true'):
+            return 'header'
+        if self.sample_rate > 0 and next(self._counter) % self.sample_rate == 0:
+            return 'sample'
+        return None
+
+    def start(self, trigger):
+        if not self._active.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        profile.enable()
+        return (profile, trigger)
+
+    def finish(self, entry, route, seconds):
+        """Stop profiling and dump the stats; returns the file name"""
+        profile, trigger = entry
+        try:
+            profile.disable()
+            os.makedirs(self.directory, exist_ok=True)
+            slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+            filename = (f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{request.method}-{slug}-"
+                        f"{seconds * 1000:.0f}ms.prof")
+            profile.dump_stats(os.path.join(self.directory, filename))
+            profiles_written.labels(trigger).inc()
+            return filename
+        finally:
+            self._active.release()
+
+def route_label():
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+def init_instrumentation(app):
+    """Register the request hooks; call before any other before_request hook"""
+    add_observer(record_statement)
+    app.json = TimedJSONProvider(app)
+    profiler = Profiler(app.config['PROFILE_DIR'], app.config['PROFILE_SAMPLE_RATE'],
+                        app.config['PROFILE_HEADER_ENABLED'])
+    app.extensions['profiler'] = profiler
+
+    @app.before_request
+    def start_request():
+        stats = RequestStats()
+        _current.set(stats)
+        request.instrumentation = stats
+        if profiler.enabled:
+            trigger = profiler.trigger()
+            if trigger is not None:
+                stats.profile = profiler.start(trigger)
+
+    @app.after_request
+    def record_status(response):
+        stats = getattr(request, 'instrumentation', None)
+        if stats is not None:
+            stats.status = response.status_code
+            if stats.profile is not None:
+                entry, stats.profile = stats.profile, None
+                response.headers['X-Profile-File'] = profiler.finish(
+                    entry, route_label(), perf_counter() - stats.started)
+        return response
+
+    @app.teardown_request
+    def finish_request(exception=None):
+        stats = getattr(request, 'instrumentation', None)
+        if stats is None:
+            return
+        elapsed = perf_counter() - stats.started
+        _current.set(None)
+        del request.instrumentation
+        route = route_label()
+        if stats.profile is not None:
+            profiler.finish(stats.profile, route, elapsed)
+        request_duration.labels(request.method, route).observe(elapsed)
+        requests_total.labels(request.method, route, str(stats.status)).inc()
+        for phase in PHASES:
+            phase_duration.labels(route, phase).observe(getattr(stats, phase))
+        request_queries.labels(route).observe(stats.queries)
+        request_rows.labels(route).observe(stats.rows)
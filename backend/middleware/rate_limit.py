@@ -0,0 +1,203 @@
+"""Sliding-window rate limiting for the credential endpoints.
+
+Each rule allows ``limit`` attempts per ``window`` seconds for one key (the
+client IP or the submitted email). Attempts are kept as a timestamp log per
+key; only the newest ``limit`` timestamps are ever needed, so memory per key
+is bounded. Every rule of a request is checked before any attempt is
+recorded, so a request rejected by one rule does not use up the others. The
+check runs before the view, i.e. before any SQLite or bcrypt work, and
+answers 429 with Retry-After.
+
+Backends:
+    MemoryRateLimitBackend   per process, LRU-bounded number of keys
+    SQLiteRateLimitBackend   a small local SQLite file shared by every worker
+                             process on the host (RATE_LIMIT_BACKEND=sqlite)
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import wraps
+from flask import request, jsonify, current_app
+
+# Rule name -> config key holding "<limit>/<seconds>"
+RULES = {
+    'login': (('ip', 'RATE_LIMIT_LOGIN_IP'), ('email', 'RATE_LIMIT_LOGIN_EMAIL')),
+    'register': (('ip', 'RATE_LIMIT_REGISTER_IP'), ('email', 'RATE_LIMIT_REGISTER_EMAIL')),
+}
+
+DEFAULT_LIMITS = {
+    'RATE_LIMIT_LOGIN_IP': '20/60',
+    'RATE_LIMIT_LOGIN_EMAIL': '5/300',
+    'RATE_LIMIT_REGISTER_IP': '10/3600',
+    'RATE_LIMIT_REGISTER_EMAIL': '3/3600',
+}
+
+def parse_limit(value):
+    """Parse '<limit>/<seconds>' into (limit, seconds)"""
+    limit, _, window = str(value).partition('/')
+    return int(limit), float(window)
+
+class MemoryRateLimitBackend:
+    """In-process sliding-window log with at most max_keys tracked keys"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._events = OrderedDict()  # key -> deque of timestamps, oldest first
+        self._lock = threading.Lock()
+
+    def hit(self, checks, now):
+        """Record an attempt under every (key, limit, window) if all allow it;
+        return 0, or the seconds until one is allowed"""
+        with self._lock:
+            logs = []
+            retry_after = 0
+            for key, limit, window in checks:
+                events = self._events.get(key)
+                if events is None:
+                    events = self._events[key] = deque(maxlen=limit)
+                else:
+                    self._events.move_to_end(key)
+                while events and events[0] <= now - window:
+                    events.popleft()
+                if len(events) >= limit:
+                    retry_after = max(retry_after, events[0] + window - now)
+                logs.append(events)
+            if not retry_after:
+                for events in logs:
+                    events.append(now)
+            while len(self._events) > self.max_keys:
+                self._events.popitem(last=False)
+            return retry_after
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'keys': len(self._events), 'maxKeys': self.max_keys}
+
+class SQLiteRateLimitBackend:
+    """Sliding-window log in a SQLite file, shared by worker processes on one host"""
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path, max_window=86400):
+        self.path = path
+        self.max_window = max_window
+        self._local = threading.local()
+        self._hits = 0
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limit_events (
+                    key TEXT NOT NULL,
+                    ts REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_rate_limit_events_key_ts ON rate_limit_events (key, ts)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def hit(self, checks, now):
+        """Record an attempt under every (key, limit, window) if all allow it;
+        return 0, or the seconds until one is allowed"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            retry_after = 0
+            for key, limit, window in checks:
+                conn.execute('DELETE FROM rate_limit_events WHERE key = ? AND ts <= ?', (key, now - window))
+                count, oldest = conn.execute(
+                    'SELECT COUNT(*), MIN(ts) FROM rate_limit_events WHERE key = ?', (key,)
+                ).fetchone()
+                if count >= limit:
+                    retry_after = max(retry_after, oldest + window - now)
+            if retry_after:
+                conn.execute('COMMIT')
+                return retry_after
+            conn.executemany(
+                'INSERT INTO rate_limit_events (key, ts) VALUES (?, ?)',
+                [(key, now) for key, _, _ in checks]
+            )
+            self._hits += 1
+            if self._hits % self.PURGE_EVERY == 0:
+                # Keys that stopped being used are only cleaned up here
+                conn.execute('DELETE FROM rate_limit_events WHERE ts <= ?', (now - self.max_window,))
+            conn.execute('COMMIT')
+            return 0
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def stats(self):
+        keys = self._connect().execute('SELECT COUNT(DISTINCT key) FROM rate_limit_events').fetchone()[0]
+        return {'backend': 'sqlite', 'path': self.path, 'keys': keys}
+
+class RateLimiter:
+    """Applies the configured rules against a backend and counts outcomes"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryRateLimitBackend()
+        self.allowed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def check(self, rule, identities, config):
+        """Return 0 if allowed, else the Retry-After seconds; identities maps 'ip'/'email' to values"""
+        checks = []
+        for kind, config_key in RULES[rule]:
+            value = identities.get(kind)
+            if not value:
+                continue
+            limit, window = parse_limit(config.get(config_key, DEFAULT_LIMITS[config_key]))
+            checks.append((f'{rule}:{kind}:{value}', limit, window))
+        retry_after = self.backend.hit(checks, time.time()) if checks else 0
+        with self._lock:
+            if retry_after > 0:
+                self.rejected += 1
+            else:
+                self.allowed += 1
+        return retry_after
+
+    def stats(self):
+        with self._lock:
+            counts = {'allowed': self.allowed, 'rejected': self.rejected}
+        return {**counts, **self.backend.stats()}
+
+rate_limiter = RateLimiter()
+
+def configure_rate_limiter(backend='memory', path=None, max_keys=100000):
+    """Select the rate limit backend ('memory' or 'sqlite')"""
+    if backend == 'sqlite':
+        rate_limiter.backend = SQLiteRateLimitBackend(path)
+    elif backend == 'memory':
+        rate_limiter.backend = MemoryRateLimitBackend(max_keys)
+    else:
+        raise ValueError(f'Unknown rate limit backend: {backend}')
+
+def rate_limit(rule):
+    """Decorator rejecting requests over the per-IP / per-email limits of a rule"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_app.config.get('RATE_LIMIT_ENABLED', True):
+                return f(*args, **kwargs)
+            data = request.get_json(silent=True)
+            email = data.get('email') if isinstance(data, dict) else None
+            identities = {
+                'ip': request.remote_addr,
+                'email': email.strip().lower() if isinstance(email, str) else None
+            }
+            retry_after = rate_limiter.check(rule, identities, current_app.config)
+            if retry_after:
+                return jsonify({'error': 'Too many attempts, please try again later'}), 429, {
+                    'Retry-After': str(max(1, int(retry_after + 0.999)))
+                }
+            return f(*args, **kwargs)
+
+        return decorated_function
+    return decorator
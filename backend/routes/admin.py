@@ -0,0 +1,58 @@
+from flask import Blueprint, request, jsonify, current_app
+from database.db import get_db
+from middleware.auth import authenticate_token, require_admin
+from database.query_stats import query_stats, statement_plan, ORDERS
+from services.analytics import demand_report, WINDOWS
+
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.route('/analytics/demand', methods=['GET'])
+@authenticate_token
+@require_admin
+def get_demand_analytics():
+    try:
+        window = request.args.get('window', 'day')
+        if window not in WINDOWS:
+            return jsonify({'error': f'window must be one of {", ".join(WINDOWS)}'}), 400
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        
+        return jsonify(demand_report(get_db(), window, limit))
+        
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
+
+@admin_bp.route('/queries', methods=['GET'])
+@authenticate_token
+@require_admin
+def get_query_stats():
+    try:
+        order = request.args.get('sort', 'total')
+        if order not in ORDERS:
+            return jsonify({'error': f'sort must be one of {", ".join(ORDERS)}'}), 400
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+        with_plans = request.args.get('plan', 'true').lower() == 'true'
+        
+        statements = query_stats.top(limit, order)
+        if with_plans:
+            conn = get_db()
+            for statement in statements:
+                statement['plan'], statement['planProblems'] = statement_plan(statement['fingerprint'], conn)
+        
+        return jsonify({**query_stats.stats(), 'sort': order, 'queries': statements})
+        
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
+
+@admin_bp.route('/queries', methods=['DELETE'])
+@authenticate_token
+@require_admin
+def reset_query_stats():
+    try:
+        query_stats.reset()
+        return jsonify({'message': 'Query statistics reset'})
+        
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
@@ -1,11 +1,13 @@
-from flask import Blueprint, request, jsonify
-import bcrypt
+from flask import Blueprint, request, jsonify, current_app
 from database.db import get_db
+from services.password_hasher import password_hasher, PasswordHasherBusy
 from middleware.auth import generate_token, authenticate_token
+from middleware.rate_limit import rate_limit
 
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limit('register')
 def register():
     try:
         data = request.get_json()
@@ -22,11 +24,10 @@ def register():
         # Check if user already exists
         cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
         if cursor.fetchone():
-            conn.close()
             return jsonify({'error': 'User already exists'}), 400
         
         # Hash password
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = password_hasher.hash(password)
         
         # Create user
         cursor.execute(
@@ -38,7 +39,6 @@ def register():
         # Get the created user
         cursor.execute('SELECT id, name, email, role FROM users WHERE id = ?', (cursor.lastrowid,))
         user = dict(cursor.fetchone())
-        conn.close()
         
         # Generate token
         token = generate_token(user)
@@ -49,10 +49,14 @@ def register():
             'token': token
         }), 201
         
+    except PasswordHasherBusy as e:
+        return jsonify({'error': 'Server busy, please retry shortly'}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login')
 def login():
     try:
         data = request.get_json()
@@ -68,7 +72,6 @@ def login():
         # Find user
         cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
         user_row = cursor.fetchone()
-        conn.close()
         
         if not user_row:
             return jsonify({'error': 'Invalid email or password'}), 401
@@ -76,7 +79,7 @@ def login():
         user = dict(user_row)
         
         # Verify password
-        if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+        if not password_hasher.check(password, user['password']):
             return jsonify({'error': 'Invalid email or password'}), 401
         
         # Generate token
@@ -93,7 +96,30 @@ def login():
             'token': token
         })
         
+    except PasswordHasherBusy as e:
+        return jsonify({'error': 'Server busy, please retry shortly'}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
+
+@auth_bp.route('/refresh', methods=['POST'])
+@authenticate_token
+def refresh_token():
+    try:
+        # Re-read the user so role changes and deletions apply to the new token
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, name, email, role FROM users WHERE id = ?', (request.user['id'],))
+        user_row = cursor.fetchone()
+        
+        if not user_row:
+            return jsonify({'error': 'User not found'}), 404
+        
+        user = dict(user_row)
+        return jsonify({'user': user, 'token': generate_token(user)})
+        
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
 @auth_bp.route('/me', methods=['GET'])
@@ -107,7 +133,6 @@ def get_current_user():
             (request.user['id'],)
         )
         user_row = cursor.fetchone()
-        conn.close()
         
         if not user_row:
             return jsonify({'error': 'User not found'}), 404
@@ -115,5 +140,6 @@ def get_current_user():
         return jsonify({'user': dict(user_row)})
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
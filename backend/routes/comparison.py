@@ -1,52 +1,45 @@
-from flask import Blueprint, request, jsonify
-import json
+from flask import Blueprint, request, jsonify, current_app
 from database.db import get_db
+from services.serializers import lawyer_fragment, fragments_response
 from middleware.auth import authenticate_token
+from middleware.etags import conditional, bump_version
+from services.user_lists import parse_batch, apply_batch
 
 comparison_bp = Blueprint('comparison', __name__)
 
+MAX_COMPARISON_SIZE = 3
+
+COMPARISON_SQL = '''
+    SELECT l.* FROM lawyers l
+    INNER JOIN comparisons c ON l.id = c.lawyer_id
+    WHERE c.user_id = ?
+    ORDER BY c.created_at DESC
+    LIMIT ?
+'''
+
+COMPARISON_COUNT_SQL = 'SELECT COUNT(*) as count FROM comparisons WHERE user_id = ?'
+
+COMPARISON_MEMBER_SQL = 'SELECT * FROM comparisons WHERE user_id = ? AND lawyer_id = ?'
+
+def comparison_scopes():
+    return ['lawyers', f'comparison:{request.user["id"]}']
+
 @comparison_bp.route('/', methods=['GET'])
 @authenticate_token
+@conditional(comparison_scopes, private=True)
 def get_comparison():
     try:
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT l.* FROM lawyers l
-            INNER JOIN comparisons c ON l.id = c.lawyer_id
-            WHERE c.user_id = ?
-            ORDER BY c.created_at DESC
-            LIMIT 3
-        ''', (request.user['id'],))
-        
-        lawyers = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        # Format lawyers
-        formatted_lawyers = []
-        for lawyer in lawyers:
-            formatted_lawyer = {
-                **lawyer,
-                'specialties': json.loads(lawyer['specialties']) if lawyer['specialties'] else [],
-                'verified': bool(lawyer['verified']),
-                'mediationCertified': bool(lawyer['mediation_certified']),
-                'responseGuarantee': bool(lawyer['response_guarantee']),
-                'practiceArea': lawyer['practice_area'],
-                'experienceYears': lawyer['experience_years'],
-                'caseCount': lawyer['case_count'],
-                'successRate': lawyer['success_rate'],
-                'hourlyRateMin': lawyer['hourly_rate_min'],
-                'hourlyRateMax': lawyer['hourly_rate_max'],
-                'locationCity': lawyer['location_city'],
-                'locationState': lawyer['location_state'],
-                'maraNumber': lawyer['mara_number'],
-                'avatarColor': lawyer['avatar_color']
-            }
-            formatted_lawyers.append(formatted_lawyer)
-        
-        return jsonify({'comparison': formatted_lawyers})
+        cursor.execute(COMPARISON_SQL, (request.user['id'], MAX_COMPARISON_SIZE))
+        
+        lawyers = cursor.fetchall()
+        
+        fragments = [lawyer_fragment(lawyer) for lawyer in lawyers]
+        return fragments_response('comparison', fragments)
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
 @comparison_bp.route('/<int:lawyer_id>', methods=['POST'])
@@ -57,29 +50,20 @@ def add_to_comparison(lawyer_id):
         cursor = conn.cursor()
         
         # Check current count
-        cursor.execute(
-            'SELECT COUNT(*) as count FROM comparisons WHERE user_id = ?',
-            (request.user['id'],)
-        )
+        cursor.execute(COMPARISON_COUNT_SQL, (request.user['id'],))
         count = cursor.fetchone()['count']
         
-        if count >= 3:
-            conn.close()
-            return jsonify({'error': 'Maximum 3 lawyers can be compared'}), 400
+        if count >= MAX_COMPARISON_SIZE:
+            return jsonify({'error': f'Maximum {MAX_COMPARISON_SIZE} lawyers can be compared'}), 400
         
         # Check if lawyer exists
         cursor.execute('SELECT * FROM lawyers WHERE id = ?', (lawyer_id,))
         if not cursor.fetchone():
-            conn.close()
             return jsonify({'error': 'Lawyer not found'}), 404
         
         # Check if already in comparison
-        cursor.execute(
-            'SELECT * FROM comparisons WHERE user_id = ? AND lawyer_id = ?',
-            (request.user['id'], lawyer_id)
-        )
+        cursor.execute(COMPARISON_MEMBER_SQL, (request.user['id'], lawyer_id))
         if cursor.fetchone():
-            conn.close()
             return jsonify({'error': 'Lawyer already in comparison'}), 400
         
         # Add to comparison
@@ -87,12 +71,34 @@ def add_to_comparison(lawyer_id):
             'INSERT INTO comparisons (user_id, lawyer_id) VALUES (?, ?)',
             (request.user['id'], lawyer_id)
         )
+        bump_version(conn, f'comparison:{request.user["id"]}')
         conn.commit()
-        conn.close()
         
         return jsonify({'message': 'Lawyer added to comparison'}), 201
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
+
+@comparison_bp.route('/', methods=['PUT'])
+@authenticate_token
+def update_comparison_batch():
+    try:
+        try:
+            add, remove = parse_batch(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        conn = get_db()
+        results, changed, size = apply_batch(conn, 'comparisons', request.user['id'], add, remove, max_items=MAX_COMPARISON_SIZE)
+        if changed:
+            bump_version(conn, f'comparison:{request.user["id"]}')
+        conn.commit()
+        
+        return jsonify({'results': results, 'count': size})
+        
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
 @comparison_bp.route('/<int:lawyer_id>', methods=['DELETE'])
@@ -105,16 +111,16 @@ def remove_from_comparison(lawyer_id):
             'DELETE FROM comparisons WHERE user_id = ? AND lawyer_id = ?',
             (request.user['id'], lawyer_id)
         )
+        bump_version(conn, f'comparison:{request.user["id"]}')
         conn.commit()
         
         if cursor.rowcount == 0:
-            conn.close()
             return jsonify({'error': 'Lawyer not found in comparison'}), 404
         
-        conn.close()
         return jsonify({'message': 'Lawyer removed from comparison'})
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
 @comparison_bp.route('/', methods=['DELETE'])
@@ -124,11 +130,12 @@ def clear_comparison():
         conn = get_db()
         cursor = conn.cursor()
         cursor.execute('DELETE FROM comparisons WHERE user_id = ?', (request.user['id'],))
+        bump_version(conn, f'comparison:{request.user["id"]}')
         conn.commit()
-        conn.close()
         
         return jsonify({'message': 'Comparison cleared'})
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
@@ -1,24 +1,39 @@
-from flask import Blueprint, request, jsonify
+import math
+from flask import Blueprint, request, jsonify, current_app
 from database.db import get_db
 from middleware.auth import authenticate_token
+from middleware.etags import conditional
+from services.history_buffer import history_record, write_history, get_history_buffer
 
 history_bp = Blueprint('history', __name__)
 
+HISTORY_PAGE_SIZE = 50
+
+HISTORY_SQL = '''
+    SELECT * FROM search_history
+    WHERE user_id = ?
+    ORDER BY created_at DESC
+    LIMIT ?
+'''
+
+def history_scopes():
+    # Read-your-writes: commit this user's queued searches before the ETag is computed
+    buffer = get_history_buffer(current_app.config)
+    if buffer is not None and not buffer.settle(request.user['id']):
+        current_app.logger.warning('History for user %s still being written; serving what is committed',
+                                   request.user['id'])
+    return [f'history:{request.user["id"]}']
+
 @history_bp.route('/', methods=['GET'])
 @authenticate_token
+@conditional(history_scopes, private=True)
 def get_history():
     try:
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM search_history 
-            WHERE user_id = ? 
-            ORDER BY created_at DESC 
-            LIMIT 50
-        ''', (request.user['id'],))
+        cursor.execute(HISTORY_SQL, (request.user['id'], HISTORY_PAGE_SIZE))
         
         history = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         # Format history
         formatted_history = []
@@ -37,34 +52,34 @@ def get_history():
         return jsonify({'history': formatted_history})
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
 @history_bp.route('/', methods=['POST'])
 @authenticate_token
 def save_history():
     try:
-        data = request.get_json()
+        try:
+            record = history_record(request.user['id'], request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        buffer = get_history_buffer(current_app.config)
+        if buffer is not None:
+            if not buffer.submit(record):
+                # Queue full: the search was not saved, so say so instead of 202
+                return jsonify({'error': 'Server busy, please retry shortly'}), 503, {
+                    'Retry-After': str(max(1, math.ceil(buffer.flush_interval)))
+                }
+            return jsonify({'message': 'Search saved to history'}), 202
         
         conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO search_history 
-            (user_id, practice_area, state, min_experience, max_rate, response_guarantee, result_count)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            request.user['id'],
-            data.get('practiceArea'),
-            data.get('state'),
-            data.get('minExperience'),
-            data.get('maxRate'),
-            1 if data.get('responseGuarantee') else 0,
-            data.get('resultCount', 0)
-        ))
+        write_history(conn, [record])
         conn.commit()
-        conn.close()
         
         return jsonify({'message': 'Search saved to history'}), 201
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
@@ -1,116 +1,607 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
+import io
+import csv
 import json
-from database.db import get_db
+import re
+import zlib
+import html
+import base64
+from database.db import get_db, connection
+from database.catalog import get_catalog, loaded_catalog
+from services.serializers import lawyer_fragment, fragments_response, fragment_response, invalidate_lawyer, dumps, format_lawyer
+from database.bulk_import import import_stream, detect_format, FORMATS, DEFAULT_BATCH_SIZE, parse_number, parse_text
+from services.geo import nearest_lawyers, lawyers_in_box
+from services.facets import lawyer_facets
+from services.ranking import rank_lawyers, parse_weights, active_weights
+from services.similarity import refresh_similar, FEATURE_COLUMNS
 from middleware.auth import authenticate_token, require_admin
+from middleware.etags import conditional, bump_version, current_version
 
 lawyers_bp = Blueprint('lawyers', __name__)
 
+# Sortable columns; id is always the tie-breaker so keyset cursors are unique
+SORT_FIELDS = {'id': 'id', 'experience_years': 'experience_years',
+               'hourly_rate_min': 'hourly_rate_min', 'success_rate': 'success_rate'}
+
+# Sort columns that may be NULL; NULLs come last in DESC order, after every value
+NULLABLE_SORT_FIELDS = ('success_rate',)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(sort_field, lawyer):
+    """Encode the position after a lawyer row as an opaque cursor"""
+    payload = {'s': sort_field, 'id': lawyer['id']}
+    if sort_field != 'id':
+        payload['v'] = lawyer[sort_field]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, sort_field):
+    """Decode a cursor produced by encode_cursor, or raise ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        position = (payload.get('v'), int(payload['id']))
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError('Invalid cursor')
+    if payload.get('s') != sort_field:
+        raise ValueError('Cursor does not match sortBy')
+    if sort_field != 'id' and not isinstance(position[0], (int, float)):
+        if not (position[0] is None and sort_field in NULLABLE_SORT_FIELDS):
+            raise ValueError('Invalid cursor')
+    return position
+
+def parse_page_size(value):
+    """Clamp the requested page size to [1, MAX_PAGE_SIZE]"""
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(value, MAX_PAGE_SIZE))
+
+def build_lawyer_filters(practice_area=None, state=None, min_experience=None, max_rate=None,
+                         response_guarantee=False, sort_field=None, table=None):
+    """Build the ' AND ...' filter conditions on lawyers and their parameters"""
+    prefix = f'{table}.' if table else ''
+    conditions = ''
+    params = []
+    
+    if practice_area:
+        conditions += f' AND {prefix}practice_area = ?'
+        params.append(practice_area)
+    
+    if state:
+        conditions += f' AND {prefix}location_state = ?'
+        params.append(state)
+    
+    # Range filters on a column other than the sort column are written with a
+    # unary + so SQLite walks the sort-order index instead of range-scanning
+    # and then sorting the matches in a temp B-tree
+    if min_experience:
+        plus = '' if sort_field == 'experience_years' else '+'
+        conditions += f' AND {plus}{prefix}experience_years >= ?'
+        params.append(min_experience)
+    
+    if max_rate:
+        plus = '' if sort_field == 'hourly_rate_min' else '+'
+        conditions += f' AND {plus}{prefix}hourly_rate_min <= ?'
+        params.append(max_rate)
+    
+    if response_guarantee:
+        conditions += f' AND {prefix}response_guarantee = 1'
+    
+    return conditions, params
+
+def build_lawyers_query(practice_area=None, state=None, min_experience=None, max_rate=None,
+                        response_guarantee=False, sort_field='id', position=None, limit=None):
+    """Build the filtered, keyset-paginated lawyers query and its parameters"""
+    conditions, params = build_lawyer_filters(
+        practice_area, state, min_experience, max_rate, response_guarantee, sort_field
+    )
+    query = 'SELECT * FROM lawyers WHERE 1=1' + conditions
+    
+    # Keyset pagination: continue strictly after the last row of the previous page.
+    # A row value comparison never matches NULL, so the trailing NULL rows are
+    # a separate section: position (None, id) continues inside it and
+    # (None, None) starts it (see query_lawyers_page)
+    if position:
+        value, last_id = position
+        if sort_field == 'id':
+            query += ' AND id < ?'
+            params.append(last_id)
+        elif value is None:
+            query += f' AND {sort_field} IS NULL'
+            if last_id is not None:
+                query += ' AND id < ?'
+                params.append(last_id)
+        else:
+            query += f' AND ({sort_field}, id) < (?, ?)'
+            params.extend(position)
+    
+    if sort_field == 'id':
+        query += ' ORDER BY id DESC'
+    else:
+        query += f' ORDER BY {sort_field} DESC, id DESC'
+    
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    
+    return query, params
+
+def query_lawyers_page(conn, filters, sort_field='id', position=None, limit=DEFAULT_PAGE_SIZE):
+    """Up to limit rows after position from SQLite, running on into the NULL section"""
+    query, params = build_lawyers_query(sort_field=sort_field, position=position, limit=limit, **filters)
+    lawyers = [dict(row) for row in conn.execute(query, params)]
+    if (len(lawyers) < limit and position and position[0] is not None
+            and sort_field in NULLABLE_SORT_FIELDS):
+        query, params = build_lawyers_query(
+            sort_field=sort_field, position=(None, None), limit=limit - len(lawyers), **filters
+        )
+        lawyers.extend(dict(row) for row in conn.execute(query, params))
+    return lawyers
+
+def parse_lawyer_filters(args):
+    """Read the listing filters from query args as build_lawyers_query keywords"""
+    return {
+        'practice_area': args.get('practiceArea'),
+        'state': args.get('state'),
+        'min_experience': args.get('minExperience', type=int),
+        'max_rate': args.get('maxRate', type=float),
+        'response_guarantee': args.get('responseGuarantee') == 'true'
+    }
+
+def lawyer_catalog():
+    """Get the in-memory lawyer catalog, or None when LAWYER_CATALOG is off"""
+    if not current_app.config.get('LAWYER_CATALOG', True):
+        return None
+    return get_catalog(get_db(), current_version('lawyers'))
+
+def sync_lawyer_caches(conn, lawyer_id):
+    """Apply a committed write to the catalog and serializer cache"""
+    invalidate_lawyer(lawyer_id)
+    catalog = loaded_catalog()
+    if catalog is not None:
+        catalog.refresh_lawyer(conn, lawyer_id)
+        # Our own write is now applied; a larger gap means another process
+        # wrote too, and the next read reloads the catalog
+        version = current_version('lawyers')
+        if catalog.source_version == version - 1:
+            catalog.source_version = version
+
+def directory_scopes():
+    return ['lawyers']
+
 @lawyers_bp.route('/', methods=['GET'])
+@conditional(directory_scopes)
 def get_lawyers():
     try:
-        practice_area = request.args.get('practiceArea')
-        state = request.args.get('state')
-        min_experience = request.args.get('minExperience', type=int)
-        max_rate = request.args.get('maxRate', type=float)
-        response_guarantee = request.args.get('responseGuarantee') == 'true'
+        filters = parse_lawyer_filters(request.args)
         sort_by = request.args.get('sortBy', 'id')
+        limit = parse_page_size(request.args.get('limit', type=int))
+        sort_field = SORT_FIELDS.get(sort_by, 'id')
+        
+        position = None
+        cursor_param = request.args.get('cursor')
+        if cursor_param:
+            try:
+                position = decode_cursor(cursor_param, sort_field)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        # Fetch one extra row to learn whether another page exists
+        catalog = lawyer_catalog()
+        if catalog is not None:
+            lawyers = catalog.query(filters, sort_field, position, limit + 1)
+        else:
+            lawyers = query_lawyers_page(get_db(), filters, sort_field, position, limit + 1)
+        
+        next_cursor = None
+        if len(lawyers) > limit:
+            lawyers = lawyers[:limit]
+            next_cursor = encode_cursor(sort_field, lawyers[-1])
+        
+        fragments = [lawyer_fragment(lawyer) for lawyer in lawyers]
+        return fragments_response('lawyers', fragments, nextCursor=next_cursor)
         
-        conn = get_db()
-        cursor = conn.cursor()
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
+
+# bm25 column weights for name, firm, bio, specialties, location_city
+SEARCH_WEIGHTS = (10.0, 5.0, 1.0, 4.0, 2.0)
+MAX_SEARCH_OFFSET = 1000
+
+def build_match_expression(text):
+    """Turn free text into an FTS5 MATCH expression.
+
+    Terms are ANDed; the last term (or any ending in *) is prefix-matched so
+    partially typed words still match.
+    """
+    terms = re.findall(r'\w+\*?', text)
+    expression = []
+    for index, term in enumerate(terms):
+        prefix = term.endswith('*') or index == len(terms) - 1
+        expression.append('"{}"{}'.format(term.rstrip('*'), '*' if prefix else ''))
+    return ' '.join(expression)
+
+def highlight(snippet):
+    """HTML-escape a snippet and turn the match markers into <mark> tags"""
+    return html.escape(snippet, quote=False).replace('\x02', '<mark>').replace('\x03', '</mark>')
+
+@lawyers_bp.route('/search', methods=['GET'])
+@conditional(directory_scopes)
+def search_lawyers():
+    try:
+        match = build_match_expression(request.args.get('q', ''))
+        if not match:
+            return jsonify({'error': 'Search query is required'}), 400
+        
+        filters = parse_lawyer_filters(request.args)
+        limit = parse_page_size(request.args.get('limit', type=int))
+        offset = max(0, request.args.get('offset', 0, type=int))
+        if offset > MAX_SEARCH_OFFSET:
+            return jsonify({'error': f'offset cannot exceed {MAX_SEARCH_OFFSET}'}), 400
+        
+        conditions, params = build_lawyer_filters(table='l', **filters)
+        weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+        cursor = get_db().cursor()
+        cursor.execute(f'''
+            SELECT l.*,
+                   bm25(lawyers_fts, {weights}) AS search_rank,
+                   snippet(lawyers_fts, -1, char(2), char(3), '…', 12) AS search_snippet
+            FROM lawyers_fts
+            INNER JOIN lawyers l ON l.id = lawyers_fts.rowid
+            WHERE lawyers_fts MATCH ?{conditions}
+            ORDER BY search_rank
+            LIMIT ? OFFSET ?
+        ''', [match, *params, limit + 1, offset])
+        rows = cursor.fetchall()
+        
+        next_offset = offset + limit if len(rows) > limit else None
+        results = []
+        for row in rows[:limit]:
+            lawyer = dict(row)
+            rank = lawyer.pop('search_rank')
+            snippet = lawyer.pop('search_snippet')
+            results.append(b''.join([
+                b'{"lawyer":', lawyer_fragment(lawyer),
+                b',"rank":', dumps(round(-rank, 4)),
+                b',"snippet":', dumps(highlight(snippet)), b'}'
+            ]))
+        
+        return fragments_response('results', results, nextOffset=next_offset)
+        
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
+
+DEFAULT_NEARBY_RADIUS_KM = 25.0
+MAX_NEARBY_RADIUS_KM = 500.0
+DEFAULT_NEARBY_RESULTS = 20
+DEFAULT_VIEWPORT_RESULTS = 500
+MAX_VIEWPORT_RESULTS = 2000
+
+def parse_coordinate(name, low, high):
+    """Read a required float query arg within [low, high], or raise ValueError"""
+    value = request.args.get(name, type=float)
+    if value is None or not low <= value <= high:
+        raise ValueError(f'{name} must be a number between {low} and {high}')
+    return value
+
+@lawyers_bp.route('/nearby', methods=['GET'])
+@conditional(directory_scopes)
+def get_nearby_lawyers():
+    try:
+        try:
+            lat = parse_coordinate('lat', -90, 90)
+            lng = parse_coordinate('lng', -180, 180)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        radius_km = request.args.get('radiusKm', DEFAULT_NEARBY_RADIUS_KM, type=float)
+        radius_km = max(0.1, min(radius_km, MAX_NEARBY_RADIUS_KM))
+        limit = parse_page_size(request.args.get('limit', DEFAULT_NEARBY_RESULTS, type=int))
+        conditions, params = build_lawyer_filters(table='l', **parse_lawyer_filters(request.args))
+        
+        nearest = nearest_lawyers(get_db(), lat, lng, radius_km, limit, conditions, params)
+        results = [
+            b''.join([b'{"distanceKm":', dumps(round(distance, 3)),
+                      b',"lawyer":', lawyer_fragment(row), b'}'])
+            for distance, row in nearest
+        ]
+        
+        return fragments_response('results', results)
+        
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
+
+@lawyers_bp.route('/viewport', methods=['GET'])
+@conditional(directory_scopes)
+def get_viewport_lawyers():
+    try:
+        try:
+            north = parse_coordinate('north', -90, 90)
+            south = parse_coordinate('south', -90, 90)
+            east = parse_coordinate('east', -180, 180)
+            west = parse_coordinate('west', -180, 180)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if south > north or west > east:
+            return jsonify({'error': 'Viewport must satisfy south <= north and west <= east'}), 400
+        
+        limit = request.args.get('limit', DEFAULT_VIEWPORT_RESULTS, type=int)
+        limit = max(1, min(limit, MAX_VIEWPORT_RESULTS))
+        conditions, params = build_lawyer_filters(table='l', **parse_lawyer_filters(request.args))
+        
+        rows = lawyers_in_box(get_db(), south, north, west, east, conditions, params, limit + 1)
+        fragments = [lawyer_fragment(row) for row in rows[:limit]]
+        
+        return fragments_response('lawyers', fragments, truncated=len(rows) > limit)
+        
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
+
+MAX_BATCH_IDS = 500
+
+ID_LIST_PART = re.compile(r'[^,]+')
+
+def parse_id_list(value, limit=MAX_BATCH_IDS):
+    """Parse a comma-separated id list, dropping duplicates but keeping order.
+
+    Raises ValueError for a malformed list, or as soon as more than limit
+    distinct ids have been read.
+    """
+    ids = {}
+    for match in ID_LIST_PART.finditer(value or ''):
+        part = match.group().strip()
+        if not part:
+            continue
+        if not part.isdigit():
+            raise ValueError('ids must be a comma-separated list of lawyer ids')
+        ids[int(part)] = None
+        if len(ids) > limit:
+            raise ValueError(f'At most {limit} ids per request')
+    return list(ids)
+
+@lawyers_bp.route('/batch', methods=['GET'])
+@conditional(directory_scopes)
+def get_lawyers_batch():
+    try:
+        try:
+            ids = parse_id_list(request.args.get('ids'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not ids:
+            return jsonify({'error': 'ids is required'}), 400
+        
+        catalog = lawyer_catalog()
+        if catalog is not None:
+            found = {lawyer_id: catalog.get(lawyer_id) for lawyer_id in ids}
+        else:
+            cursor = get_db().cursor()
+            cursor.execute(
+                'SELECT * FROM lawyers WHERE id IN (SELECT value FROM json_each(?))',
+                (json.dumps(ids),)
+            )
+            found = {row['id']: row for row in cursor.fetchall()}
+        
+        fragments = [lawyer_fragment(found[lawyer_id]) for lawyer_id in ids if found.get(lawyer_id)]
+        missing = [lawyer_id for lawyer_id in ids if not found.get(lawyer_id)]
+        return fragments_response('lawyers', fragments, missing=missing)
+        
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
+
+@lawyers_bp.route('/facets', methods=['GET'])
+@conditional(directory_scopes)
+def get_lawyer_facets():
+    try:
+        filters = parse_lawyer_filters(request.args)
+        return jsonify(lawyer_facets(get_db(), lawyer_catalog(), filters, current_version('lawyers')))
         
-        query = 'SELECT * FROM lawyers WHERE 1=1'
-        params = []
-        
-        if practice_area:
-            query += ' AND practice_area = ?'
-            params.append(practice_area)
-        
-        if state:
-            query += ' AND location_state = ?'
-            params.append(state)
-        
-        if min_experience:
-            query += ' AND experience_years >= ?'
-            params.append(min_experience)
-        
-        if max_rate:
-            query += ' AND hourly_rate_min <= ?'
-            params.append(max_rate)
-        
-        if response_guarantee:
-            query += ' AND response_guarantee = 1'
-        
-        # Sorting
-        valid_sorts = {'id': 'id', 'experience_years': 'experience_years', 
-                      'hourly_rate_min': 'hourly_rate_min', 'success_rate': 'success_rate'}
-        sort_field = valid_sorts.get(sort_by, 'id')
-        query += f' ORDER BY {sort_field} DESC'
-        
-        cursor.execute(query, params)
-        lawyers = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        # Format lawyers
-        formatted_lawyers = []
-        for lawyer in lawyers:
-            formatted_lawyer = {
-                **lawyer,
-                'specialties': json.loads(lawyer['specialties']) if lawyer['specialties'] else [],
-                'verified': bool(lawyer['verified']),
-                'mediationCertified': bool(lawyer['mediation_certified']),
-                'responseGuarantee': bool(lawyer['response_guarantee']),
-                'practiceArea': lawyer['practice_area'],
-                'experienceYears': lawyer['experience_years'],
-                'caseCount': lawyer['case_count'],
-                'successRate': lawyer['success_rate'],
-                'hourlyRateMin': lawyer['hourly_rate_min'],
-                'hourlyRateMax': lawyer['hourly_rate_max'],
-                'locationCity': lawyer['location_city'],
-                'locationState': lawyer['location_state'],
-                'maraNumber': lawyer['mara_number'],
-                'avatarColor': lawyer['avatar_color']
-            }
-            formatted_lawyers.append(formatted_lawyer)
-        
-        return jsonify({'lawyers': formatted_lawyers})
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
+
+DEFAULT_BEST_MATCH_RESULTS = 20
+
+@lawyers_bp.route('/best-match', methods=['GET'])
+@conditional(directory_scopes)
+def get_best_match_lawyers():
+    try:
+        try:
+            weights = parse_weights(request.args.get('weights'))
+            origin = None
+            if 'lat' in request.args or 'lng' in request.args:
+                origin = (parse_coordinate('lat', -90, 90), parse_coordinate('lng', -180, 180))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        budget = request.args.get('budget', type=float)
+        if budget is not None and budget <= 0:
+            return jsonify({'error': 'budget must be a positive hourly rate'}), 400
+        
+        filters = parse_lawyer_filters(request.args)
+        limit = parse_page_size(request.args.get('limit', DEFAULT_BEST_MATCH_RESULTS, type=int))
+        conditions, params = build_lawyer_filters(**filters)
+        
+        ranked = rank_lawyers(get_db(), lawyer_catalog(), filters, conditions, params,
+                              weights, budget, origin, limit)
+        results = [
+            b''.join([b'{"lawyer":', lawyer_fragment(row), b',"score":', dumps(round(score, 4)),
+                      b',"scores":', dumps({name: round(value, 4) for name, value in components.items()}), b'}'])
+            for score, components, row in ranked
+        ]
+        
+        return fragments_response('results', results, weights=active_weights(weights, budget, origin))
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
+
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def iter_export(fmt, conditions, params, compress):
+    """Yield the export body in ~64KB chunks straight from a SQLite cursor"""
+    encoder = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    
+    def take():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return encoder.compress(data) if encoder else data
+    
+    # A dedicated pooled connection is held for the life of the stream; the
+    # single SELECT reads one consistent snapshot under WAL
+    with connection() as conn:
+        cursor = conn.execute(f'SELECT * FROM lawyers WHERE 1=1{conditions} ORDER BY id', params)
+        columns = [col[0] for col in cursor.description]
+        if writer:
+            writer.writerow(columns)
+        for row in cursor:
+            if writer:
+                writer.writerow(row)
+            else:
+                # Bypass the fragment cache so a full export does not evict hot entries
+                buffer.write(dumps(format_lawyer(dict(zip(columns, row)))).decode('utf-8'))
+                buffer.write('\n')
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                chunk = take()
+                if chunk:
+                    yield chunk
+    
+    chunk = take()
+    if encoder:
+        chunk += encoder.flush()
+    if chunk:
+        yield chunk
+
+@lawyers_bp.route('/export', methods=['GET'])
+@authenticate_token
+@require_admin
+def export_lawyers():
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'error': f'format must be one of {", ".join(EXPORT_FORMATS)}'}), 400
+        compress = request.args.get('gzip') == 'true'
+        conditions, params = build_lawyer_filters(**parse_lawyer_filters(request.args))
+        
+        response = current_app.response_class(
+            stream_with_context(iter_export(fmt, conditions, params, compress)),
+            mimetype=EXPORT_FORMATS[fmt]
+        )
+        response.headers['Content-Disposition'] = f'attachment; filename=lawyers.{fmt}'
+        if compress:
+            response.headers['Content-Encoding'] = 'gzip'
+        return response
+        
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
 @lawyers_bp.route('/<int:lawyer_id>', methods=['GET'])
+@conditional(directory_scopes)
 def get_lawyer(lawyer_id):
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM lawyers WHERE id = ?', (lawyer_id,))
-        lawyer_row = cursor.fetchone()
-        conn.close()
+        catalog = lawyer_catalog()
+        if catalog is not None:
+            lawyer_row = catalog.get(lawyer_id)
+        else:
+            cursor = get_db().cursor()
+            cursor.execute('SELECT * FROM lawyers WHERE id = ?', (lawyer_id,))
+            lawyer_row = cursor.fetchone()
         
         if not lawyer_row:
             return jsonify({'error': 'Lawyer not found'}), 404
         
-        lawyer = dict(lawyer_row)
-        formatted_lawyer = {
-            **lawyer,
-            'specialties': json.loads(lawyer['specialties']) if lawyer['specialties'] else [],
-            'verified': bool(lawyer['verified']),
-            'mediationCertified': bool(lawyer['mediation_certified']),
-            'responseGuarantee': bool(lawyer['response_guarantee']),
-            'practiceArea': lawyer['practice_area'],
-            'experienceYears': lawyer['experience_years'],
-            'caseCount': lawyer['case_count'],
-            'successRate': lawyer['success_rate'],
-            'hourlyRateMin': lawyer['hourly_rate_min'],
-            'hourlyRateMax': lawyer['hourly_rate_max'],
-            'locationCity': lawyer['location_city'],
-            'locationState': lawyer['location_state'],
-            'maraNumber': lawyer['mara_number'],
-            'avatarColor': lawyer['avatar_color']
-        }
+        return fragment_response('lawyer', lawyer_fragment(lawyer_row))
         
-        return jsonify({'lawyer': formatted_lawyer})
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
+
+# API field -> (cast, nullable, low, high) for the numeric lawyer columns
+NUMERIC_LAWYER_FIELDS = {
+    'experienceYears': (int, False, 0, None),
+    'caseCount': (int, True, 0, None),
+    'successRate': (int, True, 0, 100),
+    'hourlyRateMin': (float, False, 0, None),
+    'hourlyRateMax': (float, False, 0, None),
+    'lat': (float, True, -90, 90),
+    'lng': (float, True, -180, 180),
+}
+
+TEXT_LAWYER_FIELDS = ('name', 'firm', 'tier', 'practiceArea', 'locationCity', 'locationState',
+                      'maraNumber', 'bio', 'avatarColor', 'externalId')
+
+def validate_lawyer_fields(data):
+    """Copy of a create/update body with its typed fields coerced, or raise ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError('Body must be a JSON object')
+    values = dict(data)
+    for key, (cast, nullable, low, high) in NUMERIC_LAWYER_FIELDS.items():
+        if key not in data:
+            continue
+        value = parse_number(data[key], key, cast)
+        if value is None and not nullable:
+            raise ValueError(f'{key} must be a number')
+        if value is not None and (value < low or (high is not None and value > high)):
+            if high is None:
+                raise ValueError(f'{key} must be at least {low}')
+            raise ValueError(f'{key} must be between {low} and {high}')
+        values[key] = value
+    for key in TEXT_LAWYER_FIELDS:
+        if key in data:
+            values[key] = parse_text(data[key], key)
+    specialties = data.get('specialties')
+    if specialties is not None and not isinstance(specialties, (list, str)):
+        raise ValueError('specialties must be a list')
+    rate_min, rate_max = values.get('hourlyRateMin'), values.get('hourlyRateMax')
+    if rate_min is not None and rate_max is not None and rate_max < rate_min:
+        raise ValueError('hourlyRateMax must be at least hourlyRateMin')
+    return values
+
+SIMILAR_LAWYERS_SQL = '''
+    SELECT l.*, s.score AS similarity_score FROM lawyer_similar s
+    INNER JOIN lawyers l ON l.id = s.similar_id
+    WHERE s.lawyer_id = ?
+    ORDER BY s.rank
+    LIMIT ?
+'''
+
+def similar_scopes():
+    return ['lawyers', 'similar']
+
+@lawyers_bp.route('/<int:lawyer_id>/similar', methods=['GET'])
+@conditional(similar_scopes)
+def get_similar_lawyers(lawyer_id):
+    try:
+        # Only SIMILAR_NEIGHBORS lawyers are stored per list
+        neighbors = current_app.config.get('SIMILAR_NEIGHBORS', 10)
+        limit = max(1, min(request.args.get('limit', neighbors, type=int), neighbors))
+        
+        conn = get_db()
+        if not conn.execute('SELECT 1 FROM lawyers WHERE id = ?', (lawyer_id,)).fetchone():
+            return jsonify({'error': 'Lawyer not found'}), 404
+        
+        rows = conn.execute(SIMILAR_LAWYERS_SQL, (lawyer_id, limit)).fetchall()
+        results = []
+        for row in rows:
+            lawyer = dict(row)
+            score = lawyer.pop('similarity_score')
+            results.append(b''.join([b'{"lawyer":', lawyer_fragment(lawyer),
+                                     b',"similarity":', dumps(round(score, 4)), b'}']))
+        
+        return fragments_response('results', results)
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
 @lawyers_bp.route('/', methods=['POST'])
@@ -118,7 +609,10 @@ def get_lawyer(lawyer_id):
 @require_admin
 def create_lawyer():
     try:
-        data = request.get_json()
+        try:
+            data = validate_lawyer_fields(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         required_fields = ['name', 'firm', 'practiceArea', 'experienceYears', 
                           'hourlyRateMin', 'hourlyRateMax', 'locationCity', 'locationState']
@@ -133,8 +627,8 @@ def create_lawyer():
                 name, firm, tier, practice_area, specialties, experience_years,
                 case_count, success_rate, hourly_rate_min, hourly_rate_max,
                 location_city, location_state, verified, mediation_certified,
-                response_guarantee, mara_number, bio, avatar_color
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                response_guarantee, mara_number, bio, avatar_color, lat, lng, external_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             data['name'],
             data['firm'],
@@ -153,15 +647,21 @@ def create_lawyer():
             1 if data.get('responseGuarantee', False) else 0,
             data.get('maraNumber'),
             data.get('bio'),
-            data.get('avatarColor', '#000000')
+            data.get('avatarColor', '#000000'),
+            data.get('lat'),
+            data.get('lng'),
+            data.get('externalId')
         ))
         
+        refresh_similar(conn, cursor.lastrowid, current_app.config.get('SIMILAR_NEIGHBORS', 10))
+        bump_version(conn, 'lawyers')
         conn.commit()
-        conn.close()
+        sync_lawyer_caches(conn, cursor.lastrowid)
         
         return jsonify({'message': 'Lawyer created successfully'}), 201
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
 @lawyers_bp.route('/<int:lawyer_id>', methods=['PUT'])
@@ -169,7 +669,10 @@ def create_lawyer():
 @require_admin
 def update_lawyer(lawyer_id):
     try:
-        data = request.get_json()
+        try:
+            data = validate_lawyer_fields(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         conn = get_db()
         cursor = conn.cursor()
@@ -196,7 +699,9 @@ def update_lawyer(lawyer_id):
             'responseGuarantee': 'response_guarantee',
             'maraNumber': 'mara_number',
             'bio': 'bio',
-            'avatarColor': 'avatar_color'
+            'avatarColor': 'avatar_color',
+            'lat': 'lat',
+            'lng': 'lng'
         }
         
         for key, value in data.items():
@@ -213,19 +718,29 @@ def update_lawyer(lawyer_id):
                     values.append(value)
         
         if not updates:
-            conn.close()
             return jsonify({'error': 'No valid fields to update'}), 400
         
+        # Bump the row version so cached serializations are never reused
+        updates.append('version = version + 1')
         values.append(lawyer_id)
         query = f'UPDATE lawyers SET {", ".join(updates)} WHERE id = ?'
         
         cursor.execute(query, values)
+        if cursor.rowcount == 0:
+            # Nothing changed, so leave the directory's ETags alone
+            conn.rollback()
+            return jsonify({'error': 'Lawyer not found'}), 404
+        # Only the similarity features can change the stored lists
+        if any(field_mapping.get(key) in FEATURE_COLUMNS for key in data):
+            refresh_similar(conn, lawyer_id, current_app.config.get('SIMILAR_NEIGHBORS', 10))
+        bump_version(conn, 'lawyers')
         conn.commit()
-        conn.close()
+        sync_lawyer_caches(conn, lawyer_id)
         
         return jsonify({'message': 'Lawyer updated successfully'})
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
 @lawyers_bp.route('/<int:lawyer_id>', methods=['DELETE'])
@@ -236,14 +751,45 @@ def delete_lawyer(lawyer_id):
         conn = get_db()
         cursor = conn.cursor()
         cursor.execute('DELETE FROM lawyers WHERE id = ?', (lawyer_id,))
-        conn.commit()
-        conn.close()
-        
         if cursor.rowcount == 0:
+            # Nothing changed, so leave the directory's ETags alone
+            conn.rollback()
             return jsonify({'error': 'Lawyer not found'}), 404
+        refresh_similar(conn, lawyer_id, current_app.config.get('SIMILAR_NEIGHBORS', 10))
+        bump_version(conn, 'lawyers')
+        conn.commit()
+        sync_lawyer_caches(conn, lawyer_id)
         
         return jsonify({'message': 'Lawyer deleted successfully'})
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
+@lawyers_bp.route('/import', methods=['POST'])
+@authenticate_token
+@require_admin
+def bulk_import_lawyers():
+    try:
+        fmt = request.args.get('format') or detect_format(content_type=request.content_type)
+        if fmt not in FORMATS:
+            return jsonify({'error': f'format must be one of {", ".join(FORMATS)}'}), 400
+        batch_size = max(1, request.args.get('batchSize', DEFAULT_BATCH_SIZE, type=int))
+        
+        def log_progress(summary):
+            current_app.logger.info(
+                'Lawyer import: %(processed)d processed, %(inserted)d inserted, '
+                '%(updated)d updated, %(rejected)d rejected', summary
+            )
+        
+        defer_indexes = request.args.get('deferIndexes') == 'true'
+        summary = import_stream(get_db(), request.stream, fmt, batch_size, log_progress, defer_indexes,
+                                current_app.config.get('SIMILAR_NEIGHBORS', 10))
+        
+        return jsonify({'message': 'Import complete', **summary})
+        
+    except ValueError as e:
+        return jsonify({'error': f'Could not parse import: {e}'}), 400
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
@@ -1,51 +1,40 @@
-from flask import Blueprint, request, jsonify
-import json
+from flask import Blueprint, request, jsonify, current_app
 from database.db import get_db
+from services.serializers import lawyer_fragment, fragments_response
 from middleware.auth import authenticate_token
+from middleware.etags import conditional, bump_version
+from services.user_lists import parse_batch, apply_batch
 
 shortlist_bp = Blueprint('shortlist', __name__)
 
+SHORTLIST_SQL = '''
+    SELECT l.* FROM lawyers l
+    INNER JOIN shortlists s ON l.id = s.lawyer_id
+    WHERE s.user_id = ?
+    ORDER BY s.created_at DESC
+'''
+
+SHORTLIST_MEMBER_SQL = 'SELECT * FROM shortlists WHERE user_id = ? AND lawyer_id = ?'
+
+def shortlist_scopes():
+    return ['lawyers', f'shortlist:{request.user["id"]}']
+
 @shortlist_bp.route('/', methods=['GET'])
 @authenticate_token
+@conditional(shortlist_scopes, private=True)
 def get_shortlist():
     try:
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT l.* FROM lawyers l
-            INNER JOIN shortlists s ON l.id = s.lawyer_id
-            WHERE s.user_id = ?
-            ORDER BY s.created_at DESC
-        ''', (request.user['id'],))
+        cursor.execute(SHORTLIST_SQL, (request.user['id'],))
         
-        lawyers = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        lawyers = cursor.fetchall()
         
-        # Format lawyers
-        formatted_lawyers = []
-        for lawyer in lawyers:
-            formatted_lawyer = {
-                **lawyer,
-                'specialties': json.loads(lawyer['specialties']) if lawyer['specialties'] else [],
-                'verified': bool(lawyer['verified']),
-                'mediationCertified': bool(lawyer['mediation_certified']),
-                'responseGuarantee': bool(lawyer['response_guarantee']),
-                'practiceArea': lawyer['practice_area'],
-                'experienceYears': lawyer['experience_years'],
-                'caseCount': lawyer['case_count'],
-                'successRate': lawyer['success_rate'],
-                'hourlyRateMin': lawyer['hourly_rate_min'],
-                'hourlyRateMax': lawyer['hourly_rate_max'],
-                'locationCity': lawyer['location_city'],
-                'locationState': lawyer['location_state'],
-                'maraNumber': lawyer['mara_number'],
-                'avatarColor': lawyer['avatar_color']
-            }
-            formatted_lawyers.append(formatted_lawyer)
-        
-        return jsonify({'shortlist': formatted_lawyers})
+        fragments = [lawyer_fragment(lawyer) for lawyer in lawyers]
+        return fragments_response('shortlist', fragments)
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
 @shortlist_bp.route('/<int:lawyer_id>', methods=['POST'])
@@ -58,16 +47,11 @@ def add_to_shortlist(lawyer_id):
         # Check if lawyer exists
         cursor.execute('SELECT * FROM lawyers WHERE id = ?', (lawyer_id,))
         if not cursor.fetchone():
-            conn.close()
             return jsonify({'error': 'Lawyer not found'}), 404
         
         # Check if already in shortlist
-        cursor.execute(
-            'SELECT * FROM shortlists WHERE user_id = ? AND lawyer_id = ?',
-            (request.user['id'], lawyer_id)
-        )
+        cursor.execute(SHORTLIST_MEMBER_SQL, (request.user['id'], lawyer_id))
         if cursor.fetchone():
-            conn.close()
             return jsonify({'error': 'Lawyer already in shortlist'}), 400
         
         # Add to shortlist
@@ -75,12 +59,34 @@ def add_to_shortlist(lawyer_id):
             'INSERT INTO shortlists (user_id, lawyer_id) VALUES (?, ?)',
             (request.user['id'], lawyer_id)
         )
+        bump_version(conn, f'shortlist:{request.user["id"]}')
         conn.commit()
-        conn.close()
         
         return jsonify({'message': 'Lawyer added to shortlist'}), 201
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
+
+@shortlist_bp.route('/', methods=['PUT'])
+@authenticate_token
+def update_shortlist_batch():
+    try:
+        try:
+            add, remove = parse_batch(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        conn = get_db()
+        results, changed, size = apply_batch(conn, 'shortlists', request.user['id'], add, remove)
+        if changed:
+            bump_version(conn, f'shortlist:{request.user["id"]}')
+        conn.commit()
+        
+        return jsonify({'results': results, 'count': size})
+        
+    except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
 @shortlist_bp.route('/<int:lawyer_id>', methods=['DELETE'])
@@ -93,15 +99,15 @@ def remove_from_shortlist(lawyer_id):
             'DELETE FROM shortlists WHERE user_id = ? AND lawyer_id = ?',
             (request.user['id'], lawyer_id)
         )
+        bump_version(conn, f'shortlist:{request.user["id"]}')
         conn.commit()
         
         if cursor.rowcount == 0:
-            conn.close()
             return jsonify({'error': 'Lawyer not found in shortlist'}), 404
         
-        conn.close()
         return jsonify({'message': 'Lawyer removed from shortlist'})
         
     except Exception as e:
+        current_app.logger.exception('%s %s failed', request.method, request.path)
         return jsonify({'error': 'Internal server error'}), 500
 
@@ -0,0 +1 @@
+# Empty init file to make services a Python package
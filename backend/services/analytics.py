@@ -0,0 +1,114 @@
+"""Incremental search-demand counters for the admin dashboard.
+
+Every batch of search_history rows also updates hourly counters in
+demand_counters, in the same transaction:
+
+* ``combo``: searches and zero-result searches per filter combination
+* ``state_area``: searches per state and practice area (the demand heatmap)
+
+Reports sum the hourly buckets in a window and never touch search_history.
+Buckets older than RETENTION_SECONDS are pruned as new hours start.
+"""
+import calendar
+import json
+import time
+from collections import Counter
+
+BUCKET_SECONDS = 3600
+WINDOWS = {'hour': 3600, 'day': 86400, 'week': 7 * 86400}
+RETENTION_SECONDS = 8 * 86400
+
+_last_pruned_bucket = None
+
+def _bucket(created_at):
+    """Hour bucket (epoch seconds) for a search_history created_at string (UTC)"""
+    timestamp = calendar.timegm(time.strptime(created_at, '%Y-%m-%d %H:%M:%S'))
+    return timestamp - timestamp % BUCKET_SECONDS
+
+def combo_key(practice_area, state, min_experience, max_rate, response_guarantee):
+    """Canonical key for a filter combination"""
+    return json.dumps([practice_area, state, min_experience, max_rate, bool(response_guarantee)],
+                      separators=(',', ':'))
+
+def record_demand(conn, records):
+    """Update the counters for search_history row tuples; the caller commits.
+
+    records are (user_id, practice_area, state, min_experience, max_rate,
+    response_guarantee, result_count, created_at) as written by write_history.
+    """
+    global _last_pruned_bucket
+    searches = Counter()
+    zero_results = Counter()
+    for _, practice_area, state, min_experience, max_rate, response_guarantee, result_count, created_at in records:
+        bucket = _bucket(created_at)
+        combo = ('combo', bucket, combo_key(practice_area, state, min_experience, max_rate, response_guarantee))
+        searches[combo] += 1
+        if not result_count:
+            zero_results[combo] += 1
+        searches[('state_area', bucket, json.dumps([state, practice_area], separators=(',', ':')))] += 1
+
+    conn.executemany('''
+        INSERT INTO demand_counters (kind, bucket, key, searches, zero_results) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (kind, bucket, key) DO UPDATE SET
+            searches = searches + excluded.searches,
+            zero_results = zero_results + excluded.zero_results
+    ''', [(*key, count, zero_results[key]) for key, count in searches.items()])
+
+    current = int(time.time()) // BUCKET_SECONDS
+    if _last_pruned_bucket != current:
+        conn.execute('DELETE FROM demand_counters WHERE bucket < ?',
+                     (current * BUCKET_SECONDS - RETENTION_SECONDS,))
+        _last_pruned_bucket = current
+
+def _filters(key):
+    practice_area, state, min_experience, max_rate, response_guarantee = json.loads(key)
+    return {'practiceArea': practice_area, 'state': state, 'minExperience': min_experience,
+            'maxRate': max_rate, 'responseGuarantee': response_guarantee}
+
+def demand_report(conn, window='day', limit=20, now=None):
+    """Top combinations, zero-result combinations and the state heatmap for a window.
+
+    Windows have hourly resolution: they start at the beginning of the hour
+    the window length ago, so 'hour' covers between one and two hours.
+    """
+    now = time.time() if now is None else now
+    since = int(now - WINDOWS[window])
+    since -= since % BUCKET_SECONDS
+
+    combos = conn.execute('''
+        SELECT key, SUM(searches) AS searches, SUM(zero_results) AS zero_results
+        FROM demand_counters WHERE kind = 'combo' AND bucket >= ?
+        GROUP BY key
+    ''', (since,)).fetchall()
+    heatmap = conn.execute('''
+        SELECT key, SUM(searches) AS searches
+        FROM demand_counters WHERE kind = 'state_area' AND bucket >= ?
+        GROUP BY key ORDER BY searches DESC
+    ''', (since,)).fetchall()
+
+    def combo_entry(row):
+        return {'filters': _filters(row['key']), 'searches': row['searches'],
+                'zeroResults': row['zero_results']}
+
+    top = sorted(combos, key=lambda row: (-row['searches'], row['key']))[:limit]
+    zero = sorted((row for row in combos if row['zero_results']),
+                  key=lambda row: (-row['zero_results'], row['key']))[:limit]
+
+    states = Counter()
+    cells = []
+    for row in heatmap:
+        state, practice_area = json.loads(row['key'])
+        states[state] += row['searches']
+        cells.append({'state': state, 'practiceArea': practice_area, 'searches': row['searches']})
+
+    return {
+        'window': window,
+        'since': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(since)),
+        'totals': {'searches': sum(row['searches'] for row in combos),
+                   'zeroResults': sum(row['zero_results'] for row in combos)},
+        'topCombinations': [combo_entry(row) for row in top],
+        'zeroResultCombinations': [combo_entry(row) for row in zero],
+        'states': [{'state': state, 'searches': count}
+                   for state, count in sorted(states.items(), key=lambda item: (-item[1], str(item[0])))],
+        'heatmap': cells
+    }
@@ -0,0 +1,151 @@
+"""Faceted counts for the lawyer directory.
+
+Each facet is counted with every listing filter applied except its own, so the
+UI can show how many results picking another option would give. With the
+catalog enabled this is one pass over its bitsets; otherwise it is a single
+GROUP BY scan of the lawyers table whose groups are folded together in Python.
+Results are cached per 'lawyers' change counter, so any write invalidates them.
+"""
+import threading
+from collections import OrderedDict
+from database.catalog import CATEGORICAL_FIELDS, FLAG_FIELDS, FACET_FILTERS
+
+# (label, low, high) with low inclusive and high exclusive
+EXPERIENCE_BUCKETS = (('0-5', 0, 5), ('5-10', 5, 10), ('10-15', 10, 15),
+                      ('15-20', 15, 20), ('20+', 20, None))
+RATE_BUCKETS = (('0-200', 0, 200), ('200-300', 200, 300), ('300-400', 300, 400),
+                ('400-500', 400, 500), ('500+', 500, None))
+
+BUCKETS = {'experience_years': EXPERIENCE_BUCKETS, 'hourly_rate_min': RATE_BUCKETS}
+
+# SQL equivalents of LawyerCatalog.match() filters
+FILTER_PREDICATES = {
+    'practice_area': 'practice_area = ?',
+    'state': 'location_state = ?',
+    'min_experience': 'experience_years >= ?',
+    'max_rate': 'hourly_rate_min <= ?',
+    'response_guarantee': 'response_guarantee = 1'
+}
+
+MAX_CACHED_FACETS = 256
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _bounds(buckets):
+    return tuple((low, high) for _, low, high in buckets)
+
+def _bucket_case(column, buckets, params):
+    """CASE expression giving the bucket index of a column, NULL outside all buckets"""
+    clauses = []
+    for index, (_, low, high) in enumerate(buckets):
+        tests = []
+        if low is not None:
+            tests.append(f'{column} >= ?')
+            params.append(low)
+        if high is not None:
+            tests.append(f'{column} < ?')
+            params.append(high)
+        clauses.append(f"WHEN {' AND '.join(tests)} THEN {index}")
+    return f"CASE {' '.join(clauses)} END"
+
+def sql_facets(conn, filters):
+    """Facet counts from one scan of the lawyers table, in LawyerCatalog.facets() form"""
+    active = [(key, value) for key, value in filters.items() if value]
+    params = []
+    columns = list(CATEGORICAL_FIELDS)
+    expressions = list(CATEGORICAL_FIELDS)
+    for field, buckets in BUCKETS.items():
+        columns.append(field)
+        expressions.append(_bucket_case(field, buckets, params))
+    for key, value in active:
+        expressions.append(f'({FILTER_PREDICATES[key]})')
+        if key != 'response_guarantee':
+            params.append(value)
+
+    group_by = ', '.join(str(position) for position in range(1, len(expressions) + 1))
+    rows = conn.execute(
+        f"SELECT {', '.join(expressions)}, COUNT(*) FROM lawyers GROUP BY {group_by}", params
+    ).fetchall()
+
+    result = {'total': 0}
+    for field in CATEGORICAL_FIELDS:
+        result[field] = 0 if field in FLAG_FIELDS else {}
+    for field, buckets in BUCKETS.items():
+        result[field] = [0] * len(buckets)
+
+    for row in rows:
+        values = dict(zip(columns, row))
+        passed = {key: bool(row[len(columns) + index]) for index, (key, _) in enumerate(active)}
+        count = row[-1]
+        failed = [key for key, ok in passed.items() if not ok]
+        if not failed:
+            result['total'] += count
+        for field in columns:
+            value = values[field]
+            if value is None:
+                continue
+            # Every value in the directory is listed, even when filtered to zero
+            if field not in BUCKETS and field not in FLAG_FIELDS:
+                result[field].setdefault(value, 0)
+            # Count the group unless a filter other than the facet's own rejects it
+            if any(key != FACET_FILTERS.get(field) for key in failed):
+                continue
+            if field in BUCKETS:
+                result[field][value] += count
+            elif field in FLAG_FIELDS:
+                if value == 1:
+                    result[field] += count
+            else:
+                result[field][value] += count
+    return result
+
+def _value_counts(counts):
+    return [{'value': value, 'count': count}
+            for value, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))]
+
+def _bucket_counts(buckets, counts):
+    return [{'key': label, 'min': low, 'max': high, 'count': count}
+            for (label, low, high), count in zip(buckets, counts)]
+
+def format_facets(raw):
+    """API shape for raw facet counts"""
+    return {
+        'total': raw['total'],
+        'facets': {
+            'practiceArea': _value_counts(raw['practice_area']),
+            'locationState': _value_counts(raw['location_state']),
+            'tier': _value_counts(raw['tier']),
+            'experience': _bucket_counts(EXPERIENCE_BUCKETS, raw['experience_years']),
+            'rate': _bucket_counts(RATE_BUCKETS, raw['hourly_rate_min']),
+            'flags': {
+                'verified': raw['verified'],
+                'mediationCertified': raw['mediation_certified'],
+                'responseGuarantee': raw['response_guarantee']
+            }
+        }
+    }
+
+def lawyer_facets(conn, catalog, filters, version):
+    """Formatted facet counts for a filter set, cached until the 'lawyers' counter changes"""
+    key = (version, tuple(sorted(filters.items())))
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+
+    if catalog is not None:
+        raw = catalog.facets(filters, {field: _bounds(buckets) for field, buckets in BUCKETS.items()})
+    else:
+        raw = sql_facets(conn, filters)
+    result = format_facets(raw)
+
+    with _cache_lock:
+        # Entries for older versions can never be hit again
+        for stale in [k for k in _cache if k[0] != version]:
+            del _cache[stale]
+        _cache[key] = result
+        while len(_cache) > MAX_CACHED_FACETS:
+            _cache.popitem(last=False)
+    return result
@@ -0,0 +1,57 @@
+"""Nearest-lawyer and viewport queries over the lawyers_geo R*Tree.
+
+The R*Tree narrows candidates to a bounding box; exact great-circle distances
+are then computed only for those candidates. Nearest-k searches start with a
+small box and widen it until k lawyers lie inside the searched circle, so a
+dense city centre never drags in the whole metro area.
+"""
+import heapq
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def bounding_box(lat, lng, radius_km):
+    """(south, north, west, east) enclosing a circle of radius_km"""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(lat)), 0.01)
+    dlng = min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180.0)
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+def lawyers_in_box(conn, south, north, west, east, conditions='', params=(), limit=None):
+    """Lawyers rows whose coordinates fall inside a box, with extra ' AND ...' filters on l"""
+    query = f'''
+        SELECT l.* FROM lawyers_geo g
+        INNER JOIN lawyers l ON l.id = g.id
+        WHERE g.max_lat >= ? AND g.min_lat <= ? AND g.max_lng >= ? AND g.min_lng <= ?{conditions}
+    '''
+    args = [south, north, west, east, *params]
+    if limit is not None:
+        query += ' LIMIT ?'
+        args.append(limit)
+    return conn.execute(query, args).fetchall()
+
+def nearest_lawyers(conn, lat, lng, radius_km, limit, conditions='', params=()):
+    """Return up to limit (distance_km, row) pairs within radius_km, nearest first"""
+    search_km = min(radius_km, 2.0)
+    while True:
+        south, north, west, east = bounding_box(lat, lng, search_km)
+        candidates = []
+        for row in lawyers_in_box(conn, south, north, west, east, conditions, params):
+            distance = haversine_km(lat, lng, row['lat'], row['lng'])
+            if distance <= search_km:
+                candidates.append((distance, row['id'], row))
+        # Everything within search_km has been seen, so once it holds limit
+        # matches (or covers the full radius) those are the true nearest
+        if len(candidates) >= limit or search_km >= radius_km:
+            nearest = heapq.nsmallest(limit, candidates, key=lambda item: (item[0], item[1]))
+            return [(distance, row) for distance, _, row in nearest]
+        search_km = min(radius_km, search_km * 4)
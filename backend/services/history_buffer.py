@@ -0,0 +1,293 @@
+"""Write-behind buffer for search_history inserts.
+
+POST /api/history only appends the record to a bounded in-memory queue; a
+background thread writes queued records in multi-row transactions once
+``batch_size`` records are waiting or ``flush_interval`` seconds have passed,
+and drains the queue at interpreter shutdown. When the queue is full new
+records are dropped and counted rather than blocking the request. A batch
+that fails is retried one record at a time: records the database rejects are
+dropped and counted, so one bad record cannot hold up everyone else's, while
+a busy or locked database puts the rest back for the next flush.
+
+A user's records count as pending until they are committed, so GET
+/api/history can ``settle`` that user (write their queued records, wait for
+the ones in flight) and read its own writes.
+
+Set HISTORY_WRITE_BEHIND=false to write synchronously (useful for tests).
+"""
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from database.db import connection
+from middleware.etags import bump_version
+from services.analytics import record_demand
+
+logger = logging.getLogger(__name__)
+
+HISTORY_COLUMNS = ('user_id', 'practice_area', 'state', 'min_experience', 'max_rate',
+                   'response_guarantee', 'result_count', 'created_at')
+
+MAX_TEXT_LENGTH = 100
+
+# Longest a history read waits for the user's in-flight records to commit
+SETTLE_TIMEOUT = 5.0
+
+def _text(data, key):
+    value = data.get(key)
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str) or len(value) > MAX_TEXT_LENGTH:
+        raise ValueError(f'{key} must be a string of at most {MAX_TEXT_LENGTH} characters')
+    return value
+
+def _number(data, key, kind, default=None):
+    value = data.get(key)
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        raise ValueError(f'{key} must be a non-negative number')
+    try:
+        number = kind(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f'{key} must be a non-negative number')
+    if number != number or not 0 <= number < 2 ** 53:
+        raise ValueError(f'{key} must be a non-negative number')
+    return number
+
+def history_record(user_id, data):
+    """Build a search_history row tuple from a POST body, stamped with the current time.
+
+    Raises ValueError for a body that is not an object or a field of the wrong type.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Body must be a JSON object')
+    return (
+        user_id,
+        _text(data, 'practiceArea'),
+        _text(data, 'state'),
+        _number(data, 'minExperience', int),
+        _number(data, 'maxRate', float),
+        1 if data.get('responseGuarantee') else 0,
+        _number(data, 'resultCount', int, 0),
+        # Same format as CURRENT_TIMESTAMP, so buffered rows sort with older ones
+        datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    )
+
+def write_history(conn, records):
+    """Insert history records, update demand counters and bump each user's counter; the caller commits"""
+    conn.executemany(f'''
+        INSERT INTO search_history ({', '.join(HISTORY_COLUMNS)})
+        VALUES ({', '.join('?' for _ in HISTORY_COLUMNS)})
+    ''', records)
+    record_demand(conn, records)
+    for user_id in sorted({record[0] for record in records}):
+        bump_version(conn, f'history:{user_id}')
+
+class HistoryBuffer:
+    """Bounded queue of history records flushed by a background thread"""
+
+    def __init__(self, max_size=10000, batch_size=500, flush_interval=1.0):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = deque()
+        self._pending = Counter()  # user_id -> records queued or being written
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._settled = threading.Condition(self._lock)  # notified as pending records finish
+        self._flush_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.errors = 0
+        self.rejected = 0
+        self.last_flush_seconds = None
+
+    def start(self):
+        """Start the flusher thread and register the shutdown flush"""
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self._run, name='history-flusher', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def submit(self, record):
+        """Queue one record; returns False (and counts a drop) when the queue is full"""
+        with self._lock:
+            if len(self._queue) >= self.max_size:
+                self.dropped += 1
+                return False
+            self._queue.append(record)
+            self._pending[record[0]] += 1
+            self.enqueued += 1
+            if len(self._queue) >= self.batch_size:
+                self._wakeup.notify()
+            return True
+
+    def has_pending(self, user_id):
+        """Whether records for this user are queued or being written and not yet committed"""
+        with self._lock:
+            return self._pending[user_id] > 0
+
+    def _take(self):
+        with self._lock:
+            count = min(len(self._queue), self.batch_size)
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _finish(self, records, outcome):
+        """Stop counting records as pending once written, rejected or dropped"""
+        with self._lock:
+            if outcome == 'written':
+                self.written += len(records)
+            elif outcome == 'rejected':
+                self.rejected += len(records)
+            else:
+                self.dropped += len(records)
+            for record in records:
+                self._pending[record[0]] -= 1
+                if not self._pending[record[0]]:
+                    del self._pending[record[0]]
+            self._settled.notify_all()
+
+    def _requeue(self, batch):
+        with self._lock:
+            room = self.max_size - len(self._queue)
+            kept = batch[:max(room, 0)]
+            for record in reversed(kept):
+                self._queue.appendleft(record)
+        if len(kept) < len(batch):
+            self._finish(batch[len(kept):], 'dropped')
+
+    def _write(self, batch):
+        with connection() as conn:
+            write_history(conn, batch)
+            conn.commit()
+
+    def _write_each(self, batch):
+        """Write a failed batch record by record; returns False if the database was busy"""
+        for index, record in enumerate(batch):
+            try:
+                self._write([record])
+            except sqlite3.OperationalError:
+                # Locked or busy: not the record's fault, keep it and the rest for later
+                self._requeue(batch[index:])
+                return False
+            except Exception:
+                logger.exception('Dropped history record for user %s', record[0])
+                self._finish([record], 'rejected')
+            else:
+                self._finish([record], 'written')
+        return True
+
+    def _write_batch(self, batch):
+        """Write taken records in one transaction, falling back to one by one;
+        returns False if the database was busy"""
+        started = time.perf_counter()
+        try:
+            self._write(batch)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            logger.exception('History flush of %d records failed, retrying one by one', len(batch))
+            if not self._write_each(batch):
+                return False
+        else:
+            self._finish(batch, 'written')
+        with self._lock:
+            self.flushes += 1
+            self.last_flush_seconds = time.perf_counter() - started
+        return True
+
+    def flush(self):
+        """Write everything queued so far; returns False if the database was busy"""
+        with self._flush_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    return True
+                if not self._write_batch(batch):
+                    return False
+
+    def settle(self, user_id, timeout=SETTLE_TIMEOUT):
+        """Commit this user's records before reading them back.
+
+        The user's queued records are written now, by the caller, and records
+        the flusher already took are waited for; everyone else's backlog is
+        left to the flusher. Returns False if some were still uncommitted
+        after timeout seconds.
+        """
+        with self._lock:
+            if not self._pending[user_id]:
+                return True
+            own = [record for record in self._queue if record[0] == user_id]
+            if own:
+                self._queue = deque(record for record in self._queue if record[0] != user_id)
+        if own:
+            self._write_batch(own)
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._pending[user_id]:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._settled.wait(remaining)
+        return True
+
+    def _run(self):
+        while not self._stopping.is_set():
+            with self._lock:
+                if len(self._queue) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+            if not self.flush():
+                # Back off so a locked database is not retried in a tight loop
+                self._stopping.wait(self.flush_interval)
+
+    def stop(self):
+        """Stop the flusher thread and write whatever is still queued"""
+        self._stopping.set()
+        with self._lock:
+            self._wakeup.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=max(self.flush_interval * 2, 5))
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {'depth': len(self._queue), 'maxSize': self.max_size,
+                    'batchSize': self.batch_size, 'flushInterval': self.flush_interval,
+                    'enqueued': self.enqueued, 'written': self.written,
+                    'dropped': self.dropped, 'rejected': self.rejected, 'flushes': self.flushes,
+                    'errors': self.errors, 'lastFlushSeconds': self.last_flush_seconds,
+                    'running': self._thread is not None and self._thread.is_alive()}
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+def get_history_buffer(config):
+    """Process-wide buffer, started on first use; None when write-behind is disabled"""
+    global _buffer
+    if not config.get('HISTORY_WRITE_BEHIND', True):
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = HistoryBuffer(
+                    max_size=config.get('HISTORY_BUFFER_SIZE', 10000),
+                    batch_size=config.get('HISTORY_BATCH_SIZE', 500),
+                    flush_interval=config.get('HISTORY_FLUSH_INTERVAL', 1.0)
+                ).start()
+    return _buffer
+
+def history_buffer_stats():
+    """Buffer statistics, or None if it has not been started"""
+    return None if _buffer is None else _buffer.stats()
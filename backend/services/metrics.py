@@ -0,0 +1,166 @@
+"""Lightweight in-process metrics with Prometheus text exposition.
+
+``registry`` holds labelled counter and histogram families plus collectors,
+which are called at scrape time to export existing ``stats()`` dicts as
+gauges. ``registry.render()`` produces the text served at /api/metrics.
+"""
+import re
+import threading
+from bisect import bisect_left
+
+# Upper bounds in seconds, spanning cache hits to slow bcrypt/SQLite work
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus style)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        """{'count', 'sum', 'buckets': [(upper_bound, cumulative_count), ...]} with '+Inf' last"""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self.sum, self.count
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+            running += bucket_count
+            cumulative.append((bound, running))
+        return {'count': count, 'sum': total, 'buckets': cumulative}
+
+    def quantile(self, q):
+        """Approximate quantile: the upper bound of the bucket holding it"""
+        snapshot = self.snapshot()
+        if not snapshot['count']:
+            return None
+        target = q * snapshot['count']
+        for bound, cumulative in snapshot['buckets']:
+            if cumulative >= target:
+                return bound
+        return '+Inf'
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+class MetricFamily:
+    """One metric name with a child Counter/Histogram per label value tuple"""
+
+    def __init__(self, name, help_text, kind, labelnames, factory):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def children(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value):
+    if value == '+Inf':
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+def _histogram_lines(name, labelnames, values, snapshot):
+    lines = [f'{name}_bucket{_labels(labelnames, values, [("le", _number(bound))])} {count}'
+             for bound, count in snapshot['buckets']]
+    lines.append(f'{name}_sum{_labels(labelnames, values)} {_number(snapshot["sum"])}')
+    lines.append(f'{name}_count{_labels(labelnames, values)} {snapshot["count"]}')
+    return lines
+
+def metric_name(*parts):
+    """Join name parts into a valid metric name, snake_casing camelCase keys"""
+    name = '_'.join(re.sub(r'(?<=[a-z0-9])([A-Z])', r'_\1', part).lower() for part in parts)
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+def stats_collector(prefix, stats, help_text):
+    """Collector exporting a stats() dict: numbers as gauges, snapshots as histograms"""
+    def collect():
+        for key, value in stats().items():
+            name = metric_name(prefix, key)
+            if isinstance(value, dict) and 'buckets' in value:
+                yield name, help_text, 'histogram', _histogram_lines(name, (), (), value)
+            elif isinstance(value, (int, float)):
+                yield name, help_text, 'gauge', [f'{name} {_number(value)}']
+    return collect
+
+class Registry:
+    """Metric families and scrape-time collectors"""
+
+    def __init__(self):
+        self._families = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _family(self, name, help_text, kind, labelnames, factory):
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = MetricFamily(name, help_text, kind, labelnames, factory)
+            return family
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._family(name, help_text, 'counter', labelnames, Counter)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._family(name, help_text, 'histogram', labelnames, lambda: Histogram(buckets))
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            families = sorted(self._families.values(), key=lambda family: family.name)
+            collectors = list(self._collectors)
+        out = []
+        for family in families:
+            out += [f'# HELP {family.name} {family.help}', f'# TYPE {family.name} {family.kind}']
+            for values, child in family.children():
+                if family.kind == 'counter':
+                    out.append(f'{family.name}{_labels(family.labelnames, values)} {_number(child.value)}')
+                else:
+                    out += _histogram_lines(family.name, family.labelnames, values, child.snapshot())
+        for collector in collectors:
+            for name, help_text, kind, lines in collector():
+                out += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', *lines]
+        return '\n'.join(out) + '\n'
+
+registry = Registry()
@@ -0,0 +1,115 @@
+"""bcrypt hashing on a bounded worker pool with admission control.
+
+bcrypt releases the GIL while it works, so a small thread pool keeps a login
+spike from occupying every request thread while directory reads continue.
+At most ``workers + max_queue`` operations may be in flight; beyond that
+callers get PasswordHasherBusy immediately and the route answers 503 with a
+Retry-After estimate instead of queueing without bound.
+"""
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from services.metrics import Histogram
+from middleware.instrumentation import timed
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+    def __init__(self, retry_after):
+        super().__init__('Password hashing queue is full')
+        self.retry_after = retry_after
+
+class PasswordHasher:
+    """Bounded pool for bcrypt hashpw/checkpw with queue and run-time histograms"""
+
+    def __init__(self, workers=2, max_queue=32, rounds=12):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+        self.wait_seconds = Histogram()
+        self.run_seconds = Histogram()
+
+    def _admit(self):
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordHasherBusy(self._retry_after())
+            self._in_flight += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='bcrypt')
+            return self._executor
+
+    def _retry_after(self):
+        """Seconds until the current backlog should have drained"""
+        run = self.run_seconds.snapshot()
+        average = run['sum'] / run['count'] if run['count'] else 0.25
+        return max(1, math.ceil(self._in_flight * average / self.workers))
+
+    def _run(self, function, *args):
+        with timed('auth'):
+            return self._wait(function, *args)
+
+    def _wait(self, function, *args):
+        executor = self._admit()
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            self.wait_seconds.observe(started - submitted)
+            try:
+                return function(*args)
+            finally:
+                self.run_seconds.observe(time.perf_counter() - started)
+                with self._lock:
+                    self._in_flight -= 1
+
+        try:
+            future = executor.submit(task)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        return future.result()
+
+    def hash(self, password):
+        """bcrypt hash of a password at the configured work factor"""
+        return self._run(lambda: bcrypt.hashpw(password.encode('utf-8'),
+                                               bcrypt.gensalt(self.rounds)).decode('utf-8'))
+
+    def check(self, password, hashed):
+        """Whether a password matches a stored bcrypt hash"""
+        return self._run(lambda: bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8')))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            in_flight = self._in_flight
+        return {'workers': self.workers, 'maxQueue': self.max_queue, 'rounds': self.rounds,
+                'inFlight': in_flight, 'queued': max(0, in_flight - self.workers),
+                'rejected': self.rejected,
+                'waitSeconds': self.wait_seconds.snapshot(),
+                'runSeconds': self.run_seconds.snapshot()}
+
+password_hasher = PasswordHasher()
+
+def configure_password_hasher(workers=None, max_queue=None, rounds=None):
+    """Apply pool settings; a running pool is replaced on its next use"""
+    password_hasher.shutdown()
+    if workers is not None:
+        password_hasher.workers = workers
+    if max_queue is not None:
+        password_hasher.max_queue = max_queue
+    if rounds is not None:
+        password_hasher.rounds = rounds
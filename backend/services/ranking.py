@@ -0,0 +1,342 @@
+"""Weighted "best match" ranking over the lawyer directory.
+
+Each candidate gets component scores in [0, 1]:
+
+* ``experience``: years of experience, saturating at EXPERIENCE_CAP_YEARS
+* ``success_rate``: success rate / 100
+* ``case_count``: log-scaled case count, saturating at CASE_COUNT_CAP
+* ``rate_fit``: 1 when the minimum hourly rate is within budget, falling
+  linearly to 0 at twice the budget (only when a budget is given)
+* ``verified`` and ``response_guarantee``: 0 or 1
+* ``distance``: 1 / (1 + km / DISTANCE_SCALE_KM) from the searcher's location
+  (only when one is given)
+
+The score is the weighted mean of the active components. Static components
+are precomputed per slot of the in-memory catalog (patched for the slots a
+write touched, rebuilt after a reload), so a request only combines columns
+and selects its top k with a partial selection: ``numpy.argpartition`` when
+numpy is installed, otherwise ``heapq.nlargest`` over the candidate slots.
+Without the catalog the same columns are read from SQLite for the filtered
+candidates. Ties are broken by the higher id, as in the listing.
+"""
+import heapq
+import json
+import math
+import threading
+from database.catalog import iter_slots, number_or_none
+from services.geo import EARTH_RADIUS_KM, haversine_km
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+DEFAULT_WEIGHTS = {
+    'experience': 3.0,
+    'success_rate': 3.0,
+    'case_count': 1.0,
+    'rate_fit': 2.0,
+    'verified': 1.0,
+    'response_guarantee': 1.0,
+    'distance': 2.0,
+}
+MAX_WEIGHT = 100.0
+
+EXPERIENCE_CAP_YEARS = 30
+CASE_COUNT_CAP = 2000
+DISTANCE_SCALE_KM = 25.0
+
+# Components that do not depend on the request, precomputed per slot
+STATIC_COMPONENTS = ('experience', 'success_rate', 'case_count', 'verified', 'response_guarantee')
+
+# Distinct static weightings whose combined scores are kept per catalog version
+MAX_CACHED_WEIGHTINGS = 16
+
+RANK_COLUMNS = ('id', 'experience_years', 'success_rate', 'case_count', 'hourly_rate_min',
+                'verified', 'response_guarantee', 'lat', 'lng')
+
+def parse_weights(text):
+    """Parse 'name:weight,...' overrides onto DEFAULT_WEIGHTS, or raise ValueError"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in (text or '').split(','):
+        if not part.strip():
+            continue
+        name, _, value = part.partition(':')
+        name = name.strip()
+        if name not in DEFAULT_WEIGHTS:
+            raise ValueError(f'Unknown weight {name!r}; use one of {", ".join(DEFAULT_WEIGHTS)}')
+        try:
+            weight = float(value)
+        except ValueError:
+            raise ValueError(f'Weight for {name} must be a number')
+        if not 0 <= weight <= MAX_WEIGHT:
+            raise ValueError(f'Weight for {name} must be between 0 and {MAX_WEIGHT:g}')
+        weights[name] = weight
+    if not any(weights.values()):
+        raise ValueError('At least one weight must be positive')
+    return weights
+
+def _capped(value, cap):
+    return 0.0 if value is None else min(max(value, 0), cap) / cap
+
+def _log_capped(value, cap):
+    return 0.0 if value is None else min(math.log1p(max(value, 0)) / math.log1p(cap), 1.0)
+
+def rate_fit(rate, budget):
+    if rate is None:
+        return 0.0
+    if rate <= budget:
+        return 1.0
+    return max(0.0, 1.0 - (rate - budget) / budget)
+
+def distance_score(distance_km):
+    return 1.0 / (1.0 + distance_km / DISTANCE_SCALE_KM)
+
+# Static component -> (catalog column, score for a column value)
+STATIC_SOURCES = {
+    'experience': ('experience_years', lambda value: _capped(value, EXPERIENCE_CAP_YEARS)),
+    'success_rate': ('success_rate', lambda value: _capped(value, 100)),
+    'case_count': ('case_count', lambda value: _log_capped(value, CASE_COUNT_CAP)),
+    'verified': ('verified', lambda value: 1.0 if value else 0.0),
+    'response_guarantee': ('response_guarantee', lambda value: 1.0 if value else 0.0),
+}
+
+def _float_or_nan(value):
+    return math.nan if value is None else value
+
+class ScoreColumns:
+    """Per-slot ranking inputs: static component scores, rates and coordinates"""
+
+    def __init__(self, columns):
+        self.ids = columns['id']
+        self.size = len(self.ids)
+        self.static = {name: [score(value) for value in columns[source]]
+                       for name, (source, score) in STATIC_SOURCES.items()}
+        self.rates = columns['hourly_rate_min']
+        self.lats = columns['lat']
+        self.lngs = columns['lng']
+        self.arrays = None
+        if np is not None:
+            # None (NULLs and free catalog slots) becomes NaN
+            self.arrays = {name: np.array(values, dtype=np.float64) for name, values in self.static.items()}
+            self.arrays['rate'] = np.array(self.rates, dtype=np.float64)
+            self.arrays['lat'] = np.array(self.lats, dtype=np.float64)
+            self.arrays['lng'] = np.array(self.lngs, dtype=np.float64)
+            self.arrays['id'] = np.array([-1 if value is None else value for value in self.ids],
+                                         dtype=np.int64)
+        self._combined = {}
+        self._combined_lock = threading.Lock()
+
+    def patched(self, changes):
+        """Copy with the changed slots replaced; changes is {column: {slot: value}}.
+
+        Only the changed slots are recomputed (the catalog may also have grown),
+        and the cached static weightings carry over. self is left untouched, so
+        requests still ranking with it are unaffected.
+        """
+        slots = sorted(changes['id'])
+        size = max([self.size] + [slot + 1 for slot in slots])
+        grow = size - self.size
+        copy = ScoreColumns.__new__(ScoreColumns)
+        copy.size = size
+        copy.ids = self.ids + [None] * grow
+        copy.rates = self.rates + [None] * grow
+        copy.lats = self.lats + [None] * grow
+        copy.lngs = self.lngs + [None] * grow
+        copy.static = {name: values + [0.0] * grow for name, values in self.static.items()}
+        for slot in slots:
+            copy.ids[slot] = changes['id'][slot]
+            copy.rates[slot] = changes['hourly_rate_min'][slot]
+            copy.lats[slot] = changes['lat'][slot]
+            copy.lngs[slot] = changes['lng'][slot]
+            for name, (source, score) in STATIC_SOURCES.items():
+                copy.static[name][slot] = score(changes[source][slot])
+
+        copy.arrays = None
+        if self.arrays is not None:
+            index = np.array(slots, dtype=np.int64)
+            sources = dict(copy.static, rate=copy.rates, lat=copy.lats, lng=copy.lngs)
+            copy.arrays = {}
+            for name, array in self.arrays.items():
+                if name == 'id':
+                    array = np.concatenate([array, np.full(grow, -1, dtype=np.int64)])
+                    array[index] = [-1 if copy.ids[slot] is None else copy.ids[slot] for slot in slots]
+                else:
+                    array = np.concatenate([array, np.full(grow, math.nan)])
+                    array[index] = [_float_or_nan(sources[name][slot]) for slot in slots]
+                copy.arrays[name] = array
+
+        copy._combined = {}
+        copy._combined_lock = threading.Lock()
+        with self._combined_lock:
+            combined = dict(self._combined)
+        for key, scores in combined.items():
+            parts = [(weight, copy.static[name]) for name, weight in zip(STATIC_COMPONENTS, key) if weight]
+            if copy.arrays is not None:
+                scores = np.concatenate([scores, np.zeros(grow)])
+            else:
+                scores = scores + [0.0] * grow
+            for slot in slots:
+                # Same operation order as static_scores(), so results are identical
+                total = 0.0
+                for weight, values in parts:
+                    total += weight * values[slot]
+                scores[slot] = total
+            copy._combined[key] = scores
+        return copy
+
+    def static_scores(self, active):
+        """Weighted sum of the static components per slot (a numpy array when available)"""
+        key = tuple(active.get(name, 0) for name in STATIC_COMPONENTS)
+        combined = self._combined.get(key)
+        if combined is None:
+            if self.arrays is not None:
+                combined = np.zeros(self.size)
+                for name, weight in zip(STATIC_COMPONENTS, key):
+                    if weight:
+                        combined += weight * self.arrays[name]
+            else:
+                parts = [(weight, self.static[name]) for name, weight in zip(STATIC_COMPONENTS, key) if weight]
+                combined = [sum(weight * values[slot] for weight, values in parts) for slot in range(self.size)]
+            with self._combined_lock:
+                if len(self._combined) >= MAX_CACHED_WEIGHTINGS:
+                    self._combined.clear()
+                self._combined[key] = combined
+        return combined
+
+    def components(self, slot, weights, budget, origin):
+        """{component: score} of the active components for one slot"""
+        result = {name: self.static[name][slot] for name in STATIC_COMPONENTS if weights[name]}
+        if budget and weights['rate_fit']:
+            result['rate_fit'] = rate_fit(self.rates[slot], budget)
+        if origin and weights['distance']:
+            lat, lng = self.lats[slot], self.lngs[slot]
+            result['distance'] = 0.0 if lat is None or lng is None else distance_score(
+                haversine_km(origin[0], origin[1], lat, lng))
+        return result
+
+def active_weights(weights, budget, origin):
+    """Weights of the components that apply to this request"""
+    return {name: weight for name, weight in weights.items()
+            if weight and (name != 'rate_fit' or budget) and (name != 'distance' or origin)}
+
+def _top_python(columns, slots, weights, budget, origin, limit):
+    """heapq.nlargest over candidate slots; returns [(score, slot)]"""
+    active = active_weights(weights, budget, origin)
+    total = sum(active.values())
+    static = columns.static_scores(active)
+    rates, lats, lngs, ids = columns.rates, columns.lats, columns.lngs, columns.ids
+    rate_weight = active.get('rate_fit')
+    distance_weight = active.get('distance')
+
+    if not rate_weight and not distance_weight:
+        return [(score / total, slot) for score, _, slot in
+                heapq.nlargest(limit, ((static[slot], ids[slot], slot) for slot in slots))]
+
+    def scored():
+        for slot in slots:
+            score = static[slot]
+            if rate_weight:
+                score += rate_weight * rate_fit(rates[slot], budget)
+            if distance_weight and lats[slot] is not None and lngs[slot] is not None:
+                score += distance_weight * distance_score(
+                    haversine_km(origin[0], origin[1], lats[slot], lngs[slot]))
+            yield score / total, ids[slot], slot
+
+    return [(score, slot) for score, _, slot in heapq.nlargest(limit, scored())]
+
+def _top_numpy(columns, candidates, weights, budget, origin, limit):
+    """argpartition over a candidate slot array; returns [(score, slot)]"""
+    if not len(candidates) or limit <= 0:
+        return []
+    active = active_weights(weights, budget, origin)
+    arrays = columns.arrays
+    score = columns.static_scores(active)[candidates]
+    if 'rate_fit' in active:
+        rate = arrays['rate'][candidates]
+        fit = np.clip(1.0 - (rate - budget) / budget, 0.0, 1.0)  # 1 for rate <= budget
+        score += active['rate_fit'] * np.nan_to_num(fit)
+    if 'distance' in active:
+        lat1, lng1 = math.radians(origin[0]), math.radians(origin[1])
+        lat2 = np.radians(arrays['lat'][candidates])
+        dlng = np.radians(arrays['lng'][candidates]) - lng1
+        a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+        distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        score += active['distance'] * np.nan_to_num(1.0 / (1.0 + distance / DISTANCE_SCALE_KM))
+    score /= sum(active.values())
+
+    k = min(limit, len(candidates))
+    if k < len(candidates):
+        # Keep everything tied with the k-th best so the id tie-break is exact
+        threshold = score[np.argpartition(score, len(score) - k)[len(score) - k]]
+        pool = np.flatnonzero(score >= threshold)
+    else:
+        pool = np.arange(len(candidates))
+    ids = arrays['id'][candidates[pool]]
+    order = pool[np.lexsort((-ids, -score[pool]))[:k]]
+    return [(float(score[index]), int(candidates[index])) for index in order]
+
+def _mask_slots(mask, size):
+    """Candidate slot array for a catalog bitset"""
+    raw = np.frombuffer(mask.to_bytes((size + 7) // 8, 'little'), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, count=size, bitorder='little'))
+
+_cache_lock = threading.Lock()
+_cached = None  # (catalog, catalog version, ScoreColumns)
+
+def catalog_columns(catalog, filters):
+    """(match bitset, ScoreColumns) for the catalog, patched or rebuilt after writes"""
+    global _cached
+    cached = _cached
+    have = cached[1] if cached is not None and cached[0] is catalog else None
+    version, mask, copies, changed = catalog.snapshot(filters, RANK_COLUMNS, have)
+    if copies is None:
+        return mask, cached[2]
+    with _cache_lock:
+        current = _cached
+        if current is not None and current[0] is catalog and current[1] == version:
+            return mask, current[2]  # built by another request meanwhile
+        if changed is None:
+            columns = ScoreColumns(copies)
+        elif current is cached:
+            columns = cached[2].patched(copies)
+        else:
+            # The delta was taken against columns another request has replaced
+            version, mask, copies, _ = catalog.snapshot(filters, RANK_COLUMNS)
+            columns = ScoreColumns(copies)
+        _cached = (catalog, version, columns)
+    return mask, columns
+
+def sql_columns(conn, conditions, params):
+    """ScoreColumns for the filtered candidates read straight from SQLite"""
+    rows = conn.execute(f'SELECT {", ".join(RANK_COLUMNS)} FROM lawyers WHERE 1=1{conditions}',
+                        params).fetchall()
+    return ScoreColumns({name: [number_or_none(row[index]) for row in rows]
+                         for index, name in enumerate(RANK_COLUMNS)})
+
+def rank_lawyers(conn, catalog, filters, conditions, params, weights, budget=None, origin=None, limit=20):
+    """Best matches as [(score, components, row)], best first.
+
+    filters are the catalog match() keywords and conditions/params the
+    equivalent SQL used when catalog is None. budget is an hourly rate and
+    origin a (lat, lng) pair; their components are skipped when not given.
+    """
+    if catalog is not None:
+        mask, columns = catalog_columns(catalog, filters)
+        if columns.arrays is not None:
+            top = _top_numpy(columns, _mask_slots(mask, columns.size), weights, budget, origin, limit)
+        else:
+            top = _top_python(columns, iter_slots(mask), weights, budget, origin, limit)
+        rows = [catalog.get(columns.ids[slot]) for _, slot in top]
+    else:
+        columns = sql_columns(conn, conditions, params)
+        if columns.arrays is not None:
+            top = _top_numpy(columns, np.arange(columns.size), weights, budget, origin, limit)
+        else:
+            top = _top_python(columns, range(columns.size), weights, budget, origin, limit)
+        ids = [columns.ids[slot] for _, slot in top]
+        found = {row['id']: dict(row) for row in conn.execute(
+            'SELECT * FROM lawyers WHERE id IN (SELECT value FROM json_each(?))', (json.dumps(ids),))}
+        rows = [found.get(lawyer_id) for lawyer_id in ids]
+    return [(score, columns.components(slot, weights, budget, origin), row)
+            for (score, slot), row in zip(top, rows) if row is not None]
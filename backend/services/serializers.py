@@ -0,0 +1,109 @@
+"""Shared lawyer serialization with a per-lawyer JSON fragment cache.
+
+Every read path (listing, detail, shortlist, comparison) formats lawyers the
+same way, so the final JSON bytes for each lawyer are cached keyed by
+``(id, version)``. The ``version`` column is bumped on every write, which means
+a stale fragment can never be served even by another worker process; admin
+writes also invalidate the entry so the memory is reclaimed straight away.
+Responses are assembled by joining cached fragments.
+"""
+import json
+import threading
+from collections import OrderedDict
+from flask import current_app
+from middleware.instrumentation import timed
+
+def format_lawyer(lawyer):
+    """Format a lawyers row for the API (snake_case columns plus camelCase aliases)"""
+    return {
+        **lawyer,
+        'specialties': json.loads(lawyer['specialties']) if lawyer['specialties'] else [],
+        'verified': bool(lawyer['verified']),
+        'mediationCertified': bool(lawyer['mediation_certified']),
+        'responseGuarantee': bool(lawyer['response_guarantee']),
+        'practiceArea': lawyer['practice_area'],
+        'experienceYears': lawyer['experience_years'],
+        'caseCount': lawyer['case_count'],
+        'successRate': lawyer['success_rate'],
+        'hourlyRateMin': lawyer['hourly_rate_min'],
+        'hourlyRateMax': lawyer['hourly_rate_max'],
+        'locationCity': lawyer['location_city'],
+        'locationState': lawyer['location_state'],
+        'maraNumber': lawyer['mara_number'],
+        'avatarColor': lawyer['avatar_color']
+    }
+
+def dumps(value):
+    """Serialize like Flask's jsonify (sorted keys, compact separators)"""
+    return json.dumps(value, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+class FragmentCache:
+    """Bounded LRU of serialized lawyers keyed by id and row version"""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, lawyer):
+        """Return the JSON bytes for a lawyers row, serializing on a miss"""
+        lawyer_id = lawyer['id']
+        version = lawyer.get('version')
+        with self._lock:
+            entry = self._entries.get(lawyer_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(lawyer_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        fragment = dumps(format_lawyer(lawyer))
+        with self._lock:
+            self._entries[lawyer_id] = (version, fragment)
+            self._entries.move_to_end(lawyer_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fragment
+
+    def invalidate(self, lawyer_id):
+        with self._lock:
+            self._entries.pop(lawyer_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'maxEntries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+
+fragment_cache = FragmentCache()
+
+def lawyer_fragment(lawyer):
+    """Serialized JSON for one lawyers row (dict or sqlite3.Row)"""
+    with timed('serialization'):
+        if not isinstance(lawyer, dict):
+            lawyer = dict(lawyer)
+        return fragment_cache.get(lawyer)
+
+def invalidate_lawyer(lawyer_id):
+    """Drop the cached fragment after a lawyer is written"""
+    fragment_cache.invalidate(lawyer_id)
+
+def fragments_response(key, fragments, status=200, **extra):
+    """JSON response {key: [fragments...], **extra} built from serialized fragments"""
+    with timed('serialization'):
+        parts = [b'{', dumps(key), b':[', b','.join(fragments), b']']
+        for name, value in extra.items():
+            parts += [b',', dumps(name), b':', dumps(value)]
+        parts.append(b'}')
+        body = b''.join(parts)
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+def fragment_response(key, fragment, status=200):
+    """JSON response {key: fragment} for a single serialized lawyer"""
+    with timed('serialization'):
+        body = b''.join([b'{', dumps(key), b':', fragment, b'}'])
+    return current_app.response_class(body, status=status, mimetype='application/json')
@@ -0,0 +1,343 @@
+"""Precomputed "similar lawyers" lists.
+
+Each lawyer is reduced to a compact feature vector: the practice area
+(one-hot), the set of specialties from the JSON ``specialties`` column
+(multi-hot), the state (one-hot), and the hourly rate, experience and
+success rate scaled to [0, 1]. Neighbours are drawn from the same practice
+area, and the similarity of two lawyers in it is
+
+    SPECIALTY_WEIGHT * Jaccard(specialties)
+    + STATE_WEIGHT * [same state]
+    + NUMERIC_WEIGHT * (1 - mean absolute difference of the scaled numbers)
+
+The k most similar lawyers (ties to the higher id) are stored in
+lawyer_similar as (lawyer_id, rank, similar_id, score), so
+GET /api/lawyers/<id>/similar is one primary-key range read.
+
+``rebuild_similar`` recomputes every list one practice area at a time, with
+numpy chunks when it is installed. ``refresh_similar`` runs in the
+transaction of a lawyer create/update/delete and touches only the rows that
+can change: the lawyer's own list, the lists that named it (recomputed), and
+the lists in its practice area that it now beats the k-th entry of (merged).
+It never builds lists that are missing or were stored with a different k;
+run a rebuild for those.
+
+Bulk imports rebuild the practice areas they touch. Usage (from the backend
+directory) after changing SIMILAR_NEIGHBORS or upgrading an existing database:
+    python -m services.similarity
+"""
+import argparse
+import functools
+import heapq
+import json
+import os
+import sys
+import time
+from database.catalog import number_or_none
+from database.db import connection, create_schema
+from middleware.etags import bump_version
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+DEFAULT_NEIGHBORS = 10
+MAX_NEIGHBORS = 50
+
+SPECIALTY_WEIGHT = 0.5
+STATE_WEIGHT = 0.2
+NUMERIC_WEIGHT = 0.3
+
+RATE_CAP = 1000.0
+EXPERIENCE_CAP_YEARS = 40
+
+# Similarity cells computed per numpy chunk (rows x block size), small enough
+# for the temporaries to stay in cache
+CHUNK_CELLS = 256 * 1024
+
+FEATURE_COLUMNS = ('id', 'practice_area', 'specialties', 'location_state', 'hourly_rate_min',
+                   'experience_years', 'success_rate')
+
+BLOCK_SQL = f'SELECT {", ".join(FEATURE_COLUMNS)} FROM lawyers WHERE practice_area IS ? ORDER BY id'
+
+STORED_SQL = '''
+    SELECT lawyer_id, score, similar_id FROM lawyer_similar
+    WHERE lawyer_id IN (SELECT value FROM json_each(?))
+    ORDER BY lawyer_id, rank
+'''
+
+CLEAR_AREA_SQL = '''
+    DELETE FROM lawyer_similar
+    WHERE lawyer_id IN (SELECT id FROM lawyers WHERE practice_area IS ?)
+'''
+
+REFERRERS_SQL = 'SELECT lawyer_id FROM lawyer_similar WHERE similar_id = ?'
+
+# The k-th and (k+1)-th entries of the given lists
+KTH_ENTRIES_SQL = '''
+    SELECT lawyer_id, rank, score, similar_id FROM lawyer_similar
+    WHERE lawyer_id IN (SELECT value FROM json_each(?)) AND rank IN (?, ?)
+'''
+
+def _scaled(value, cap):
+    value = number_or_none(value)  # non-numbers stored by hand count as missing
+    return 0.0 if value is None else min(max(float(value), 0.0), cap) / cap
+
+@functools.lru_cache(maxsize=4096)
+def parse_specialties(value):
+    """Specialty set from the JSON column (case-insensitive); empty if unreadable"""
+    try:
+        items = json.loads(value) if value else []
+    except (TypeError, ValueError):
+        return frozenset()
+    if not isinstance(items, list):
+        return frozenset()
+    return frozenset(item.strip().lower() for item in items if isinstance(item, str) and item.strip())
+
+class FeatureBlock:
+    """Feature vectors of every lawyer in one practice area"""
+
+    def __init__(self, rows):
+        self.ids = [row[0] for row in rows]
+        self.id_array = np.array(self.ids, dtype=np.int64) if np is not None else None
+        self.index = {lawyer_id: position for position, lawyer_id in enumerate(self.ids)}
+        self.specialties = [parse_specialties(row[2]) for row in rows]
+        self.states = [row[3] for row in rows]
+        self.numbers = [(_scaled(row[4], RATE_CAP), _scaled(row[5], EXPERIENCE_CAP_YEARS),
+                         _scaled(row[6], 100.0)) for row in rows]
+        self._matrices = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def similarity(self, i, j):
+        a, b = self.specialties[i], self.specialties[j]
+        union = len(a | b)
+        jaccard = len(a & b) / union if union else 0.0
+        same_state = 1.0 if self.states[i] is not None and self.states[i] == self.states[j] else 0.0
+        x, y = self.numbers[i], self.numbers[j]
+        closeness = 1.0 - (abs(x[0] - y[0]) + abs(x[1] - y[1]) + abs(x[2] - y[2])) / 3
+        return SPECIALTY_WEIGHT * jaccard + STATE_WEIGHT * same_state + NUMERIC_WEIGHT * closeness
+
+    def _numpy_matrices(self):
+        if self._matrices is None:
+            # Lawyers sharing specialties and state share the categorical terms
+            groups = {}
+            group_ids = np.array([groups.setdefault(key, len(groups))
+                                  for key in zip(self.specialties, self.states)], dtype=np.intp)
+            vocabulary, states = {}, {}
+            for specialties, _ in groups:
+                for name in specialties:
+                    vocabulary.setdefault(name, len(vocabulary))
+            onehot = np.zeros((len(groups), max(1, len(vocabulary))))
+            for row, (specialties, _) in enumerate(groups):
+                for name in specialties:
+                    onehot[row, vocabulary[name]] = 1.0
+            state_ids = np.array([-1 if state is None else states.setdefault(state, len(states))
+                                  for _, state in groups])
+            columns = np.ascontiguousarray(np.array(self.numbers, dtype=np.float64).reshape(-1, 3).T)
+            self._matrices = (group_ids, onehot, onehot.sum(axis=1), state_ids, columns)
+        return self._matrices
+
+    def similarity_rows(self, start, stop):
+        """numpy (stop - start) x len(self) similarity matrix"""
+        group_ids, onehot, sizes, state_ids, columns = self._numpy_matrices()
+        groups, inverse = np.unique(group_ids[start:stop], return_inverse=True)
+        shared = onehot[groups] @ onehot.T
+        union = sizes[groups, None] + sizes[None, :] - shared
+        jaccard = np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+        same_state = (state_ids[groups, None] == state_ids[None, :]) & (state_ids[None, :] >= 0)
+        categorical = SPECIALTY_WEIGHT * jaccard + STATE_WEIGHT * same_state
+        scores = categorical.take(group_ids, axis=1)[inverse.reshape(-1)]
+
+        # Same operation order as similarity(), in place to spare temporaries
+        distance = np.empty_like(scores)
+        part = np.empty_like(scores)
+        for column, values in enumerate(columns):
+            target = distance if column == 0 else part
+            np.subtract(values[start:stop, None], values[None, :], out=target)
+            np.abs(target, out=target)
+            if column:
+                distance += part
+        distance /= 3
+        np.subtract(1.0, distance, out=distance)
+        distance *= NUMERIC_WEIGHT
+        scores += distance
+        return scores
+
+    def similarities(self, i):
+        """Similarity of lawyer i to every lawyer in the block (a numpy row when available)"""
+        if np is not None:
+            return self.similarity_rows(i, i + 1)[0]
+        return [self.similarity(i, j) for j in range(len(self))]
+
+    def _pick(self, i, scores, kth, top):
+        """Top entries of numpy row i at or above the k-th score, ties to the higher id"""
+        pool = np.flatnonzero(scores >= kth)
+        pool = pool[pool != i]
+        order = pool[np.lexsort((-self.id_array[pool], -scores[pool]))[:top]]
+        return [(float(scores[j]), self.ids[j]) for j in order]
+
+    def neighbors(self, i, scores, k):
+        """Top k (score, id) for lawyer i given its similarity row, best first"""
+        if np is None:
+            ids = self.ids
+            return [(score, ids[j]) for score, _, j in
+                    heapq.nlargest(k, ((scores[j], ids[j], j) for j in range(len(ids)) if j != i))]
+        top = min(k, len(self) - 1)
+        if top <= 0:
+            return []
+        others = scores.copy()
+        others[i] = -np.inf  # never yourself
+        kth = np.partition(others, len(self) - top)[len(self) - top]
+        return self._pick(i, others, kth, top)
+
+    def all_neighbors(self, k):
+        """Yield (lawyer_id, [(score, id), ...]) for every lawyer in the block"""
+        if np is None:
+            for i, lawyer_id in enumerate(self.ids):
+                yield lawyer_id, self.neighbors(i, self.similarities(i), k)
+            return
+        top = min(k, len(self) - 1)
+        if top <= 0:
+            for lawyer_id in self.ids:
+                yield lawyer_id, []
+            return
+        chunk = max(1, CHUNK_CELLS // len(self))
+        for start in range(0, len(self), chunk):
+            stop = min(len(self), start + chunk)
+            scores = self.similarity_rows(start, stop)
+            scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # never yourself
+            # Keep everything tied with the k-th best so the id tie-break is exact
+            kth = np.partition(scores, len(self) - top, axis=1)[:, len(self) - top]
+            for row in range(stop - start):
+                yield self.ids[start + row], self._pick(start + row, scores[row], kth[row], top)
+
+def load_block(conn, practice_area):
+    rows = conn.execute(BLOCK_SQL, (practice_area,)).fetchall()
+    return FeatureBlock([tuple(row) for row in rows])
+
+def write_neighbors(conn, lawyer_id, neighbors):
+    """Replace one lawyer's stored list"""
+    conn.execute('DELETE FROM lawyer_similar WHERE lawyer_id = ?', (lawyer_id,))
+    conn.executemany(
+        'INSERT INTO lawyer_similar (lawyer_id, rank, similar_id, score) VALUES (?, ?, ?, ?)',
+        [(lawyer_id, rank, similar_id, score) for rank, (score, similar_id) in enumerate(neighbors, 1)]
+    )
+
+def stored_neighbors(conn, lawyer_ids):
+    """{lawyer_id: [(score, similar_id), ...]} best first for the given lawyers"""
+    lists = {}
+    for row in conn.execute(STORED_SQL, (json.dumps(lawyer_ids),)):
+        lists.setdefault(row[0], []).append((row[1], row[2]))
+    return lists
+
+def rebuild_similar(conn, k=DEFAULT_NEIGHBORS, progress=None, areas=None):
+    """Recompute the stored lists of every (or the given) practice area, committing once per area"""
+    started = time.perf_counter()
+    summary = {'lawyers': 0, 'areas': 0, 'rows': 0}
+    conn.execute('DELETE FROM lawyer_similar WHERE lawyer_id NOT IN (SELECT id FROM lawyers)')
+    conn.commit()
+    if areas is None:
+        areas = [row[0] for row in conn.execute('SELECT DISTINCT practice_area FROM lawyers')]
+    for area in areas:
+        block = load_block(conn, area)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(CLEAR_AREA_SQL, (area,))
+            rows = []
+            for lawyer_id, neighbors in block.all_neighbors(k):
+                rows.extend((lawyer_id, rank, similar_id, score)
+                            for rank, (score, similar_id) in enumerate(neighbors, 1))
+            conn.executemany(
+                'INSERT INTO lawyer_similar (lawyer_id, rank, similar_id, score) VALUES (?, ?, ?, ?)', rows
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        summary['lawyers'] += len(block)
+        summary['areas'] += 1
+        summary['rows'] += len(rows)
+        if progress:
+            progress(summary)
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+def refresh_similar(conn, lawyer_id, k=DEFAULT_NEIGHBORS):
+    """Update the stored lists after one lawyer was written; the caller commits"""
+    # Lists naming the lawyer may lose it (changed or deleted): recompute them
+    affected = {row[0] for row in conn.execute(REFERRERS_SQL, (lawyer_id,)) if row[0] != lawyer_id}
+    conn.execute('DELETE FROM lawyer_similar WHERE lawyer_id = ?', (lawyer_id,))
+
+    row = conn.execute('SELECT practice_area FROM lawyers WHERE id = ?', (lawyer_id,)).fetchone()
+    blocks = {}
+    if row is not None:
+        block = blocks[row[0]] = load_block(conn, row[0])
+        i = block.index[lawyer_id]
+        scores = block.similarities(i)
+        write_neighbors(conn, lawyer_id, block.neighbors(i, scores, k))
+
+        others = [other for other in block.ids if other != lawyer_id and other not in affected]
+        if len(block) <= k + 1:
+            # Every list holds the whole area: recompute them all (at most k + 1)
+            for other in others:
+                j = block.index[other]
+                write_neighbors(conn, other, block.neighbors(j, block.similarities(j), k))
+        else:
+            # Merge into the full lists whose k-th entry it now beats. Lists
+            # without a k-th entry were never built (schema upgrade, bulk
+            # import) or were built with a smaller k, and lists with a
+            # (k+1)-th entry with a larger one: both are left to a rebuild.
+            kth, longer = {}, set()
+            for other, rank, score, similar_id in conn.execute(
+                    KTH_ENTRIES_SQL, (json.dumps(others), k, k + 1)):
+                if rank == k:
+                    kth[other] = (score, similar_id)
+                else:
+                    longer.add(other)
+            beaten = [other for other, entry in kth.items() if other not in longer
+                      and (float(scores[block.index[other]]), lawyer_id) > entry]
+            current = stored_neighbors(conn, beaten)
+            for other in beaten:
+                merged = current[other] + [(float(scores[block.index[other]]), lawyer_id)]
+                write_neighbors(conn, other, heapq.nlargest(k, merged))
+
+    if affected:
+        areas = conn.execute('''
+            SELECT id, practice_area FROM lawyers WHERE id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(sorted(affected)),)).fetchall()
+        for other, area in areas:
+            block = blocks.get(area)
+            if block is None:
+                block = blocks[area] = load_block(conn, area)
+            i = block.index[other]
+            write_neighbors(conn, other, block.neighbors(i, block.similarities(i), k))
+        for other in affected - {row[0] for row in areas}:
+            conn.execute('DELETE FROM lawyer_similar WHERE lawyer_id = ?', (other,))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Precompute similar-lawyer lists')
+    parser.add_argument('--neighbors', type=int, default=int(os.getenv('SIMILAR_NEIGHBORS', DEFAULT_NEIGHBORS)),
+                        help=f'lawyers stored per list, as SIMILAR_NEIGHBORS for the app (at most {MAX_NEIGHBORS})')
+    args = parser.parse_args(argv)
+    if not 1 <= args.neighbors <= MAX_NEIGHBORS:
+        parser.error(f'--neighbors must be between 1 and {MAX_NEIGHBORS}')
+
+    def report(summary):
+        print(f"\r{summary['lawyers']} lawyers in {summary['areas']} practice areas, "
+              f"{summary['rows']} rows", end='', file=sys.stderr, flush=True)
+
+    with connection() as conn:
+        create_schema(conn.cursor())
+        conn.commit()
+        summary = rebuild_similar(conn, args.neighbors, report)
+        bump_version(conn, 'similar')
+        conn.commit()
+    print(file=sys.stderr)
+    print(json.dumps(summary))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Batched add/remove for per-user lawyer lists (shortlists, comparisons).
+
+A whole swipe session's worth of changes is applied in one write transaction:
+membership and lawyer existence are each checked with a single json_each
+query, removals are one DELETE and additions one executemany of
+INSERT ... ON CONFLICT DO NOTHING.
+"""
+import json
+
+MAX_BATCH_SIZE = 500
+
+# Per-user list tables; {table} in the statements below is one of these
+LIST_TABLES = ('shortlists', 'comparisons')
+
+MEMBERS_SQL = 'SELECT lawyer_id FROM {table} WHERE user_id = ? AND lawyer_id IN (SELECT value FROM json_each(?))'
+EXISTING_LAWYERS_SQL = 'SELECT id FROM lawyers WHERE id IN (SELECT value FROM json_each(?))'
+REMOVE_SQL = 'DELETE FROM {table} WHERE user_id = ? AND lawyer_id IN (SELECT value FROM json_each(?))'
+LIST_SIZE_SQL = 'SELECT COUNT(*) FROM {table} WHERE user_id = ?'
+ADD_SQL = 'INSERT INTO {table} (user_id, lawyer_id) VALUES (?, ?) ON CONFLICT (user_id, lawyer_id) DO NOTHING'
+
+def _id_list(data, key):
+    values = data.get(key) or []
+    if not isinstance(values, list):
+        raise ValueError(f'{key} must be a list of lawyer ids')
+    ids = []
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f'{key} must be a list of lawyer ids')
+        if value not in ids:
+            ids.append(value)
+    return ids
+
+def parse_batch(data):
+    """Read {add: [...], remove: [...]} from a request body, or raise ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError('Body must be a JSON object with add and/or remove lists')
+    add = _id_list(data, 'add')
+    remove = _id_list(data, 'remove')
+    if not add and not remove:
+        raise ValueError('Nothing to add or remove')
+    if len(add) + len(remove) > MAX_BATCH_SIZE:
+        raise ValueError(f'At most {MAX_BATCH_SIZE} ids per request')
+    if set(add) & set(remove):
+        raise ValueError('An id cannot be both added and removed')
+    return add, remove
+
+def apply_batch(conn, table, user_id, add, remove, max_items=None):
+    """Apply removals then additions to a user's list in one transaction.
+
+    Returns (results, changed, size) where results has one
+    {id, action, status} entry per requested id. Add statuses are added,
+    exists, not_found and limit_reached (when max_items would be exceeded);
+    remove statuses are removed and not_present. The caller commits.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    members = {row[0] for row in conn.execute(
+        MEMBERS_SQL.format(table=table), (user_id, json.dumps(add + remove))
+    )}
+    existing = {row[0] for row in conn.execute(
+        EXISTING_LAWYERS_SQL, (json.dumps(add),)
+    )} if add else set()
+
+    results = []
+    removed = [lawyer_id for lawyer_id in remove if lawyer_id in members]
+    if removed:
+        conn.execute(REMOVE_SQL.format(table=table), (user_id, json.dumps(removed)))
+    for lawyer_id in remove:
+        results.append({'id': lawyer_id, 'action': 'remove',
+                        'status': 'removed' if lawyer_id in members else 'not_present'})
+
+    size = conn.execute(LIST_SIZE_SQL.format(table=table), (user_id,)).fetchone()[0]
+    added = []
+    for lawyer_id in add:
+        if lawyer_id in members:
+            status = 'exists'
+        elif lawyer_id not in existing:
+            status = 'not_found'
+        elif max_items is not None and size + len(added) >= max_items:
+            status = 'limit_reached'
+        else:
+            status = 'added'
+            added.append(lawyer_id)
+        results.append({'id': lawyer_id, 'action': 'add', 'status': status})
+    if added:
+        conn.executemany(
+            ADD_SQL.format(table=table), [(user_id, lawyer_id) for lawyer_id in added]
+        )
+
+    return results, bool(removed or added), size + len(added)